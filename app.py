@@ -8,8 +8,6 @@ from src.i18n import get_text
 from src.input import load_demo_project
 from src.cedxm import create_board_from_height
 from src.masterdata import default_master, Project, BoardMaster, Rules
-from src.allocating import allocate_walls_with_architectural_constraints, extra_walls_to_wall_info
-from src.nesting import simple_nesting
 from src.ui import (
     render_sidebar,
     render_tab_project,
@@ -19,6 +17,7 @@ from src.ui import (
     render_tab_master,
     render_tab_settings,
 )
+from src.ui.pipeline_job import start_pipeline, render_pipeline_status
 
 # =========================
 # ページ設定・セッション初期化
@@ -83,30 +82,17 @@ output_mode: str = st.session_state.output_mode
 extra_walls = st.session_state.get("extra_walls", [])
 
 # =========================
-# 実行時：割付・板取
+# 実行時：割付・板取（バックグラウンド）
 # =========================
 
+# 計算はバックグラウンドのジョブで実行し、完了したら結果を取り込む
 if run:
-    try:
-        panels, errors = allocate_walls_with_architectural_constraints(
-            project, board, rules, output_mode, stud_pitch, extra_walls=extra_walls
-        )
-        placements, util, num_sheets = simple_nesting(panels, board, rules, prefer_y_long)
-        alloc_time = next((e["sec"] for e in errors if e.get("code") == "INFO-TIME" and e.get("phase") == "allocation"), 0)
-        st.session_state.results = {
-            "panels": panels,
-            "errors": errors,
-            "placements": placements,
-            "utilization": util,
-            "num_sheets": num_sheets,
-            "alloc_time": alloc_time,
-        }
-        from src.structural import generate_structural_system
-        st.session_state.structural_system = generate_structural_system(project, "S", stud_pitch)
-        st.success(get_text("execution_success", current_lang).format(pitch=stud_pitch, board=board.name))
-    except Exception as e:
-        st.error(f"割付・板取エラー: {e}")
-        st.code(traceback.format_exc())
+    start_pipeline(project, board, rules, output_mode, stud_pitch, prefer_y_long, extra_walls)
+try:
+    render_pipeline_status()
+except Exception as e:
+    st.error(f"割付・板取エラー: {e}")
+    st.code(traceback.format_exc())
 
 # =========================
 # 各タブの描画
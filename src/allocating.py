@@ -5,15 +5,17 @@
 """
 import time
 import math
-from typing import List, Tuple, Dict, Optional, Any
+from typing import List, Tuple, Dict, Optional, Any, Callable
 from src.masterdata import Project, BoardMaster, Rules, Panel, StudGrid, Opening
 from src.logic import place_opening_position
+from src.wall_graph import closed_rectangular_rooms
 
 
 def extra_walls_to_wall_info(extra_walls: List[Any], start_id: int = 5) -> Dict[str, Dict]:
     """
     新規壁（WallSegment相当のリスト）を割付用の wall_info 形式に変換する。
     外周は出隅ルール済みのW1～W4、新規壁はW5, W6, ... として扱う（長さは実長、開口なし）。
+    新規壁4本で閉じた矩形の部屋は、その部屋の外形に出隅ルールを適用した長さ・向きにする（"room" に部屋番号）。
     """
     result = {}
     for i, w in enumerate(extra_walls):
@@ -29,6 +31,11 @@ def extra_walls_to_wall_info(extra_walls: List[Any], start_id: int = 5) -> Dict[
             "direction": direction,
             "base_length": length,
         }
+    for room_no, (polygon, wall_indices) in enumerate(closed_rectangular_rooms(extra_walls), start=1):
+        thickness = getattr(extra_walls[wall_indices[0]], "thickness", 100)
+        adjusted = calculate_corner_winning_rules(polygon, thickness)
+        for k, wall_index in enumerate(wall_indices):
+            result[f"W{start_id + wall_index}"] = {**adjusted[f"W{k + 1}"], "room": room_no}
     return result
 
 def generate_stud_grid(wall_length: int, stud_pitch: int = 455) -> StudGrid:
@@ -166,12 +173,14 @@ def clip_panel_by_openings(panel_rect: Tuple[int, int, int, int],
 
 def allocate_walls_with_architectural_constraints(project: Project, board: BoardMaster, rules: Rules,
                                                 output_mode: str, stud_pitch: int = 455,
-                                                extra_walls: Optional[List[Any]] = None) -> Tuple[List[Panel], List[Dict]]:
+                                                extra_walls: Optional[List[Any]] = None,
+                                                progress: Optional[Callable[[int, int], None]] = None) -> Tuple[List[Panel], List[Dict]]:
     """
     建築的制約に基づく壁割付（外周W1～W4 + 新規壁W5,W6,...）
     1. 間柱グリッドの生成
     2. ボードの配置（水平方向の決定）
     3. 開口部のクリッピング処理（新規壁は開口なし）
+    progress を渡すと壁を1面終えるごとに progress(終えた壁数, 壁数) を呼ぶ（例外を投げれば中断できる）。
     """
     t0 = time.perf_counter()
     panels: List[Panel] = []
@@ -193,7 +202,9 @@ def allocate_walls_with_architectural_constraints(project: Project, board: Board
         if op.wall in openings_by_wall:
             openings_by_wall[op.wall].append(op)
     
-    for wall_id in wall_ids:
+    for wall_no, wall_id in enumerate(wall_ids):
+        if progress is not None:
+            progress(wall_no, len(wall_ids))
         wall = wall_info[wall_id]
         wall_length = wall["length"]
         wall_openings = openings_by_wall[wall_id]
@@ -262,6 +273,8 @@ def allocate_walls_with_architectural_constraints(project: Project, board: Board
             
             curr_x = next_x
     
+    if progress is not None:
+        progress(len(wall_ids), len(wall_ids))
     elapsed = time.perf_counter() - t0
     errors.append({"code":"INFO-TIME", "phase":"allocation", "sec": elapsed})
     
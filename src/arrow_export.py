@@ -0,0 +1,108 @@
+"""
+部材表・板取表・エラー一覧の Arrow IPC / Parquet 出力
+下流（積算・ERP）がメモリマップで読めるよう、列名・型を固定したスキーマで書き出す。
+壁ID・エラーコードは辞書エンコード（int16 インデックス＋文字列辞書）。
+"""
+import json
+from io import BytesIO
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.masterdata import Panel, NestPlacement, BoardMaster
+from src.output import df_panels, df_boards
+
+SCHEMA_VERSION = "1"
+
+_DICT = pa.dictionary(pa.int16(), pa.string())
+_METADATA = {b"schema_version": SCHEMA_VERSION.encode()}
+
+PANELS_SCHEMA = pa.schema([
+    ("part_no", pa.string()),
+    ("wall", _DICT),
+    ("x0", pa.float64()),
+    ("y0", pa.float64()),
+    ("w", pa.float64()),
+    ("h", pa.float64()),
+    ("requires_cutout", pa.bool_()),
+    ("is_cut_piece", pa.bool_()),
+    ("note", pa.string()),
+], metadata={**_METADATA, b"table": b"panels"})
+
+PLACEMENTS_SCHEMA = pa.schema([
+    ("board_id", pa.int32()),
+    ("x", pa.float64()),
+    ("y", pa.float64()),
+    ("w", pa.float64()),
+    ("h", pa.float64()),
+    ("rotated", pa.bool_()),
+    ("wall", _DICT),
+    ("panel_x0", pa.float64()),
+    ("panel_y0", pa.float64()),
+    ("part_number", pa.int32()),
+], metadata={**_METADATA, b"table": b"placements"})
+
+ERRORS_SCHEMA = pa.schema([
+    ("code", _DICT),
+    ("wall", _DICT),
+    ("msg", pa.string()),
+    ("detail", pa.string()),  # code / wall / msg 以外の項目（JSON）
+], metadata={**_METADATA, b"table": b"errors"})
+
+
+def _dictionary(values) -> pa.DictionaryArray:
+    """文字列列を辞書エンコード（辞書は出現値のソート順、None は null）"""
+    categorical = pd.Categorical(values, categories=sorted({v for v in values if v is not None}))
+    codes = categorical.codes.astype(np.int16)
+    indices = pa.array(codes, mask=codes < 0)
+    return pa.DictionaryArray.from_arrays(indices, pa.array(list(categorical.categories), type=pa.string()))
+
+
+def _table(df, schema: pa.Schema, dictionary_columns: List[str]) -> pa.Table:
+    columns = []
+    for field in schema:
+        if field.name in dictionary_columns:
+            columns.append(_dictionary(df[field.name].tolist()))
+        else:
+            columns.append(pa.array(df[field.name].to_numpy(), type=field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def panels_table(panels: List[Panel]) -> pa.Table:
+    """部材表（df_panels と同じ列）"""
+    return _table(df_panels(panels), PANELS_SCHEMA, ["wall"])
+
+
+def placements_table(placements: List[NestPlacement], board: BoardMaster) -> pa.Table:
+    """板取表（df_boards と同じ列）"""
+    return _table(df_boards(placements, board), PLACEMENTS_SCHEMA, ["wall"])
+
+
+def errors_table(errors: List[Dict]) -> pa.Table:
+    """エラー一覧（code / wall / msg と、それ以外の項目を JSON 文字列にした detail）"""
+    def detail(e: Dict) -> str:
+        rest = {k: v for k, v in e.items() if k not in ("code", "wall", "msg")}
+        return json.dumps(rest, ensure_ascii=False, default=str) if rest else None
+
+    return pa.Table.from_arrays([
+        _dictionary([str(e["code"]) if e.get("code") is not None else None for e in errors]),
+        _dictionary([str(e["wall"]) if e.get("wall") is not None else None for e in errors]),
+        pa.array([str(e["msg"]) if e.get("msg") is not None else None for e in errors], type=pa.string()),
+        pa.array([detail(e) for e in errors], type=pa.string()),
+    ], schema=ERRORS_SCHEMA)
+
+
+def to_arrow_ipc_bytes(table: pa.Table) -> bytes:
+    """Arrow IPC ファイル形式（.arrow、メモリマップで読める）"""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def to_parquet_bytes(table: pa.Table) -> bytes:
+    """Parquet 形式（辞書エンコードはそのまま保持）"""
+    buf = BytesIO()
+    pq.write_table(table, buf)
+    return buf.getvalue()
@@ -0,0 +1,154 @@
+"""
+DXF 出力（板取図・壁立面図）
+外部ライブラリを使わず DXF R12（ASCII）を直接書き出す。図面モデルは持たず、
+ボード1枚・壁1面ごとに図形をテキストにしてファイルへ流すため、メモリ使用量はボード枚数に依存しない。
+単位は mm。文字は ASCII（ボード・パーツ番号、壁ID、開口ID）のみ。
+"""
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Tuple, Union, TextIO
+from src.masterdata import NestPlacement, BoardMaster, Panel, Opening
+from src.logic import place_opening_position
+
+# レイヤ名 → ACI 色番号
+NESTING_LAYERS = {"SHEET": 7, "PART": 3, "CUT_PIECE": 5, "LABEL": 8}
+ELEVATION_LAYERS = {"WALL": 7, "PANEL": 3, "CUT_PIECE": 5, "OPENING": 1, "STUD": 8, "KING_STUD": 30, "LABEL": 8}
+
+SHEETS_PER_ROW = 10  # 板取図でボードを横に並べる枚数
+SHEET_GAP = 200      # ボード間の間隔（mm）
+WALL_GAP = 600       # 立面図で壁を縦に並べる間隔（mm）
+
+
+def _n(v: float) -> str:
+    return f"{float(v):.2f}"
+
+
+class DxfWriter:
+    """DXF R12 の逐次書き出し（図形はバッファに溜め、flush() でまとめて書く）"""
+
+    def __init__(self, stream: TextIO, layers: Dict[str, int]):
+        self.stream = stream
+        self.layers = layers
+        self._buf: List[str] = []
+        self.entity_count = 0
+
+    def begin(self) -> None:
+        head = ["0\nSECTION\n2\nHEADER\n9\n$ACADVER\n1\nAC1009\n9\n$DWGCODEPAGE\n3\nANSI_932\n0\nENDSEC\n",
+                f"0\nSECTION\n2\nTABLES\n0\nTABLE\n2\nLAYER\n70\n{len(self.layers)}\n"]
+        for name, color in self.layers.items():
+            head.append(f"0\nLAYER\n2\n{name}\n70\n0\n62\n{color}\n6\nCONTINUOUS\n")
+        head.append("0\nENDTAB\n0\nENDSEC\n0\nSECTION\n2\nENTITIES\n")
+        self.stream.write("".join(head))
+
+    def end(self) -> None:
+        self.flush()
+        self.stream.write("0\nENDSEC\n0\nEOF\n")
+
+    def flush(self) -> None:
+        if self._buf:
+            self.stream.write("".join(self._buf))
+            self._buf.clear()
+
+    def line(self, layer: str, x0: float, y0: float, x1: float, y1: float) -> None:
+        self._buf.append(f"0\nLINE\n8\n{layer}\n10\n{_n(x0)}\n20\n{_n(y0)}\n30\n0.0\n11\n{_n(x1)}\n21\n{_n(y1)}\n31\n0.0\n")
+        self.entity_count += 1
+
+    def rect(self, layer: str, x0: float, y0: float, x1: float, y1: float) -> None:
+        """閉じたポリライン（R12 の POLYLINE / VERTEX / SEQEND）"""
+        parts = [f"0\nPOLYLINE\n8\n{layer}\n66\n1\n70\n1\n10\n0.0\n20\n0.0\n30\n0.0\n"]
+        for x, y in ((x0, y0), (x1, y0), (x1, y1), (x0, y1)):
+            parts.append(f"0\nVERTEX\n8\n{layer}\n10\n{_n(x)}\n20\n{_n(y)}\n30\n0.0\n")
+        parts.append(f"0\nSEQEND\n8\n{layer}\n")
+        self._buf.append("".join(parts))
+        self.entity_count += 1
+
+    def text(self, layer: str, x: float, y: float, height: float, text: str) -> None:
+        """中央揃えの文字"""
+        self._buf.append(
+            f"0\nTEXT\n8\n{layer}\n10\n{_n(x)}\n20\n{_n(y)}\n30\n0.0\n40\n{_n(height)}\n1\n{text}\n"
+            f"72\n1\n73\n2\n11\n{_n(x)}\n21\n{_n(y)}\n31\n0.0\n"
+        )
+        self.entity_count += 1
+
+
+@contextmanager
+def open_dxf(target: Union[str, TextIO], layers: Dict[str, int]) -> Iterator[DxfWriter]:
+    """パスまたはテキストストリームに DXF を書き出す"""
+    if isinstance(target, str):
+        with open(target, "w", encoding="cp932", errors="replace", newline="\n") as f:
+            with open_dxf(f, layers) as writer:
+                yield writer
+        return
+    writer = DxfWriter(target, layers)
+    writer.begin()
+    yield writer
+    writer.end()
+
+
+def write_nesting_dxf(target: Union[str, TextIO], placements: Iterable[NestPlacement], board: BoardMaster,
+                      per_row: int = SHEETS_PER_ROW, gap: int = SHEET_GAP) -> int:
+    """
+    板取図を DXF に書き出す（ボードを per_row 枚ずつ格子状に配置）。
+    placements はボード順に並んでいる必要はない（位置はボード番号から決める）。戻り値はボード枚数。
+    """
+    W, H = board.raw_width, board.raw_height
+    sheets = set()
+    current = None
+    with open_dxf(target, NESTING_LAYERS) as dxf:
+        for pl in placements:
+            sid = pl.sheet_id
+            ox = ((sid - 1) % per_row) * (W + gap)
+            oy = -((sid - 1) // per_row) * (H + gap)
+            if sid != current:
+                dxf.flush()  # ボードが変わるごとにファイルへ流す
+                current = sid
+                if sid not in sheets:
+                    sheets.add(sid)
+                    dxf.rect("SHEET", ox, oy, ox + W, oy + H)
+                    dxf.text("LABEL", ox + W / 2, oy + H + 60, 80, f"B{sid}")
+            ref = pl.panel_ref or {}
+            layer = "CUT_PIECE" if ref.get("is_cut_piece") else "PART"
+            x0, y0 = ox + pl.x, oy + pl.y
+            dxf.rect(layer, x0, y0, x0 + pl.w, y0 + pl.h)
+            label = f"{ref.get('wall_id', '')} P{ref.get('part_number', 0)}"
+            dxf.text("LABEL", x0 + pl.w / 2, y0 + pl.h / 2, min(40, pl.w / 6, pl.h / 3), label)
+    return len(sheets)
+
+
+def write_elevations_dxf(target: Union[str, TextIO], walls: Iterable[Tuple[str, float, float]], panels: List[Panel],
+                         openings: List[Opening], structural_system=None, gap: int = WALL_GAP) -> int:
+    """
+    壁立面図（パネル・開口・間柱）を DXF に書き出す。walls は (壁ID, 壁長さ, 高さ) の並びで、壁を縦に積んで配置する。
+    戻り値は書き出した壁の数。
+    """
+    panels_by_wall: Dict[str, List[Panel]] = {}
+    for p in panels:
+        panels_by_wall.setdefault(p.wall_id, []).append(p)
+    openings_by_wall: Dict[str, List[Opening]] = {}
+    for op in openings:
+        openings_by_wall.setdefault(op.wall, []).append(op)
+
+    count = 0
+    oy = 0.0
+    with open_dxf(target, ELEVATION_LAYERS) as dxf:
+        for wid, wall_len, H in walls:
+            oy -= H + gap
+            dxf.rect("WALL", 0, oy, wall_len, oy + H)
+            dxf.text("LABEL", wall_len / 2, oy + H + 120, 150, f"{wid} L={wall_len:.0f}")
+            for op in openings_by_wall.get(wid, []):
+                off = place_opening_position(wall_len, op)
+                y0 = 0.0 if op.type == "door" else op.sill_height
+                dxf.rect("OPENING", off, oy + y0, off + op.width, oy + y0 + op.height)
+                dxf.text("LABEL", off + op.width / 2, oy + y0 + op.height / 2, 60, op.opening_id)
+            for p in panels_by_wall.get(wid, []):
+                dxf.rect("CUT_PIECE" if p.is_cut_piece else "PANEL", p.x0, oy + p.y0, p.x0 + p.w, oy + p.y0 + p.h)
+                if p.board_number > 0 and p.part_number > 0:
+                    dxf.text("LABEL", p.x0 + p.w / 2, oy + p.y0 + p.h / 2, min(40, p.w / 6), f"B{p.board_number}-P{p.part_number}")
+            if structural_system is not None:
+                for stud_type, layer in (("regular", "STUD"), ("king", "KING_STUD")):
+                    studs = structural_system.studs_for(wid, stud_type)
+                    for x, z0, z1 in zip(studs.wall_position.tolist(), studs.base_level.tolist(), studs.top_level.tolist()):
+                        if 0 <= x <= wall_len:
+                            dxf.line(layer, x, oy + z0, x, oy + z1)
+            dxf.flush()  # 壁ごとにファイルへ流す
+            count += 1
+    return count
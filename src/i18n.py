@@ -77,6 +77,8 @@ TRANSLATIONS = {
         "recalculated": "で再計算しました。",
         "auto_fixed": "備考フラグを付与しました（PoC）。",
         "nesting_preview": "板取プレビュー",
+        "nesting_thumbnails": "全ボード一覧（クリックでそのボードのページへ）",
+        "nesting_page": "ページ",
         "utilization_rate": "推定利用率（総合）",
         "nesting_info": "板取結果を表示するには、まず「割付・板取を実行」してください。",
         "table_output": "表出力 / ダウンロード",
@@ -86,10 +88,25 @@ TRANSLATIONS = {
         "download_nesting": "板取結果CSVをダウンロード",
         "error_list": "エラー一覧",
         "download_errors": "エラーCSVをダウンロード",
+        "typed_export": "型付き出力（Arrow IPC / Parquet）",
+        "prepare_downloads": "ダウンロード用データを作成",
+        "dxf_export": "DXF 出力（板取図・壁立面図）",
+        "pdf_export": "PDF 図面セット出力",
+        "drawing_set": "図面セット",
+        "prepare_pdf": "PDF 図面セットを作成",
+        "export_format": "形式",
         "current_master": "現在のマスター設定",
         "footer_note1": "※ 本PoCは最小実装（四角部屋・矩形板・簡易分割）です。将来は板形状（切欠・角落とし）や詳細規則を拡張します。",
         "footer_note2": "※ CAD図面描画エンジンにPlotly（plotly.graph_objects、plotly.express、plotly.subplots）を使用し、インタラクティブな平面プレビューと3D表示見付図を実現しています。",
-        "execution_success": "建築的制約に基づく割付・板取を実行しました。（間柱ピッチ: {pitch:.0f}mm, 板サイズ: {board}）"
+        "execution_success": "建築的制約に基づく割付・板取を実行しました。（間柱ピッチ: {pitch:.0f}mm, 板サイズ: {board}）",
+        "job_running": "割付・板取を実行中：{stage}（{elapsed:.1f}秒）",
+        "job_cancel": "中止",
+        "job_cancelled": "割付・板取を中止しました。",
+        "job_failed": "割付・板取エラー: {error}",
+        "stage_allocation": "割付",
+        "stage_nesting": "板取",
+        "stage_structural": "構造生成",
+        "stage_tables": "帳票"
     },
     "en": {
         "app_title": "Panel Allocation & Nesting PoC",
@@ -158,6 +175,8 @@ TRANSLATIONS = {
         "recalculated": "recalculated.",
         "auto_fixed": "Remark flags added (PoC).",
         "nesting_preview": "Nesting Preview",
+        "nesting_thumbnails": "All Sheets (click a sheet to open its page)",
+        "nesting_page": "Page",
         "utilization_rate": "Estimated Utilization Rate (Overall)",
         "nesting_info": "To display nesting results, please execute 'Allocation & Nesting' first.",
         "table_output": "Table Output / Download",
@@ -167,10 +186,25 @@ TRANSLATIONS = {
         "download_nesting": "Download Nesting CSV",
         "error_list": "Error List",
         "download_errors": "Download Errors CSV",
+        "typed_export": "Typed Export (Arrow IPC / Parquet)",
+        "prepare_downloads": "Prepare Downloads",
+        "dxf_export": "DXF Export (Nesting / Wall Elevations)",
+        "pdf_export": "PDF Drawing Set",
+        "drawing_set": "Drawing set",
+        "prepare_pdf": "Prepare PDF drawing set",
+        "export_format": "Format",
         "current_master": "Current Master Settings",
         "footer_note1": "※ This PoC is minimal implementation (rectangular room, rectangular board, simple division). Future versions will expand board shapes (notches, corner cuts) and detailed rules.",
         "footer_note2": "※ CAD drawing engine uses Plotly (plotly.graph_objects, plotly.express, plotly.subplots) to achieve interactive plan preview and 3D elevation view.",
-        "execution_success": "Executed allocation & nesting based on architectural constraints. (Stud pitch: {pitch:.0f}mm, Board size: {board})"
+        "execution_success": "Executed allocation & nesting based on architectural constraints. (Stud pitch: {pitch:.0f}mm, Board size: {board})",
+        "job_running": "Running allocation & nesting: {stage} ({elapsed:.1f}s)",
+        "job_cancel": "Cancel",
+        "job_cancelled": "Allocation & nesting was cancelled.",
+        "job_failed": "Allocation & nesting error: {error}",
+        "stage_allocation": "Allocation",
+        "stage_nesting": "Nesting",
+        "stage_structural": "Structure",
+        "stage_tables": "Tables"
     },
     "zh": {
         "app_title": "板材分配与排料 PoC",
@@ -239,6 +273,8 @@ TRANSLATIONS = {
         "recalculated": "重新计算完成。",
         "auto_fixed": "已添加备注标志（PoC）。",
         "nesting_preview": "排料预览",
+        "nesting_thumbnails": "全部板材一览（点击跳转到所在页）",
+        "nesting_page": "页",
         "utilization_rate": "估计利用率（总体）",
         "nesting_info": "要显示排料结果，请先执行\"分配与排料\"。",
         "table_output": "表格输出 / 下载",
@@ -248,10 +284,25 @@ TRANSLATIONS = {
         "download_nesting": "下载排料CSV",
         "error_list": "错误列表",
         "download_errors": "下载错误CSV",
+        "typed_export": "类型化导出（Arrow IPC / Parquet）",
+        "prepare_downloads": "生成下载数据",
+        "dxf_export": "DXF 导出（排料图・墙立面图）",
+        "pdf_export": "PDF 图纸集导出",
+        "drawing_set": "图纸集",
+        "prepare_pdf": "生成 PDF 图纸集",
+        "export_format": "格式",
         "current_master": "当前主数据设置",
         "footer_note1": "※ 此PoC为最小实现（矩形房间、矩形板材、简单分割）。未来版本将扩展板材形状（缺口、倒角）和详细规则。",
         "footer_note2": "※ CAD绘图引擎使用Plotly（plotly.graph_objects、plotly.express、plotly.subplots）实现交互式平面预览和3D立面视图。",
-        "execution_success": "基于建筑约束执行分配与排料完成。（龙骨间距：{pitch:.0f}mm，板材尺寸：{board}）"
+        "execution_success": "基于建筑约束执行分配与排料完成。（龙骨间距：{pitch:.0f}mm，板材尺寸：{board}）",
+        "job_running": "正在执行分配与排料：{stage}（{elapsed:.1f}秒）",
+        "job_cancel": "取消",
+        "job_cancelled": "已取消分配与排料。",
+        "job_failed": "分配与排料错误：{error}",
+        "stage_allocation": "分配",
+        "stage_nesting": "排料",
+        "stage_structural": "结构生成",
+        "stage_tables": "报表"
     },
     "vi": {
         "app_title": "Phân bổ & Sắp xếp Tấm PoC",
@@ -320,6 +371,8 @@ TRANSLATIONS = {
         "recalculated": "đã được tính lại.",
         "auto_fixed": "Đã thêm cờ ghi chú (PoC).",
         "nesting_preview": "Xem trước Sắp xếp (Phiên bản Plotly)",
+        "nesting_thumbnails": "Tất cả các tấm (bấm vào tấm để mở trang)",
+        "nesting_page": "Trang",
         "utilization_rate": "Tỷ lệ Sử dụng Ước tính (Tổng thể)",
         "nesting_info": "Để hiển thị kết quả sắp xếp, vui lòng thực hiện 'Phân bổ & Sắp xếp' trước.",
         "table_output": "Đầu ra Bảng / Tải xuống",
@@ -329,10 +382,25 @@ TRANSLATIONS = {
         "download_nesting": "Tải xuống CSV Sắp xếp",
         "error_list": "Danh sách Lỗi",
         "download_errors": "Tải xuống CSV Lỗi",
+        "typed_export": "Xuất có kiểu (Arrow IPC / Parquet)",
+        "prepare_downloads": "Chuẩn bị dữ liệu tải xuống",
+        "dxf_export": "Xuất DXF (Sắp xếp / Mặt đứng tường)",
+        "pdf_export": "Xuất bộ bản vẽ PDF",
+        "drawing_set": "Bộ bản vẽ",
+        "prepare_pdf": "Tạo bộ bản vẽ PDF",
+        "export_format": "Định dạng",
         "current_master": "Cài đặt Dữ liệu Chính Hiện tại",
         "footer_note1": "※ PoC này là triển khai tối thiểu (phòng chữ nhật, tấm chữ nhật, phân chia đơn giản). Các phiên bản tương lai sẽ mở rộng hình dạng tấm (rãnh, cắt góc) và quy tắc chi tiết.",
         "footer_note2": "※ Công cụ vẽ CAD sử dụng Plotly (plotly.graph_objects, plotly.express, plotly.subplots) để đạt được xem trước mặt bằng tương tác và xem mặt đứng 3D.",
-        "execution_success": "Đã thực hiện phân bổ & sắp xếp dựa trên ràng buộc kiến trúc. (Khoảng cách cột: {pitch:.0f}mm, Kích thước tấm: {board})"
+        "execution_success": "Đã thực hiện phân bổ & sắp xếp dựa trên ràng buộc kiến trúc. (Khoảng cách cột: {pitch:.0f}mm, Kích thước tấm: {board})",
+        "job_running": "Đang phân bổ & sắp xếp: {stage} ({elapsed:.1f}s)",
+        "job_cancel": "Hủy",
+        "job_cancelled": "Đã hủy phân bổ & sắp xếp.",
+        "job_failed": "Lỗi phân bổ & sắp xếp: {error}",
+        "stage_allocation": "Phân bổ",
+        "stage_nesting": "Sắp xếp",
+        "stage_structural": "Kết cấu",
+        "stage_tables": "Bảng biểu"
     }
 }
 
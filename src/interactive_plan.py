@@ -3,15 +3,28 @@
 Streamlitとplotlyを使用したマウス操作による壁作成
 """
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import plotly.graph_objects as go
+import numpy as np
 from typing import List, Tuple, Optional
 from src.wall_editor import (
     WallSegment, snap_to_grid, snap_to_horizontal_or_vertical,
-    create_wall_from_line, create_walls_from_area, find_nearest_wall_point
+    create_wall_from_line, create_walls_from_area, find_nearest_wall_point, WallSpatialIndex,
+    convert_walls_to_project_format
 )
+from src.wall_history import WallHistory
 from src.masterdata import Project
 from src.allocating import calculate_corner_winning_rules
 
+CLICK_GRID_MAX_POINTS = 4000  # クリック用グリッドの最大点数
+
+def _rerun_editor():
+    """エディタの再実行（フラグメント内ではエディタだけ、それ以外はアプリ全体）"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
 def create_interactive_plan_editor(project: Project, key_prefix: str = "plan_editor"):
     """
     インタラクティブな平面図エディタ
@@ -26,60 +39,78 @@ def create_interactive_plan_editor(project: Project, key_prefix: str = "plan_edi
         st.session_state[f"{key_prefix}_mode"] = "view"  # view, draw_wall, draw_room
     if f"{key_prefix}_points" not in st.session_state:
         st.session_state[f"{key_prefix}_points"] = []
-    if f"{key_prefix}_new_walls" not in st.session_state:
-        st.session_state[f"{key_prefix}_new_walls"] = []
+    if f"{key_prefix}_history" not in st.session_state:
+        st.session_state[f"{key_prefix}_history"] = WallHistory()
+    history = st.session_state[f"{key_prefix}_history"]
+    new_walls = history.walls
     
-    # 既存の壁をWallSegment形式に変換
-    wall_info = calculate_corner_winning_rules(project.room.polygon, project.room.wall_thickness)
-    existing_walls = []
-    for wid in ["W1", "W2", "W3", "W4"]:
-        wall = wall_info[wid]
-        existing_walls.append(WallSegment(
-            id=wid,
-            start=wall["start"],
-            end=wall["end"],
-            thickness=project.room.wall_thickness,
-            height=project.room.height,
-            is_new=False
-        ))
+    # 既存の壁をWallSegment形式に変換（外周が同じ間は同じオブジェクトを使い、空間インデックスの差分を小さくする）
+    perimeter_key = (tuple(map(tuple, project.room.polygon)), project.room.wall_thickness, project.room.height)
+    cached = st.session_state.get(f"{key_prefix}_existing_walls")
+    if cached is not None and cached[0] == perimeter_key:
+        existing_walls = cached[1]
+    else:
+        wall_info = calculate_corner_winning_rules(project.room.polygon, project.room.wall_thickness)
+        existing_walls = []
+        for wid in ["W1", "W2", "W3", "W4"]:
+            wall = wall_info[wid]
+            existing_walls.append(WallSegment(
+                id=wid,
+                start=wall["start"],
+                end=wall["end"],
+                thickness=project.room.wall_thickness,
+                height=project.room.height,
+                is_new=False
+            ))
+        st.session_state[f"{key_prefix}_existing_walls"] = (perimeter_key, existing_walls)
     
     # 新規作成された壁を追加
-    all_walls = existing_walls + st.session_state[f"{key_prefix}_new_walls"]
+    all_walls = existing_walls + new_walls
+    
+    # スナップ用の空間インデックス（壁の追加・元に戻すの差分だけ更新）
+    if f"{key_prefix}_wall_index" not in st.session_state:
+        st.session_state[f"{key_prefix}_wall_index"] = WallSpatialIndex()
+    wall_index = st.session_state[f"{key_prefix}_wall_index"]
+    wall_index.sync(all_walls)
     
     # コントロールパネル
-    col1, col2, col3, col4, col5 = st.columns(5)
+    col1, col2, col3, col4, col5, col6 = st.columns(6)
     
     with col1:
         if st.button("🖱️ 壁を描く", use_container_width=True, 
                     type="primary" if st.session_state[f"{key_prefix}_mode"] == "draw_wall" else "secondary"):
             st.session_state[f"{key_prefix}_mode"] = "draw_wall"
             st.session_state[f"{key_prefix}_points"] = []
-            st.rerun()
+            _rerun_editor()
     
     with col2:
         if st.button("🔲 部屋を描く", use_container_width=True,
                     type="primary" if st.session_state[f"{key_prefix}_mode"] == "draw_room" else "secondary"):
             st.session_state[f"{key_prefix}_mode"] = "draw_room"
             st.session_state[f"{key_prefix}_points"] = []
-            st.rerun()
+            _rerun_editor()
     
     with col3:
         if st.button("👁️ 表示モード", use_container_width=True,
                     type="primary" if st.session_state[f"{key_prefix}_mode"] == "view" else "secondary"):
             st.session_state[f"{key_prefix}_mode"] = "view"
             st.session_state[f"{key_prefix}_points"] = []
-            st.rerun()
+            _rerun_editor()
     
     with col4:
         if st.button("🗑️ クリア", use_container_width=True):
             st.session_state[f"{key_prefix}_points"] = []
-            st.rerun()
+            _rerun_editor()
     
     with col5:
-        if st.button("↩️ 元に戻す", use_container_width=True):
-            if st.session_state[f"{key_prefix}_new_walls"]:
-                st.session_state[f"{key_prefix}_new_walls"].pop()
-                st.rerun()
+        if st.button("↩️ 元に戻す", use_container_width=True, disabled=not history.can_undo):
+            history.undo()
+            _rerun_editor()
+    
+    with col6:
+        if st.button("↪️ やり直し", use_container_width=True, disabled=not history.can_redo):
+            history.redo()
+            _rerun_editor()
     
     current_mode = st.session_state[f"{key_prefix}_mode"]
     mode_text = {
@@ -92,7 +123,7 @@ def create_interactive_plan_editor(project: Project, key_prefix: str = "plan_edi
     fig = create_editable_plan_figure(
         project, all_walls, st.session_state[f"{key_prefix}_points"], mode=current_mode
     )
-    plot_config = {"scrollZoom": False} if current_mode in ("draw_wall", "draw_room") else None
+    plot_config = {"scrollZoom": False} if current_mode in ("draw_wall", "draw_room") else {}
     if current_mode == "draw_wall":
         selection_mode = ("points",)
     elif current_mode == "draw_room":
@@ -116,7 +147,7 @@ def create_interactive_plan_editor(project: Project, key_prefix: str = "plan_edi
                 x, y = getattr(p, "x", None), getattr(p, "y", None)
                 if x is not None and y is not None:
                     st.session_state[f"{key_prefix}_points"].append(snap_to_grid((float(x), float(y))))
-                    st.rerun()
+                    _rerun_editor()
                 break
     
     if current_mode == "draw_room" and event and getattr(event, "selection", None):
@@ -140,7 +171,7 @@ def create_interactive_plan_editor(project: Project, key_prefix: str = "plan_edi
                     snap_to_grid((float(x0), float(y1))),
                 ]:
                     st.session_state[f"{key_prefix}_points"].append(pt)
-                st.rerun()
+                _rerun_editor()
     
     if st.session_state[f"{key_prefix}_mode"] == "draw_wall":
         st.write("### 📍 図上をクリックで点を追加（始点・終点の順に2点）。または座標入力：")
@@ -160,7 +191,7 @@ def create_interactive_plan_editor(project: Project, key_prefix: str = "plan_edi
                 # グリッドにスナップ
                 snapped = snap_to_grid((x_coord, y_coord))
                 st.session_state[f"{key_prefix}_points"].append(snapped)
-                st.rerun()
+                _rerun_editor()
         
         # 現在の点を表示
         if st.session_state[f"{key_prefix}_points"]:
@@ -180,43 +211,63 @@ def create_interactive_plan_editor(project: Project, key_prefix: str = "plan_edi
                 start, end,
                 project.room.wall_thickness,
                 project.room.height,
-                all_walls
+                all_walls,
+                index=wall_index
             )
             
             if new_wall:
-                st.session_state[f"{key_prefix}_new_walls"].append(new_wall)
+                history.add_walls([new_wall], f"壁 {new_wall.id} を作成")
                 st.session_state[f"{key_prefix}_points"] = []
                 st.success(f"✅ 壁 {new_wall.id} を作成しました！")
-                st.rerun()
+                _rerun_editor()
             else:
                 st.error("❌ 壁を作成できませんでした（長さが短すぎます）")
     
     # 部屋作成ボタン
     if st.session_state[f"{key_prefix}_mode"] == "draw_room" and len(st.session_state[f"{key_prefix}_points"]) >= 2:
         if st.button("✅ 部屋を作成", type="primary", use_container_width=True):
-            new_walls = create_walls_from_area(
+            room_walls = create_walls_from_area(
                 st.session_state[f"{key_prefix}_points"],
                 project.room.wall_thickness,
                 project.room.height,
-                all_walls
+                all_walls,
+                index=wall_index
             )
             
-            if new_walls:
-                st.session_state[f"{key_prefix}_new_walls"].extend(new_walls)
+            if room_walls:
+                history.add_walls(room_walls, "部屋を作成")
                 st.session_state[f"{key_prefix}_points"] = []
-                st.success(f"✅ {len(new_walls)}個の壁を作成しました！")
-                st.rerun()
+                st.success(f"✅ {len(room_walls)}個の壁を作成しました！")
+                _rerun_editor()
             else:
                 st.error("❌ 部屋を作成できませんでした（サイズが小さすぎます）")
     
     # 新規作成された壁の情報を表示
-    if st.session_state[f"{key_prefix}_new_walls"]:
+    if new_walls:
+        # 部屋抽出はスナップショットの version ごとに1回（元に戻して同じ状態なら再計算しない）
+        rooms_cache = st.session_state.get(f"{key_prefix}_rooms")
+        if not rooms_cache or rooms_cache[0] != history.version:
+            rooms_cache = (history.version, convert_walls_to_project_format(new_walls, project))
+            st.session_state[f"{key_prefix}_rooms"] = rooms_cache
+        rooms = rooms_cache[1]
+        st.caption(f"閉じた部屋: {len(rooms)}室（既存の部屋外形を含む）")
         st.write("### 🆕 新規作成された壁")
-        for wall in st.session_state[f"{key_prefix}_new_walls"]:
+        for wall in new_walls:
             length = ((wall.end[0] - wall.start[0])**2 + (wall.end[1] - wall.start[1])**2)**0.5
             st.write(f"- **{wall.id}**: 始点({wall.start[0]}, {wall.start[1]}) → 終点({wall.end[0]}, {wall.end[1]}) | 長さ: {length:.0f}mm")
+    if history.undo_stack:
+        with st.expander(f"📜 操作履歴（{len(history.undo_stack)}件）"):
+            for command in history.undo_stack:
+                st.write(f"- {command.label}")
     
-    return st.session_state[f"{key_prefix}_new_walls"]
+    return new_walls
+
+def click_grid_step(width: float, height: float, max_points: int = CLICK_GRID_MAX_POINTS, base_step: int = 100) -> int:
+    """クリック用グリッドの間隔（base_step の倍数で、点数が max_points 以下になる最小値）"""
+    step = base_step
+    while (width // step + 1) * (height // step + 1) > max_points:
+        step += base_step
+    return step
 
 def create_editable_plan_figure(project: Project, walls: List[WallSegment], 
                                 current_points: List[Tuple[int, int]],
@@ -234,43 +285,38 @@ def create_editable_plan_figure(project: Project, walls: List[WallSegment],
     grid_min_y = min_y - grid_margin
     grid_max_y = max_y + grid_margin
     
-    grid_step = 100
-    grid_x = list(range(int(grid_min_x), int(grid_max_x) + 1, grid_step))
-    grid_y = list(range(int(grid_min_y), int(grid_max_y) + 1, grid_step))
-    click_x, click_y = [], []
-    for gx in grid_x:
-        for gy in grid_y:
-            click_x.append(gx)
-            click_y.append(gy)
-    if click_x:
-        fig.add_trace(go.Scatter(
-            x=click_x, y=click_y,
-            mode='markers',
-            marker=dict(size=5, opacity=0.2, color='gray', symbol='circle'),
-            name='_click_grid_',
-            legendgroup='_click_grid_',
-            hovertemplate='クリックでここに点を追加<extra></extra>',
-            showlegend=False
-        ))
+    # クリック用グリッド：点数が上限を超えないよう間隔を広げる（クリック位置はサーバ側で snap_to_grid）
+    grid_step = click_grid_step(grid_max_x - grid_min_x, grid_max_y - grid_min_y)
+    gx, gy = np.meshgrid(
+        np.arange(int(grid_min_x), int(grid_max_x) + 1, grid_step),
+        np.arange(int(grid_min_y), int(grid_max_y) + 1, grid_step)
+    )
+    fig.add_trace(go.Scatter(
+        x=gx.ravel(), y=gy.ravel(),
+        mode='markers',
+        marker=dict(size=5, opacity=0.2, color='gray', symbol='circle'),
+        name='_click_grid_',
+        legendgroup='_click_grid_',
+        hovertemplate='クリックでここに点を追加<extra></extra>',
+        showlegend=False
+    ))
     
+    # 補助グリッド線：None 区切りで1トレースにまとめる
     grid_size = 500
+    line_x, line_y = [], []
     for x in range(int(grid_min_x), int(grid_max_x) + 1, grid_size):
-        fig.add_trace(go.Scatter(
-            x=[x, x], y=[grid_min_y, grid_max_y],
-            mode='lines',
-            line=dict(color='lightgray', width=0.5, dash='dot'),
-            showlegend=False,
-            hoverinfo='skip'
-        ))
-    
+        line_x += [x, x, None]
+        line_y += [grid_min_y, grid_max_y, None]
     for y in range(int(grid_min_y), int(grid_max_y) + 1, grid_size):
-        fig.add_trace(go.Scatter(
-            x=[grid_min_x, grid_max_x], y=[y, y],
-            mode='lines',
-            line=dict(color='lightgray', width=0.5, dash='dot'),
-            showlegend=False,
-            hoverinfo='skip'
-        ))
+        line_x += [grid_min_x, grid_max_x, None]
+        line_y += [y, y, None]
+    fig.add_trace(go.Scatter(
+        x=line_x, y=line_y,
+        mode='lines',
+        line=dict(color='lightgray', width=0.5, dash='dot'),
+        showlegend=False,
+        hoverinfo='skip'
+    ))
     
     # 既存の壁を描画
     for wall in walls:
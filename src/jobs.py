@@ -0,0 +1,162 @@
+"""
+バックグラウンドジョブ（割付パイプラインをスクリプト実行の外で走らせる）
+ジョブはスレッドプールで実行し、UI はジョブID で進捗（段階・割合）を問い合わせて完了時に結果を取り込む。
+キャンセルは協調的で、段階の切れ目と割付の壁ごとに確認する。Streamlit には依存しない。
+"""
+import copy
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.pipeline import STAGE_NAMES, pipeline_inputs
+
+PIPELINE_STAGES = STAGE_NAMES
+MAX_WORKERS = 2
+MAX_FINISHED_JOBS = 16  # 取り込まれずに残った終了ジョブを保持する上限
+
+
+class JobCancelled(Exception):
+    """キャンセル要求を受けてジョブを中断した"""
+
+
+@dataclass
+class Job:
+    job_id: int
+    stages: Tuple[str, ...]
+    status: str = "queued"  # queued / running / done / failed / cancelled
+    stage: Optional[str] = None
+    stage_progress: float = 0.0  # 現在の段階内の進捗 0～1
+    result: Any = None
+    error: Optional[str] = None
+    detail: Optional[str] = None  # 失敗時のトレースバック
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    stage_times: Dict[str, float] = field(default_factory=dict)
+    _stage_started: float = field(default=0.0, repr=False)
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def running(self) -> bool:
+        return self.status in ("queued", "running")
+
+    @property
+    def progress(self) -> float:
+        """全体の進捗 0～1（終わった段階＋現在の段階内の進捗）"""
+        if self.status == "done":
+            return 1.0
+        if self.stage is None:
+            return 0.0
+        return (self.stages.index(self.stage) + self.stage_progress) / len(self.stages)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def begin_stage(self, stage: str) -> None:
+        """次の段階に進む（キャンセル要求があればここで中断）"""
+        self.check_cancelled()
+        now = time.perf_counter()
+        if self.stage is not None:
+            self.stage_times[self.stage] = now - self._stage_started
+        self.stage, self.stage_progress, self._stage_started = stage, 0.0, now
+
+    def report(self, done: int, total: int) -> None:
+        """段階内の進捗を報告する（キャンセル要求があればここで中断）"""
+        self.stage_progress = done / total if total else 1.0
+        self.check_cancelled()
+
+
+class JobRunner:
+    """ジョブの投入・参照・キャンセル（プロセス内で1つを共有する）"""
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: Dict[int, Job] = {}
+        self._futures: Dict[int, Any] = {}
+        self._ids = count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args, stages: Tuple[str, ...] = PIPELINE_STAGES, **kwargs) -> Job:
+        """fn(job, *args, **kwargs) をバックグラウンドで実行する。戻り値が job.result になる"""
+        with self._lock:
+            job = Job(next(self._ids), tuple(stages))
+            self._jobs[job.job_id] = job
+            self._prune()
+        future = self._futures[job.job_id] = self._pool.submit(self._execute, job, fn, args, kwargs)
+        future.add_done_callback(lambda _: self._futures.pop(job.job_id, None))
+        return job
+
+    def _execute(self, job: Job, fn, args, kwargs) -> None:
+        job.started = time.perf_counter()
+        job.status = "running"
+        try:
+            job.check_cancelled()
+            result = fn(job, *args, **kwargs)
+            if job.stage is not None:
+                job.stage_times[job.stage] = time.perf_counter() - job._stage_started
+            job.result, job.status = result, "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.error, job.detail, job.status = str(e), traceback.format_exc(), "failed"
+        finally:
+            job.finished = time.perf_counter()
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: int) -> None:
+        """キャンセルを要求する（未開始なら即取り消し、実行中なら次の確認点で中断）"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.cancel()
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            job.status = "cancelled"
+
+    def pop(self, job_id: int) -> Optional[Job]:
+        """結果を取り込んだジョブを手放す"""
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def _prune(self) -> None:
+        finished = [jid for jid, job in self._jobs.items() if not job.running]
+        for jid in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[jid]
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> JobRunner:
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
+
+
+def run_pipeline(job: Job, pipeline, inputs: Dict[str, Any]):
+    """パイプラインの全段階を実行する（メモにある段階は再利用）。戻り値は PipelineRun"""
+    return pipeline.run(inputs, job=job)
+
+
+def submit_pipeline(pipeline, project, board, rules, output_mode: str, stud_pitch: int = 455, prefer_y_long: bool = False,
+                    extra_walls: Optional[List[Any]] = None) -> Job:
+    """入力を複製してパイプラインを投入する（実行中に画面で編集されても影響しない）"""
+    inputs = copy.deepcopy(pipeline_inputs(project, board, rules, output_mode, stud_pitch, prefer_y_long, extra_walls))
+    return get_runner().submit(run_pipeline, pipeline, inputs)
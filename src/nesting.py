@@ -152,6 +152,12 @@ def simple_nesting(panels: List[Panel], board: BoardMaster, rules: Rules, prefer
                 shelf_height = h + kerf
                 part_counter += 1
 
+    # panel_ref は配置前に作った Panel の dict なので、確定したボード番号・パーツ番号を反映する
+    for it in items:
+        p = panels[it["panel_index"]]
+        it["ref"]["board_number"] = p.board_number
+        it["ref"]["part_number"] = p.part_number
+
     # 利用率
     used_area = sum(pl.w * pl.h for pl in placements)
     num_sheets = max(pl.sheet_id for pl in placements) if placements else 0
@@ -1,43 +1,61 @@
 """
 出力・レポート生成機能
 """
+import numpy as np
 import pandas as pd
 from typing import List, Dict
 from io import BytesIO
 from src.masterdata import Panel, NestPlacement, BoardMaster
 
+def _column(items, attr: str, dtype) -> np.ndarray:
+    """オブジェクト列から1属性の配列を作る"""
+    return np.fromiter((getattr(it, attr) for it in items), dtype=dtype, count=len(items))
+
+
+def _ref_column(placements: List[NestPlacement], key: str, dtype) -> np.ndarray:
+    """panel_ref（Panel の dict）から1項目の配列を作る"""
+    return np.fromiter((pl.panel_ref.get(key) for pl in placements), dtype=dtype, count=len(placements))
+
+
+def _part_numbers(n: int) -> pd.Series:
+    """P0001 形式の部材番号"""
+    return "P" + pd.Series(np.arange(1, n + 1)).astype(str).str.zfill(4)
+
+
 def df_panels(panels: List[Panel]) -> pd.DataFrame:
-    rows = []
-    for i, p in enumerate(panels, start=1):
-        rows.append({
-            "part_no": f"P{i:04d}",
-            "wall": p.wall_id,
-            "x0": round(p.x0,1),
-            "y0": round(p.y0,1),
-            "w": round(p.w,1),
-            "h": round(p.h,1),
-            "requires_cutout": p.requires_cutout,
-            "is_cut_piece": p.is_cut_piece,
-            "note": p.note
-        })
-    return pd.DataFrame(rows)
+    """部材表（列ごとに配列を作って組み立てる）"""
+    return pd.DataFrame({
+        "part_no": _part_numbers(len(panels)),
+        "wall": pd.Series([p.wall_id for p in panels], dtype=object),
+        "x0": np.round(_column(panels, "x0", np.float64), 1),
+        "y0": np.round(_column(panels, "y0", np.float64), 1),
+        "w": np.round(_column(panels, "w", np.float64), 1),
+        "h": np.round(_column(panels, "h", np.float64), 1),
+        "requires_cutout": _column(panels, "requires_cutout", bool),
+        "is_cut_piece": _column(panels, "is_cut_piece", bool),
+        "note": pd.Series([p.note for p in panels], dtype=object),
+    })
 
 def df_errors(errors: List[Dict]) -> pd.DataFrame:
     return pd.DataFrame(errors)
 
 def df_boards(placements: List[NestPlacement], board: BoardMaster) -> pd.DataFrame:
-    rows = []
-    for pl in placements:
-        rows.append({
-            "board_id": pl.sheet_id,
-            "x": round(pl.x,1),
-            "y": round(pl.y,1),
-            "w": round(pl.w,1),
-            "h": round(pl.h,1),
-            "rotated": pl.rotated,
-            "panel_ref": pl.panel_ref
-        })
-    return pd.DataFrame(rows)
+    """
+    板取表（列ごとに配列を作って組み立てる）
+    panel_ref は壁・壁内位置・パーツ番号の列に展開する。
+    """
+    return pd.DataFrame({
+        "board_id": _column(placements, "sheet_id", np.int32),
+        "x": np.round(_column(placements, "x", np.float64), 1),
+        "y": np.round(_column(placements, "y", np.float64), 1),
+        "w": np.round(_column(placements, "w", np.float64), 1),
+        "h": np.round(_column(placements, "h", np.float64), 1),
+        "rotated": _column(placements, "rotated", bool),
+        "wall": pd.Series([pl.panel_ref.get("wall_id") for pl in placements], dtype=object),
+        "panel_x0": np.round(_ref_column(placements, "x0", np.float64), 1),
+        "panel_y0": np.round(_ref_column(placements, "y0", np.float64), 1),
+        "part_number": _ref_column(placements, "part_number", np.int32),
+    })
 
 def fig_to_png_bytes(fig) -> bytes:
     buf = BytesIO()
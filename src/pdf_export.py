@@ -0,0 +1,264 @@
+"""
+PDF 図面セット出力（平面図・壁ごとの立面図・ボードごとの板取図）
+ページの描画は matplotlib の Agg（pyplot を使わない Figure＋FigureCanvasAgg）でプロセスプールに分散し、
+パネル・部材は PatchCollection で1回にまとめて描く。各ページは RGB を zlib 圧縮した画像として受け取り、
+ページ順に1つの PDF へ逐次書き出す（全ページを同時にメモリに持たない）。
+"""
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple, Union
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PatchCollection, LineCollection
+from matplotlib.patches import Rectangle
+from src.masterdata import Project, Panel, NestPlacement, BoardMaster
+from src.logic import place_opening_position
+
+PAGE_SIZE = (11.69, 8.27)  # A4 横（インチ）
+PAGE_DPI = 100
+MAX_WORKERS = 4
+PARALLEL_MIN_PAGES = 8  # これ未満のページ数はプロセスを起動せずに描く
+
+_PANEL_COLOR = "#c4f4c4"
+_CUT_COLOR = "#9bd3ff"
+_OPENING_COLOR = "#d9534f"
+
+
+# ---- ページ仕様（プロセス間で受け渡す軽いデータ） ----
+
+def _rects(items) -> np.ndarray:
+    return np.array(items, dtype=np.float64).reshape(-1, 4)
+
+
+def drawing_set_pages(project: Project, panels: List[Panel], placements: List[NestPlacement], board: BoardMaster,
+                      structural_system=None, wall_info: Optional[Dict[str, Dict]] = None) -> List[Dict[str, Any]]:
+    """図面セットのページ仕様（平面図→各壁の立面図→各ボードの板取図）"""
+    from src.allocating import calculate_corner_winning_rules
+    from src.plan_lod import build_plan_lod
+
+    if wall_info is None:
+        wall_info = calculate_corner_winning_rules(project.room.polygon, project.room.wall_thickness)
+    H = project.room.height
+    pages: List[Dict[str, Any]] = []
+
+    # 平面図
+    lod = build_plan_lod(project, structural_system, panels)
+    plan = {
+        "kind": "plan", "title": f"Plan  {project.project_id}  {project.room.room_id}",
+        "polygon": np.array(project.room.polygon, dtype=np.float64),
+        "panel_segments": lod.panel_segments, "panel_cut": np.array([row[3] == "Yes" for row in lod.panel_rows], dtype=bool),
+        "walls": [(wid, w["start"], w["end"]) for wid, w in wall_info.items()],
+        "studs": np.zeros((0, 2)), "kings": np.zeros((0, 2)), "columns": np.zeros((0, 4)),
+    }
+    if structural_system is not None:
+        studs = structural_system.stud_table
+        king = studs.stud_type == 1
+        plan["studs"] = np.stack([studs.x[~king], studs.y[~king]], axis=1).astype(np.float64)
+        plan["kings"] = np.stack([studs.x[king], studs.y[king]], axis=1).astype(np.float64)
+        cols = structural_system.column_table
+        plan["columns"] = np.stack([cols.x - cols.width / 2, cols.y - cols.depth / 2, cols.width, cols.depth], axis=1).astype(np.float64)
+    pages.append(plan)
+
+    # 壁立面図
+    panels_by_wall: Dict[str, List[Panel]] = {}
+    for p in panels:
+        panels_by_wall.setdefault(p.wall_id, []).append(p)
+    for wid, wall in wall_info.items():
+        L = wall["length"]
+        wall_panels = panels_by_wall.get(wid, [])
+        openings = []
+        for op in project.openings:
+            if op.wall == wid:
+                off = place_opening_position(L, op)
+                y0 = 0 if op.type == "door" else op.sill_height
+                openings.append((off, y0, op.width, op.height, op.opening_id))
+        page = {
+            "kind": "elevation", "title": f"Elevation {wid}  L={L:.0f}mm  H={H}mm", "length": L, "height": H,
+            "panels": _rects([(p.x0, p.y0, p.w, p.h) for p in wall_panels]),
+            "cut": np.array([p.is_cut_piece for p in wall_panels], dtype=bool),
+            "labels": [f"B{p.board_number}-P{p.part_number}" if p.board_number > 0 else "" for p in wall_panels],
+            "openings": _rects([o[:4] for o in openings]), "opening_ids": [o[4] for o in openings],
+            "studs": np.zeros(0), "kings": np.zeros(0),
+        }
+        if structural_system is not None and hasattr(structural_system, "studs_for"):
+            page["studs"] = structural_system.studs_for(wid, "regular").wall_position.astype(np.float64)
+            page["kings"] = structural_system.studs_for(wid, "king").wall_position.astype(np.float64)
+        pages.append(page)
+
+    # 板取図
+    from src.visualization import group_placements_by_sheet
+    sheets = group_placements_by_sheet(placements)
+    for n, (sid, items) in enumerate(sheets.items(), start=1):
+        pages.append({
+            "kind": "sheet", "title": f"Sheet B{sid}  ({n}/{len(sheets)})  {board.name}",
+            "width": board.raw_width, "height": board.raw_height,
+            "rects": _rects([(pl.x, pl.y, pl.w, pl.h) for pl in items]),
+            "cut": np.array([bool((pl.panel_ref or {}).get("is_cut_piece")) for pl in items], dtype=bool),
+            "labels": [f"{(pl.panel_ref or {}).get('wall_id', '')} P{(pl.panel_ref or {}).get('part_number', 0)}" for pl in items],
+        })
+    return pages
+
+
+# ---- ページ描画（ワーカープロセスで実行） ----
+
+def _rect_collection(rects: np.ndarray, facecolors, **kwargs) -> PatchCollection:
+    patches = [Rectangle((x, y), w, h) for x, y, w, h in rects.tolist()]
+    return PatchCollection(patches, facecolors=facecolors, **kwargs)
+
+
+def _draw_plan(ax, page: Dict[str, Any]) -> None:
+    poly = np.vstack([page["polygon"], page["polygon"][:1]])
+    ax.plot(poly[:, 0], poly[:, 1], "-k", lw=1.5)
+    if len(page["columns"]):
+        ax.add_collection(_rect_collection(page["columns"], "darkgray", edgecolors="dimgray", linewidths=0.5))
+    seg = page["panel_segments"]
+    if len(seg):
+        colors = np.where(page["panel_cut"], _CUT_COLOR, "green")
+        ax.add_collection(LineCollection(seg.reshape(-1, 2, 2), colors=colors, linewidths=3))
+    if len(page["studs"]):
+        ax.scatter(page["studs"][:, 0], page["studs"][:, 1], s=4, marker="s", c="gray", linewidths=0)
+    if len(page["kings"]):
+        ax.scatter(page["kings"][:, 0], page["kings"][:, 1], s=8, marker="s", c="darkorange", linewidths=0)
+    for wid, start, end in page["walls"]:
+        ax.text((start[0] + end[0]) / 2, (start[1] + end[1]) / 2, wid, ha="center", va="center", fontsize=8, color="blue")
+    ax.set_aspect("equal", "datalim")
+
+
+def _draw_elevation(ax, page: Dict[str, Any]) -> None:
+    L, H = page["length"], page["height"]
+    ax.add_patch(Rectangle((0, 0), L, H, fill=False, ec="k", lw=1.2))
+    if len(page["panels"]):
+        ax.add_collection(_rect_collection(page["panels"], np.where(page["cut"], _CUT_COLOR, _PANEL_COLOR),
+                                           edgecolors="k", linewidths=0.4))
+        for (x, y, w, h), label in zip(page["panels"].tolist(), page["labels"]):
+            if label:
+                ax.text(x + w / 2, y + h / 2, label, ha="center", va="center", fontsize=5, rotation=90)
+    if len(page["openings"]):
+        ax.add_collection(_rect_collection(page["openings"], _OPENING_COLOR, alpha=0.5, edgecolors=_OPENING_COLOR))
+        for (x, y, w, h), oid in zip(page["openings"].tolist(), page["opening_ids"]):
+            ax.text(x + w / 2, y + h / 2, oid, ha="center", va="center", fontsize=7, color="white")
+    for positions, color, lw in ((page["studs"], "gray", 0.5), (page["kings"], "darkorange", 1.0)):
+        if len(positions):
+            ax.vlines(positions, 0, H, colors=color, linewidths=lw, linestyles="dashed" if color == "gray" else "solid")
+    ax.set_xlim(-50, L + 50)
+    ax.set_ylim(-50, H + 50)
+    ax.set_aspect("equal", "box")
+
+
+def _draw_sheet(ax, page: Dict[str, Any]) -> None:
+    W, H = page["width"], page["height"]
+    ax.add_patch(Rectangle((0, 0), W, H, fill=False, ec="k", lw=1.2))
+    if len(page["rects"]):
+        ax.add_collection(_rect_collection(page["rects"], np.where(page["cut"], _CUT_COLOR, _PANEL_COLOR),
+                                           edgecolors="k", linewidths=0.5))
+        for (x, y, w, h), label in zip(page["rects"].tolist(), page["labels"]):
+            ax.text(x + w / 2, y + h / 2, label, ha="center", va="center", fontsize=6)
+    ax.set_xlim(-20, W + 20)
+    ax.set_ylim(-20, H + 20)
+    ax.set_aspect("equal", "box")
+
+
+_DRAW = {"plan": _draw_plan, "elevation": _draw_elevation, "sheet": _draw_sheet}
+
+
+def render_page(page: Dict[str, Any], dpi: int = PAGE_DPI) -> Tuple[int, int, bytes, float]:
+    """1ページを Agg で描画し (幅px, 高さpx, zlib 圧縮 RGB, 秒) を返す"""
+    t0 = time.perf_counter()
+    fig = Figure(figsize=PAGE_SIZE, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    _DRAW[page["kind"]](ax, page)
+    ax.set_title(page["title"], fontsize=10)
+    ax.grid(True, alpha=0.2)
+    ax.tick_params(labelsize=7)
+    canvas.draw()
+    rgba = np.asarray(canvas.buffer_rgba())
+    h, w = rgba.shape[:2]
+    data = zlib.compress(np.ascontiguousarray(rgba[:, :, :3]).tobytes(), 6)
+    return w, h, data, time.perf_counter() - t0
+
+
+def _render_args(args):
+    return render_page(*args)
+
+
+# ---- PDF 組み立て ----
+
+class _PdfImageWriter:
+    """画像1枚ずつのページを PDF に逐次書き出す（オブジェクト 1=Catalog, 2=Pages）"""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.pos = 0
+        self.offsets: Dict[int, int] = {}
+        self.pages: List[int] = []
+        self.next_id = 3
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data: bytes) -> None:
+        self.stream.write(data)
+        self.pos += len(data)
+
+    def _obj(self, num: int, body: bytes, stream: Optional[bytes] = None) -> None:
+        self.offsets[num] = self.pos
+        self._write(f"{num} 0 obj\n".encode() + body)
+        if stream is not None:
+            self._write(b"\nstream\n" + stream + b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def add_page(self, width: int, height: int, data: bytes, dpi: int) -> None:
+        image, content, page = self.next_id, self.next_id + 1, self.next_id + 2
+        self.next_id += 3
+        pw, ph = width * 72 / dpi, height * 72 / dpi
+        self._obj(image, (f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB "
+                          f"/BitsPerComponent 8 /Filter /FlateDecode /Length {len(data)} >>").encode(), data)
+        ops = f"q {pw:.2f} 0 0 {ph:.2f} 0 0 cm /Im0 Do Q".encode()
+        self._obj(content, f"<< /Length {len(ops)} >>".encode(), ops)
+        self._obj(page, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {pw:.2f} {ph:.2f}] "
+                         f"/Resources << /XObject << /Im0 {image} 0 R >> >> /Contents {content} 0 R >>").encode())
+        self.pages.append(page)
+
+    def close(self) -> None:
+        kids = " ".join(f"{p} 0 R" for p in self.pages)
+        self._obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode())
+        self._obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self.pos
+        lines = [f"xref\n0 {self.next_id}\n", "0000000000 65535 f \n"]
+        lines += [f"{self.offsets.get(i, 0):010d} 00000 n \n" for i in range(1, self.next_id)]
+        self._write("".join(lines).encode())
+        self._write(f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+def export_drawing_set(target: Union[str, BinaryIO], pages: List[Dict[str, Any]], workers: Optional[int] = None,
+                       dpi: int = PAGE_DPI) -> List[Dict[str, Any]]:
+    """
+    ページ仕様を描画して1つの PDF に書き出す。workers 未指定時は CPU 数（最大 MAX_WORKERS）のプロセスで描画し、
+    ページ数が PARALLEL_MIN_PAGES 未満または workers=1 のときは同じプロセスで描く。
+    戻り値はページごとの描画時間 [{"page", "title", "sec"}]。
+    """
+    if isinstance(target, str):
+        with open(target, "wb") as f:
+            return export_drawing_set(f, pages, workers, dpi)
+
+    if workers is None:
+        workers = min(os.cpu_count() or 1, MAX_WORKERS)
+    writer = _PdfImageWriter(target)
+    timings = []
+
+    def collect(results) -> None:
+        for n, (page, (w, h, data, sec)) in enumerate(zip(pages, results), start=1):
+            writer.add_page(w, h, data, dpi)
+            timings.append({"page": n, "title": page["title"], "sec": round(sec, 3)})
+
+    if workers <= 1 or len(pages) < PARALLEL_MIN_PAGES:
+        collect(render_page(page, dpi) for page in pages)
+    else:
+        # Streamlit のスレッドから安全に起動できるよう spawn を使う。結果はページ順に受け取って書き出す
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            collect(pool.map(_render_args, ((page, dpi) for page in pages), chunksize=4))
+    writer.close()
+    return timings
@@ -0,0 +1,192 @@
+"""
+割付パイプライン（段階ごとのメモ化）
+各段階は使う入力（"rules.kerf" のような属性パス）と上流の段階を宣言し、
+入力と上流の指紋が前回と同じなら結果を再利用する。変更の下流にある段階だけが再計算される
+（例: Rules.kerf だけを変えると板取・帳票のみ再計算し、割付・構造生成は再利用）。
+セッションのメモに無い段階は、プロセス共有キャッシュ（shared_cache）を引いてから計算する。
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+MEMO_SIZE = 8  # 段階ごとに保持する結果の数（元に戻した条件の結果も再利用できるように）
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    fn: Callable[[Dict[str, Any]], Any]
+    inputs: Tuple[str, ...] = ()  # fn が使う入力の属性パス（ここに無い値を使うと変更を検知できない）
+    deps: Tuple[str, ...] = ()    # 上流の段階（fn には段階名で結果が渡る）
+
+
+@dataclass
+class PipelineRun:
+    outputs: Dict[str, Any]
+    keys: Dict[str, str]          # 段階 → 指紋
+    recomputed: Dict[str, bool]   # 段階 → 今回計算したか（False はメモ・共有キャッシュの再利用）
+    shared: Dict[str, bool]       # 段階 → 共有キャッシュから取り出したか
+
+
+def resolve(inputs: Dict[str, Any], path: str) -> Any:
+    """"rules.kerf" のような属性パスの値"""
+    name, *attrs = path.split(".")
+    value = inputs[name]
+    for attr in attrs:
+        value = value[attr] if isinstance(value, dict) else getattr(value, attr)
+    return value
+
+
+def fingerprint(value: Any) -> str:
+    """repr による指紋（dataclass・list・tuple・数値・文字列の入力を想定）"""
+    return hashlib.blake2b(repr(value).encode(), digest_size=16).hexdigest()
+
+
+class Pipeline:
+    """段階の DAG（宣言順に実行するので、上流の段階を先に並べる）"""
+
+    def __init__(self, stages: Iterable[Stage], memo_size: int = MEMO_SIZE, shared=None):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            missing = [d for d in stage.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"段階 {stage.name} の上流 {missing} が先に宣言されていません")
+            self.stages[stage.name] = stage
+        self.memo_size = memo_size
+        self.shared = shared  # SharedCache（None なら共有しない）
+        self._memo: Dict[str, "OrderedDict[str, Any]"] = {name: OrderedDict() for name in self.stages}
+        self._lock = threading.Lock()
+
+    def plan(self, targets: Iterable[str]) -> List[str]:
+        """targets とその上流の段階（実行順）"""
+        needed, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.stages[name].deps)
+        return [name for name in self.stages if name in needed]
+
+    def run(self, inputs: Dict[str, Any], targets: Optional[Iterable[str]] = None, job=None) -> PipelineRun:
+        """
+        targets（省略時は全段階）を計算する。job を渡すと job.stages にある段階で begin_stage を呼ぶ（進捗・キャンセル）。
+        fn に渡す ctx は inputs＋上流の結果＋"job"＋"previous"（同じ段階の直近の結果、差分更新用）。
+        """
+        with self._lock:
+            outputs: Dict[str, Any] = {}
+            keys: Dict[str, str] = {}
+            recomputed: Dict[str, bool] = {}
+            shared: Dict[str, bool] = {}
+            for name in self.plan(targets if targets is not None else self.stages):
+                stage = self.stages[name]
+                if job is not None and name in job.stages:
+                    job.begin_stage(name)
+                key = fingerprint((tuple(resolve(inputs, p) for p in stage.inputs), tuple(keys[d] for d in stage.deps)))
+                memo = self._memo[name]
+                recomputed[name] = shared[name] = False
+                if key in memo:
+                    memo.move_to_end(key)
+                else:
+                    value = self.shared.get((name, key)) if self.shared is not None else None
+                    if value is not None:
+                        shared[name] = True
+                    else:
+                        previous = next(reversed(memo.values())) if memo else None
+                        ctx = {**inputs, **{d: outputs[d] for d in stage.deps}, "job": job, "previous": previous}
+                        value = stage.fn(ctx)
+                        recomputed[name] = True
+                        if self.shared is not None:
+                            self.shared.put((name, key), value)
+                    memo[key] = value
+                    while len(memo) > self.memo_size:
+                        memo.popitem(last=False)
+                outputs[name], keys[name] = memo[key], key
+            return PipelineRun(outputs, keys, recomputed, shared)
+
+    def clear(self) -> None:
+        with self._lock:
+            for memo in self._memo.values():
+                memo.clear()
+
+
+# ---- 割付・板取の段階 ----
+
+def _allocation(ctx: Dict[str, Any]):
+    from src.allocating import allocate_walls_with_architectural_constraints
+    job = ctx["job"]
+    return allocate_walls_with_architectural_constraints(
+        ctx["project"], ctx["board"], ctx["rules"], ctx["output_mode"], ctx["stud_pitch"],
+        extra_walls=ctx["extra_walls"], progress=job.report if job is not None else None
+    )
+
+
+def _nesting(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    from src.nesting import simple_nesting
+    # 板取はパネルにボード・パーツ番号を書き込むので、割付の結果（メモ）は複製してから渡す
+    panels = [replace(p) for p in ctx["allocation"][0]]
+    placements, util, num_sheets = simple_nesting(panels, ctx["board"], ctx["rules"], ctx["prefer_y_long"])
+    return {"panels": panels, "placements": placements, "utilization": util, "num_sheets": num_sheets}
+
+
+def _structural(ctx: Dict[str, Any]):
+    from src.structural import generate_structural_system
+    system = generate_structural_system(ctx["project"], ctx["material"], ctx["stud_pitch"],
+                                        extra_walls=ctx["extra_walls"], previous=ctx["previous"])
+    for layer in ("grid_lines", "column_table", "beam_table", "stud_table", "stud_ranges", "violations"):
+        getattr(system, layer)  # 遅延生成のレイヤをここで作っておき、画面側で待たせない
+    return system
+
+
+def _tables(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    from src.output import df_panels, df_boards, df_errors
+    nesting = ctx["nesting"]
+    return {
+        "df_panels": df_panels(nesting["panels"]),
+        "df_boards": df_boards(nesting["placements"], ctx["board"]),
+        "df_errors": df_errors(ctx["allocation"][1]),
+    }
+
+
+PROJECT_GEOMETRY = ("project.room.polygon", "project.room.wall_thickness", "project.room.height", "project.openings")
+
+STAGES = (
+    Stage("allocation", _allocation,
+          inputs=PROJECT_GEOMETRY + ("board.raw_width", "board.raw_height", "rules.min_piece", "output_mode", "stud_pitch", "extra_walls")),
+    Stage("nesting", _nesting, inputs=("board.raw_width", "board.raw_height", "board.rotatable", "rules.kerf", "prefer_y_long"),
+          deps=("allocation",)),
+    Stage("structural", _structural, inputs=PROJECT_GEOMETRY + ("material", "stud_pitch", "extra_walls")),
+    Stage("tables", _tables, inputs=("board",), deps=("allocation", "nesting")),
+)
+STAGE_NAMES = tuple(stage.name for stage in STAGES)
+
+
+def default_pipeline() -> Pipeline:
+    """割付・板取の段階（プロセス共有キャッシュ付き）"""
+    from src.shared_cache import shared_cache
+    return Pipeline(STAGES, shared=shared_cache())
+
+
+def pipeline_inputs(project, board, rules, output_mode: str, stud_pitch: int = 455, prefer_y_long: bool = False,
+                    extra_walls: Optional[List[Any]] = None, material: str = "S") -> Dict[str, Any]:
+    return {
+        "project": project, "board": board, "rules": rules, "output_mode": output_mode, "stud_pitch": stud_pitch,
+        "prefer_y_long": prefer_y_long, "extra_walls": list(extra_walls or []), "material": material,
+    }
+
+
+def results_from_run(run: PipelineRun) -> Dict[str, Any]:
+    """セッションに保存する結果 dict（pipeline_key は割付・板取の指紋で、同じなら結果も同じ）"""
+    errors = run.outputs["allocation"][1]
+    nesting = run.outputs["nesting"]
+    alloc_time = next((e.get("sec", 0) for e in errors if e.get("code") == "INFO-TIME" and e.get("phase") == "allocation"), 0)
+    return {
+        "panels": nesting["panels"],
+        "errors": errors,
+        "placements": nesting["placements"],
+        "utilization": nesting["utilization"],
+        "num_sheets": nesting["num_sheets"],
+        "alloc_time": alloc_time,
+        "pipeline_key": run.keys["nesting"],
+    }
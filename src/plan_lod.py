@@ -0,0 +1,145 @@
+"""
+平面プレビューの詳細度（LOD）レイヤ
+部屋・構造・割付結果から、全体表示用の集約レイヤ（壁ごとのパネル帯・壁の集計）と
+拡大表示用の部材レイヤ（パネル1枚ずつの線分）を一度だけ作って保持し、表示範囲（viewport）で切り出す。
+間柱の座標は StructuralSystem の間柱表（配列）をそのまま使う。
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from src.masterdata import Panel
+from src.allocating import calculate_corner_winning_rules
+
+LOD_DETAIL_LIMIT = 1500  # 全体表示でも部材を個別に描く上限（間柱＋パネルの本数）
+
+Viewport = Tuple[float, float, float, float]  # (x0, y0, x1, y1) mm
+
+
+def _panel_color(panel: Panel) -> str:
+    from src.visualization import get_panel_color
+    return get_panel_color(panel)
+
+
+def _inner_segment(wid: str, wall: Dict, a: float, b: float, inset: float) -> Tuple[float, float, float, float]:
+    """壁の始点から a～b mm の区間を、壁の内側面（inset だけ内側）の線分にする"""
+    (sx, sy), (ex, ey) = wall["start"], wall["end"]
+    t0, t1 = a / wall["length"], b / wall["length"]
+    # W1 下壁・W4 左壁は +、W2 右壁・W3 上壁は -
+    offset = inset if wid in ("W1", "W4") else -inset
+    if wall["direction"] == "horizontal":
+        return (sx + t0 * (ex - sx), sy + offset, sx + t1 * (ex - sx), sy + offset)
+    return (sx + offset, sy + t0 * (ey - sy), sx + offset, sy + t1 * (ey - sy))
+
+
+def _merge_runs(intervals: List[Tuple[float, float]], gap: float = 1.0) -> List[Tuple[float, float]]:
+    """隣接・重なる区間をまとめる"""
+    runs: List[List[float]] = []
+    for a, b in sorted(intervals):
+        if runs and a <= runs[-1][1] + gap:
+            runs[-1][1] = max(runs[-1][1], b)
+        else:
+            runs.append([a, b])
+    return [(a, b) for a, b in runs]
+
+
+def segments_in_viewport(segments: np.ndarray, viewport: Optional[Viewport]) -> np.ndarray:
+    """外接矩形が表示範囲にかかる線分のインデックス（viewport=None は全件）"""
+    if viewport is None:
+        return np.arange(len(segments))
+    x0, y0, x1, y1 = viewport
+    lo_x = np.minimum(segments[:, 0], segments[:, 2])
+    hi_x = np.maximum(segments[:, 0], segments[:, 2])
+    lo_y = np.minimum(segments[:, 1], segments[:, 3])
+    hi_y = np.maximum(segments[:, 1], segments[:, 3])
+    return np.flatnonzero((lo_x <= x1) & (hi_x >= x0) & (lo_y <= y1) & (hi_y >= y0))
+
+
+def points_in_viewport(x: np.ndarray, y: np.ndarray, viewport: Optional[Viewport]) -> np.ndarray:
+    """表示範囲内の点のマスク（viewport=None は全件）"""
+    if viewport is None:
+        return np.ones(len(x), dtype=bool)
+    x0, y0, x1, y1 = viewport
+    return (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+
+
+@dataclass
+class PlanLOD:
+    """平面プレビューの事前計算済みレイヤ（元にした構造・結果の version で照合してキャッシュする）"""
+    structural: Any
+    results_version: int
+    board_thickness: float
+    wall_info: Dict[str, Dict]
+    panel_segments: np.ndarray  # (n, 4) x0, y0, x1, y1
+    panel_colors: List[str]
+    panel_rows: List[Tuple]  # (壁ID, 幅, ボード-パーツ, 端材, 備考)
+    panel_bands: Dict[str, np.ndarray] = field(default_factory=dict)  # 色 → 集約した帯 (m, 4)
+    wall_rows: List[Tuple] = field(default_factory=list)  # (壁ID, 中心x, 中心y, 長さ, 間柱, キング, パネル)
+    stud_count: int = 0
+
+    @property
+    def member_count(self) -> int:
+        return self.stud_count + len(self.panel_rows)
+
+    def matches(self, structural, results_version: int, board_thickness: float) -> bool:
+        return (self.structural is structural and self.results_version == results_version
+                and self.board_thickness == board_thickness)
+
+    def panels_by_color(self, viewport: Optional[Viewport] = None) -> Dict[str, np.ndarray]:
+        """表示範囲にかかるパネルのインデックスを色ごとに"""
+        result: Dict[str, List[int]] = {}
+        for i in segments_in_viewport(self.panel_segments, viewport).tolist():
+            result.setdefault(self.panel_colors[i], []).append(i)
+        return {color: np.array(index, dtype=np.int64) for color, index in result.items()}
+
+
+def build_plan_lod(project, structural_system, panels: List[Panel], board_thickness: float = 12.5,
+                   results_version: int = 0) -> PlanLOD:
+    """平面プレビューの LOD レイヤを作る（壁の位置・パネルの線分・集約帯・壁ごとの集計）"""
+    wall_info = calculate_corner_winning_rules(project.room.polygon, project.room.wall_thickness)
+    inset = project.room.wall_thickness - board_thickness / 2
+
+    segments, colors, rows = [], [], []
+    runs: Dict[Tuple[str, str], List[Tuple[float, float]]] = {}
+    panel_count: Dict[str, int] = {}
+    for panel in panels:
+        wall = wall_info.get(panel.wall_id)
+        if wall is None:  # 新規壁のパネルは平面プレビューには表示しない
+            continue
+        color = _panel_color(panel)
+        segments.append(_inner_segment(panel.wall_id, wall, panel.x0, panel.x0 + panel.w, inset))
+        colors.append(color)
+        rows.append((panel.wall_id, panel.w, f"B{panel.board_number}-P{panel.part_number}",
+                     "Yes" if panel.is_cut_piece else "No", panel.note))
+        runs.setdefault((panel.wall_id, color), []).append((panel.x0, panel.x0 + panel.w))
+        panel_count[panel.wall_id] = panel_count.get(panel.wall_id, 0) + 1
+
+    bands: Dict[str, List[Tuple]] = {}
+    for (wid, color), intervals in runs.items():
+        for a, b in _merge_runs(intervals):
+            bands.setdefault(color, []).append(_inner_segment(wid, wall_info[wid], a, b, inset))
+
+    stud_count = 0
+    stud_counts: Dict[Tuple[str, str], int] = {}
+    if structural_system is not None:
+        stud_count = len(structural_system.stud_table)
+        stud_counts = {key: stop - start for key, (start, stop) in structural_system.stud_ranges.items()}
+
+    wall_rows = []
+    for wid, wall in wall_info.items():
+        wall_rows.append((
+            wid, (wall["start"][0] + wall["end"][0]) / 2, (wall["start"][1] + wall["end"][1]) / 2, wall["length"],
+            stud_counts.get((wid, "regular"), 0), stud_counts.get((wid, "king"), 0), panel_count.get(wid, 0)
+        ))
+
+    return PlanLOD(
+        structural=structural_system,
+        results_version=results_version,
+        board_thickness=board_thickness,
+        wall_info=wall_info,
+        panel_segments=np.array(segments, dtype=np.float64).reshape(-1, 4),
+        panel_colors=colors,
+        panel_rows=rows,
+        panel_bands={color: np.array(segs, dtype=np.float64).reshape(-1, 4) for color, segs in bands.items()},
+        wall_rows=wall_rows,
+        stud_count=stud_count,
+    )
@@ -0,0 +1,144 @@
+"""
+構造ルールチェック（配列表現に対する一括判定）
+梁スパン・開口の頭上クリアランス・間柱間隔を部材ごとのループではなく配列演算で判定し、
+違反を1つの表（DataFrame）で返す。
+"""
+from typing import List, Dict, Optional
+import numpy as np
+import pandas as pd
+from src.structural import (
+    StructuralSystem, BeamTable, StudTable, STRUCTURAL_PARAMS, STUD_PARAMS, generate_structural_system
+)
+
+VIOLATION_COLUMNS = ["rule", "code", "severity", "member_id", "wall", "value", "limit", "message"]
+
+
+def _table(rule: str, code: str, severity: str, member_ids, walls, values, limit, messages) -> pd.DataFrame:
+    n = len(member_ids)
+    return pd.DataFrame({
+        "rule": [rule] * n,
+        "code": [code] * n,
+        "severity": [severity] * n,
+        "member_id": list(member_ids),
+        "wall": list(walls),
+        "value": np.asarray(values, dtype=np.float64),
+        "limit": np.broadcast_to(np.asarray(limit, dtype=np.float64), (n,)).copy(),
+        "message": list(messages),
+    }, columns=VIOLATION_COLUMNS)
+
+
+def empty_violations() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype="float64" if c in ("value", "limit") else "object") for c in VIOLATION_COLUMNS})
+
+
+def check_beam_spans(beams: BeamTable, material: str = "RC") -> pd.DataFrame:
+    """梁スパン超過（まぐさは対象外）"""
+    max_span = STRUCTURAL_PARAMS[material]["max_span"]
+    span = beams.span()
+    idx = np.flatnonzero(~beams.is_lintel & (span > max_span))
+    ids = [beams.ids[i] for i in idx]
+    return _table(
+        "span", "E-SPAN", "error", ids, [""] * len(idx), span[idx], max_span,
+        [f"梁 {bid} のスパン超過: {int(v)}mm > {max_span}mm" for bid, v in zip(ids, span[idx])]
+    )
+
+
+def check_lintel_clearance(openings, floor_height: int, material: str = "RC") -> pd.DataFrame:
+    """開口上（まぐさ下端）の頭上クリアランス不足"""
+    required = STUD_PARAMS["lintel_clearance"]
+    if not openings:
+        return _table("clearance", "W-CLEARANCE", "warning", [], [], [], required, [])
+    lintel_depth = int(STRUCTURAL_PARAMS[material]["typical_beam_depth"] * 0.5)
+    is_door = np.array([op.type == "door" for op in openings])
+    height = np.array([op.height for op in openings], dtype=np.int64)
+    sill = np.array([op.sill_height for op in openings], dtype=np.int64)
+    top = np.where(is_door, height, sill + height)
+    clearance = floor_height - top - lintel_depth
+    idx = np.flatnonzero(clearance < required)
+    ids = [openings[i].opening_id for i in idx]
+    return _table(
+        "clearance", "W-CLEARANCE", "warning", ids, [openings[i].wall for i in idx], clearance[idx], required,
+        [f"開口 {oid} の頭上クリアランス不足: {int(c)}mm < {required}mm" for oid, c in zip(ids, clearance[idx])]
+    )
+
+
+def check_stud_spacing(studs: StudTable, min_clearance: Optional[int] = None) -> pd.DataFrame:
+    """
+    間柱間隔：隣り合う間柱が壁のピッチを超えて離れている（開口内は除く）、
+    または min_clearance 未満に近接している箇所を検出する。
+    """
+    if min_clearance is None:
+        min_clearance = STUD_PARAMS["min_clearance"]
+    if len(studs) < 2:
+        return empty_violations()
+
+    # 壁→位置→（右キング, 通常, 左キング）の順に並べ、開口の入れ子深さを累積和で求める
+    side_rank = np.where(studs.side == 2, 0, np.where(studs.side == 1, 2, 1))
+    order = np.lexsort((side_rank, studs.wall_position, studs.wall_index))
+    wall_index = studs.wall_index[order]
+    pos = studs.wall_position[order].astype(np.int64)
+    delta = np.where(studs.side[order] == 1, 1, np.where(studs.side[order] == 2, -1, 0))
+    depth = np.cumsum(delta)
+
+    same_wall = wall_index[1:] == wall_index[:-1]
+    gap = pos[1:] - pos[:-1]
+    in_opening = depth[:-1] > 0
+    pitch = np.array([studs.wall_pitch.get(studs.wall_ids[w], 0) for w in range(len(studs.wall_ids))], dtype=np.int64)
+    wall_pitch = pitch[wall_index[:-1]]
+
+    too_wide = np.flatnonzero(same_wall & ~in_opening & (wall_pitch > 0) & (gap > wall_pitch))
+    too_close = np.flatnonzero(same_wall & (gap < min_clearance))
+
+    def ids(k: np.ndarray) -> List[str]:
+        return [f"{studs.stud_id(order[i])}-{studs.stud_id(order[i + 1])}" for i in k]
+
+    def walls(k: np.ndarray) -> List[str]:
+        return [studs.wall_ids[wall_index[i]] for i in k]
+
+    frames = [
+        _table("stud_spacing", "E-STUD-SPACING", "error", ids(too_wide), walls(too_wide), gap[too_wide],
+               wall_pitch[too_wide], [f"間柱間隔超過: {int(g)}mm > {int(p)}mm" for g, p in zip(gap[too_wide], wall_pitch[too_wide])]),
+        _table("stud_spacing", "W-STUD-CLOSE", "warning", ids(too_close), walls(too_close), gap[too_close],
+               min_clearance, [f"間柱近接: {int(g)}mm < {min_clearance}mm" for g in gap[too_close]]),
+    ]
+    frames = [f for f in frames if len(f)]
+    return pd.concat(frames, ignore_index=True) if frames else empty_violations()
+
+
+def run_rule_checks(system: StructuralSystem, rules: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    構造システム全体にルールチェックを一括実行し、違反表を返す。
+    rules で "span" / "clearance" / "stud_spacing" を選択（省略時はすべて）。
+    """
+    rules = rules or ["span", "clearance", "stud_spacing"]
+    frames = []
+    if "span" in rules:
+        frames.append(check_beam_spans(system.beam_table, system.material))
+    if "clearance" in rules:
+        openings = [op for op in system.openings if op.wall in system.wall_info]
+        frames.append(check_lintel_clearance(openings, system.floor_height, system.material))
+    if "stud_spacing" in rules:
+        frames.append(check_stud_spacing(system.stud_table))
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return empty_violations()
+    return pd.concat(frames, ignore_index=True)
+
+
+def check_building(project, material: str = "RC", stud_pitch: int = 455, extra_walls=None,
+                   rules: Optional[List[str]] = None) -> pd.DataFrame:
+    """案件（外周壁＋新規壁）の構造を生成してルールチェックまで1回で実行する"""
+    system = generate_structural_system(project, material, stud_pitch, extra_walls=extra_walls)
+    return run_rule_checks(system, rules)
+
+
+def span_violation_records(violations: pd.DataFrame) -> List[Dict]:
+    """スパン違反表を StructuralSystem.violations の辞書形式に変換"""
+    spans = violations[violations["code"] == "E-SPAN"]
+    return [{
+        "code": "E-SPAN",
+        "beam_id": row.member_id,
+        "span": row.value,
+        "max_span": int(row.limit),
+        "message": row.message,
+    } for row in spans.itertuples(index=False)]
@@ -0,0 +1,321 @@
+"""
+割付・板取の HTTP サービス（ASGI、外部ライブラリ不要）
+CEDXM を POST すると割付・板取を実行し、パネル・配置・エラーを JSON で返す。
+計算はスレッドプールで行い、同時実行数と待ち行列の長さに上限を設ける（満杯なら 503）。
+計算はパイプライン（共有キャッシュ付き）を通すので、同じ CEDXM・条件の再投入は計算しない。
+
+起動: python -m src.service --port 8000   （uvicorn 等の ASGI サーバーなら src.service:app を指定）
+API:
+  GET  /health    … 稼働状況（実行中・待ち・上限）
+  POST /allocate  … 本文に CEDXM（XML）。クエリ: stud_pitch, prefer_y_long, output_mode, min_piece, clearance, kerf, joint
+                    （min_piece 等は 0 以上、output_mode は OUTPUT_MODES のいずれか。不正なら 400）
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+MAX_WORKERS = 2          # 同時に計算するリクエスト数
+MAX_QUEUE = 8            # 計算待ちで受け付けるリクエスト数（超えたら 503）
+MAX_BODY_BYTES = 10 * 1024 * 1024
+REQUEST_TIMEOUT = 120.0  # 秒（超えたら 504。計算自体は最後まで走り、結果は共有キャッシュに残る）
+RULE_FIELDS = ("min_piece", "clearance", "kerf", "joint")
+# 出力モード（設定タブと同じく英語名・旧名「良物」も受け付ける）
+OUTPUT_MODES = {"真物": "真物", "セミ": "セミ", "フル": "フル", "良物": "真物", "Good": "真物", "Semi": "セミ", "Full": "フル"}
+
+
+class ServiceError(Exception):
+    """HTTP ステータス付きのエラー（JSON の {"error": msg} で返す）"""
+
+    def __init__(self, status: int, msg: str):
+        super().__init__(msg)
+        self.status = status
+        self.msg = msg
+
+
+def _int_param(params: Dict[str, str], name: str, default: int) -> int:
+    try:
+        return int(params.get(name, default))
+    except ValueError:
+        raise ServiceError(400, f"{name} は整数で指定してください")
+
+
+def allocate_cedxm(content: str, params: Dict[str, str]) -> Dict[str, Any]:
+    """CEDXM 文字列とクエリから割付・板取を実行し、JSON にできる dict を返す（ワーカースレッドで実行）"""
+    from src.cedxm import load_cedxm, create_board_from_height
+    from src.masterdata import default_master
+    from src.pipeline import Pipeline, STAGES, pipeline_inputs
+    from src.shared_cache import shared_cache
+
+    try:
+        project = load_cedxm(content)
+    except Exception as e:  # XML の構文エラー・必須要素の欠落
+        raise ServiceError(400, f"CEDXM を読み込めません: {e}")
+    _board, rules, output_mode = default_master()
+    board = create_board_from_height(project.room.height)
+    overrides = {f: _int_param(params, f, getattr(rules, f)) for f in RULE_FIELDS}
+    negative = [f for f, v in overrides.items() if v < 0]
+    if negative:
+        raise ServiceError(400, f"{', '.join(negative)} は 0 以上で指定してください")
+    rules = replace(rules, **overrides)
+    stud_pitch = _int_param(params, "stud_pitch", 455)
+    if stud_pitch <= 0:
+        raise ServiceError(400, "stud_pitch は正の整数で指定してください")
+    prefer_y_long = params.get("prefer_y_long", "false").lower() in ("1", "true", "yes")
+    output_mode = OUTPUT_MODES.get(params.get("output_mode", output_mode))
+    if output_mode is None:
+        raise ServiceError(400, f"output_mode は {' / '.join(OUTPUT_MODES)} のいずれかで指定してください")
+
+    t0 = time.perf_counter()
+    run = Pipeline(STAGES, shared=shared_cache()).run(
+        pipeline_inputs(project, board, rules, output_mode, stud_pitch, prefer_y_long), targets=("nesting",)
+    )
+    nesting = run.outputs["nesting"]
+    return {
+        "project": {"project_id": project.project_id, "name": project.name, "room_id": project.room.room_id},
+        "board": asdict(board),
+        "rules": asdict(rules),
+        "stud_pitch": stud_pitch,
+        "panels": [asdict(p) for p in nesting["panels"]],
+        "placements": [asdict(pl) for pl in nesting["placements"]],
+        "errors": run.outputs["allocation"][1],
+        "utilization": nesting["utilization"],
+        "num_sheets": nesting["num_sheets"],
+        "stages": {name: "computed" if run.recomputed[name] else "cached" for name in run.keys},
+        "sec": round(time.perf_counter() - t0, 3),
+    }
+
+
+class WorkerPool:
+    """
+    同時実行数 max_workers・待ち max_queue のスレッドプール（イベントループ側で受付を数える）。
+    504 で応答を打ち切っても計算は続くので、枠は計算が終わったとき（future の完了）に返す。
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, max_queue: int = MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.running = 0
+        self.waiting = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="service")
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self._lock = threading.Lock()  # running と現在のループ・セマフォ（完了はワーカースレッドから通知される）
+
+    def _finished(self, _future) -> None:
+        """計算の完了（ワーカースレッドで呼ばれる）。現在のループのセマフォに枠を返す"""
+        with self._lock:
+            self.running -= 1
+            loop, slots = self._loop, self._slots
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(slots.release)
+            except RuntimeError:  # 直前にループが閉じた（次のループは running から枠を数え直す）
+                pass
+
+    async def run(self, fn: Callable, *args, timeout: float = REQUEST_TIMEOUT) -> Any:
+        if self.running + self.waiting >= self.max_workers + self.max_queue:
+            raise ServiceError(503, "混み合っています。しばらくしてから再実行してください")
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is not loop:  # セマフォはイベントループごとに作る（まだ終わらない計算の分は空きから除く）
+                self._slots, self._loop = asyncio.Semaphore(max(0, self.max_workers - self.running)), loop
+            slots = self._slots
+        self.waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self.waiting -= 1
+        with self._lock:
+            self.running += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            with self._lock:
+                self.running -= 1
+            slots.release()
+            raise
+        future.add_done_callback(self._finished)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+        except asyncio.TimeoutError:
+            raise ServiceError(504, f"{timeout:.0f} 秒以内に終わりませんでした")
+
+    def stats(self) -> Dict[str, int]:
+        return {"running": self.running, "waiting": self.waiting,
+                "max_workers": self.max_workers, "max_queue": self.max_queue}
+
+
+# ---- ASGI ----
+
+async def _read_body(receive, limit: int) -> bytes:
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ServiceError(400, "本文を受信する前に切断されました")
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            raise ServiceError(413, f"本文が大きすぎます（上限 {limit} バイト）")
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _send_json(send, status: int, payload: Any, headers: List[Tuple[bytes, bytes]] = ()) -> None:
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json; charset=utf-8"), (b"content-length", str(len(body)).encode()), *headers
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_app(max_workers: int = MAX_WORKERS, max_queue: int = MAX_QUEUE,
+               compute: Callable[[str, Dict[str, str]], Dict[str, Any]] = allocate_cedxm,
+               max_body: int = MAX_BODY_BYTES, timeout: float = REQUEST_TIMEOUT):
+    """ASGI アプリを作る（compute を差し替えるとテストで計算を置き換えられる）"""
+    pool = WorkerPool(max_workers, max_queue)
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while (await receive())["type"] != "lifespan.shutdown":
+                await send({"type": "lifespan.startup.complete"})
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+        if scope["type"] != "http":
+            return
+        method, path = scope["method"], scope["path"]
+        try:
+            if path == "/health" and method == "GET":
+                await _send_json(send, 200, {"status": "ok", **pool.stats()})
+            elif path == "/allocate" and method == "POST":
+                body = await _read_body(receive, max_body)
+                try:
+                    content = body.decode("utf-8-sig")
+                except UnicodeDecodeError:
+                    raise ServiceError(400, "本文は UTF-8 の CEDXM にしてください")
+                params = {k: v[-1] for k, v in parse_qs(scope.get("query_string", b"").decode()).items()}
+                await _send_json(send, 200, await pool.run(compute, content, params, timeout=timeout))
+            elif path in ("/health", "/allocate"):
+                raise ServiceError(405, f"{method} {path} は使えません")
+            else:
+                raise ServiceError(404, f"{path} はありません")
+        except ServiceError as e:
+            headers = [(b"retry-after", b"5")] if e.status == 503 else []
+            await _send_json(send, e.status, {"error": e.msg}, headers)
+        except Exception as e:
+            await _send_json(send, 500, {"error": f"{type(e).__name__}: {e}"})
+
+    app.pool = pool
+    return app
+
+
+app = create_app()
+
+
+# ---- ローカル実行・テスト用 ----
+
+def local_request(asgi_app, method: str, path: str, body: bytes = b"", query: str = "") -> Tuple[int, Dict[str, str], Any]:
+    """ASGI アプリをプロセス内で1回呼ぶ（ソケットを使わないクライアント）。戻り値は (status, headers, JSON)"""
+    return asyncio.run(_local_request(asgi_app, method, path, body, query))
+
+
+async def _local_request(asgi_app, method: str, path: str, body: bytes = b"", query: str = ""):
+    scope = {"type": "http", "method": method, "path": path, "query_string": query.encode(), "headers": []}
+    sent = False
+    response: Dict[str, Any] = {"body": b""}
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {k.decode(): v.decode() for k, v in message["headers"]}
+        else:
+            response["body"] += message.get("body", b"")
+
+    await asgi_app(scope, receive, send)
+    return response["status"], response["headers"], json.loads(response["body"] or b"null")
+
+
+def _raw_send(writer: asyncio.StreamWriter) -> Callable:
+    """ASGI の send を HTTP/1.1 の応答としてソケットに書く"""
+    async def send(message):
+        if message["type"] == "http.response.start":
+            lines = [f"HTTP/1.1 {message['status']} \r\n"]
+            lines += [f"{k.decode()}: {v.decode()}\r\n" for k, v in message["headers"]]
+            writer.write(("".join(lines) + "connection: close\r\n\r\n").encode("latin-1"))
+        else:
+            writer.write(message.get("body", b""))
+            await writer.drain()
+    return send
+
+
+async def _handle_connection(asgi_app, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """HTTP/1.1 を1リクエストだけ受けて ASGI アプリに渡す（Content-Length の本文のみ対応、keep-alive なし）"""
+    try:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) < 2:
+            return
+        method, target = request_line[0], request_line[1]
+        headers, length = [], 0
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers.append((name.strip().lower().encode(), value.strip().encode()))
+            if name.strip().lower() == "content-length":
+                length = int(value.strip()) if value.strip().isdigit() else -1
+        if length < 0:  # 数値でない・負の Content-Length は本文の長さが分からないので読まずに 400
+            await _send_json(_raw_send(writer), 400, {"error": "Content-Length が不正です"})
+            return
+        path, _, query = target.partition("?")
+        scope = {"type": "http", "method": method, "path": path, "query_string": query.encode(), "headers": headers}
+        remaining = length
+
+        async def receive():
+            nonlocal remaining
+            if remaining <= 0:
+                return {"type": "http.request", "body": b"", "more_body": False}
+            chunk = await reader.read(min(remaining, 65536))
+            if not chunk:
+                return {"type": "http.disconnect"}
+            remaining -= len(chunk)
+            return {"type": "http.request", "body": chunk, "more_body": remaining > 0}
+
+        await asgi_app(scope, receive, _raw_send(writer))
+    finally:
+        writer.close()
+
+
+async def serve(asgi_app, host: str = "127.0.0.1", port: int = 8000) -> None:
+    server = await asyncio.start_server(lambda r, w: _handle_connection(asgi_app, r, w), host, port)
+    print(f"割付・板取サービス: http://{host}:{port}  (POST /allocate, GET /health)")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="割付・板取の HTTP サービス")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--queue", type=int, default=MAX_QUEUE)
+    args = parser.parse_args()
+    asyncio.run(serve(create_app(args.workers, args.queue), args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
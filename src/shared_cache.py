@@ -0,0 +1,89 @@
+"""
+プロセス共有の計算キャッシュ（全セッションで共有する LRU、メモリ上限付き）
+値は pickle したバイト列で持つ。サイズが正確に分かり、取り出すたびに別のオブジェクトになるので、
+あるセッションが結果を書き換えても他のセッションに影響しない。
+"""
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+SHARED_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 共有キャッシュの上限（pickle 後のバイト数）
+
+
+class SharedCache:
+    """pickle した値の LRU（合計が max_bytes を超えたら古いものから捨てる）"""
+
+    def __init__(self, max_bytes: int = SHARED_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """キャッシュにあれば値の複製（なければ None）"""
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+        return pickle.loads(data)
+
+    def put(self, key: Hashable, value: Any) -> bool:
+        """値を保存する。pickle できない値・単独で上限を超える値は保存しない（戻り値 False）"""
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return False
+        if len(data) > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._items[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+        return True
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+_shared: Optional[SharedCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache() -> SharedCache:
+    """プロセスで1つの共有キャッシュ"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SharedCache()
+        return _shared
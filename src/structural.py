@@ -1,9 +1,12 @@
 """
 構造要素（柱・梁・間柱）の生成ロジック
 """
-from dataclasses import dataclass
-from typing import List, Tuple, Optional, Dict
+from dataclasses import dataclass, replace
+from functools import cached_property
+from typing import List, Tuple, Optional, Dict, Union
 import math
+import numpy as np
+from src.logic import place_opening_position
 
 @dataclass
 class Column:
@@ -62,15 +65,415 @@ class GridLine:
     direction: str  # "X" or "Y"
     is_virtual: bool = False
 
+STUD_TYPES = ("regular", "king")
+_SIDE_NOTES = {1: "left", 2: "right"}
+
+
+def _take_list(values: List, index) -> List:
+    """リストをスライスまたはインデックス配列で取り出す"""
+    if isinstance(index, slice):
+        return values[index]
+    return [values[i] for i in np.asarray(index)]
+
+
+class _ArrayTable:
+    """配列表現の共通処理（_array_fields は ndarray、_list_fields は行ごとのリスト）"""
+    _array_fields: Tuple[str, ...] = ()
+    _list_fields: Tuple[str, ...] = ()
+
+    def __len__(self) -> int:
+        return len(getattr(self, self._array_fields[0]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def to_list(self) -> List:
+        return [self.row(i) for i in range(len(self))]
+
+    def take(self, index):
+        """スライス（ビュー）またはインデックス配列で部分表を返す"""
+        changes = {name: getattr(self, name)[index] for name in self._array_fields}
+        changes.update({name: _take_list(getattr(self, name), index) for name in self._list_fields})
+        return replace(self, **changes)
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self._array_fields)
+
+
 @dataclass
+class ColumnTable(_ArrayTable):
+    """柱の配列表現"""
+    ids: List[str]
+    section_types: List[str]
+    materials: List[str]
+    notes: List[str]
+    x: np.ndarray
+    y: np.ndarray
+    base_level: np.ndarray
+    top_level: np.ndarray
+    width: np.ndarray
+    depth: np.ndarray
+    is_virtual: np.ndarray
+    locked: np.ndarray
+
+    _array_fields = ("x", "y", "base_level", "top_level", "width", "depth", "is_virtual", "locked")
+    _list_fields = ("ids", "section_types", "materials", "notes")
+
+    @classmethod
+    def from_columns(cls, columns: List[Column]) -> "ColumnTable":
+        return cls(
+            ids=[c.id for c in columns],
+            section_types=[c.section_type for c in columns],
+            materials=[c.material for c in columns],
+            notes=[c.note for c in columns],
+            x=np.array([c.x for c in columns], dtype=np.int32),
+            y=np.array([c.y for c in columns], dtype=np.int32),
+            base_level=np.array([c.base_level for c in columns], dtype=np.int32),
+            top_level=np.array([c.top_level for c in columns], dtype=np.int32),
+            width=np.array([c.width for c in columns], dtype=np.int32),
+            depth=np.array([c.depth for c in columns], dtype=np.int32),
+            is_virtual=np.array([c.is_virtual for c in columns], dtype=bool),
+            locked=np.array([c.locked for c in columns], dtype=bool),
+        )
+
+    def row(self, i: int) -> Column:
+        return Column(
+            id=self.ids[i],
+            x=int(self.x[i]),
+            y=int(self.y[i]),
+            base_level=int(self.base_level[i]),
+            top_level=int(self.top_level[i]),
+            section_type=self.section_types[i],
+            width=int(self.width[i]),
+            depth=int(self.depth[i]),
+            material=self.materials[i],
+            is_virtual=bool(self.is_virtual[i]),
+            locked=bool(self.locked[i]),
+            note=self.notes[i]
+        )
+
+
+@dataclass
+class BeamTable(_ArrayTable):
+    """梁の配列表現（start / end は (n, 3) の x, y, z）"""
+    ids: List[str]
+    materials: List[str]
+    opening_ids: List[Optional[str]]
+    notes: List[str]
+    start: np.ndarray
+    end: np.ndarray
+    width: np.ndarray
+    depth: np.ndarray
+    is_lintel: np.ndarray
+    locked: np.ndarray
+
+    _array_fields = ("start", "end", "width", "depth", "is_lintel", "locked")
+    _list_fields = ("ids", "materials", "opening_ids", "notes")
+
+    @classmethod
+    def from_beams(cls, beams: List[Beam]) -> "BeamTable":
+        return cls(
+            ids=[b.id for b in beams],
+            materials=[b.material for b in beams],
+            opening_ids=[b.opening_id for b in beams],
+            notes=[b.note for b in beams],
+            start=np.array([b.start_point for b in beams], dtype=np.int32).reshape(-1, 3),
+            end=np.array([b.end_point for b in beams], dtype=np.int32).reshape(-1, 3),
+            width=np.array([b.width for b in beams], dtype=np.int32),
+            depth=np.array([b.depth for b in beams], dtype=np.int32),
+            is_lintel=np.array([b.is_lintel for b in beams], dtype=bool),
+            locked=np.array([b.locked for b in beams], dtype=bool),
+        )
+
+    def span(self) -> np.ndarray:
+        """平面上のスパン（mm）"""
+        d = (self.end[:, :2] - self.start[:, :2]).astype(np.float64)
+        return np.hypot(d[:, 0], d[:, 1])
+
+    def row(self, i: int) -> Beam:
+        return Beam(
+            id=self.ids[i],
+            start_point=tuple(int(v) for v in self.start[i]),
+            end_point=tuple(int(v) for v in self.end[i]),
+            width=int(self.width[i]),
+            depth=int(self.depth[i]),
+            material=self.materials[i],
+            is_lintel=bool(self.is_lintel[i]),
+            opening_id=self.opening_ids[i],
+            locked=bool(self.locked[i]),
+            note=self.notes[i]
+        )
+
+
+@dataclass
+class StudTable(_ArrayTable):
+    """
+    間柱の配列表現（1本あたり数ワード）
+    wall_index / opening_index は wall_ids / opening_ids への参照（opening なしは -1）。
+    stud_type は STUD_TYPES のインデックス、side は 0=なし, 1=left, 2=right。
+    """
+    wall_ids: List[str]
+    opening_ids: List[str]
+    wall_pitch: Dict[str, int]
+    wall_index: np.ndarray
+    number: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    wall_position: np.ndarray
+    base_level: np.ndarray
+    top_level: np.ndarray
+    width: np.ndarray
+    depth: np.ndarray
+    stud_type: np.ndarray
+    side: np.ndarray
+    opening_index: np.ndarray
+
+    _array_fields = ("wall_index", "number", "x", "y", "wall_position", "base_level", "top_level",
+                     "width", "depth", "stud_type", "side", "opening_index")
+
+    @classmethod
+    def empty(cls) -> "StudTable":
+        return cls(
+            wall_ids=[], opening_ids=[], wall_pitch={},
+            wall_index=np.zeros(0, dtype=np.int16),
+            number=np.zeros(0, dtype=np.int32),
+            x=np.zeros(0, dtype=np.int32),
+            y=np.zeros(0, dtype=np.int32),
+            wall_position=np.zeros(0, dtype=np.int32),
+            base_level=np.zeros(0, dtype=np.int32),
+            top_level=np.zeros(0, dtype=np.int32),
+            width=np.zeros(0, dtype=np.int16),
+            depth=np.zeros(0, dtype=np.int16),
+            stud_type=np.zeros(0, dtype=np.int8),
+            side=np.zeros(0, dtype=np.int8),
+            opening_index=np.zeros(0, dtype=np.int16),
+        )
+
+    @classmethod
+    def concat(cls, tables: List["StudTable"]) -> "StudTable":
+        """壁ごとの表を連結（wall_ids / opening_ids を統合して参照を付け替え）"""
+        if not tables:
+            return cls.empty()
+        wall_ids: List[str] = []
+        opening_ids: List[str] = []
+        wall_lookup: Dict[str, int] = {}
+        opening_lookup: Dict[str, int] = {}
+        wall_pitch: Dict[str, int] = {}
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name in cls._array_fields}
+
+        def remap(index: np.ndarray, names: List[str], out: List[str], lookup: Dict[str, int]) -> np.ndarray:
+            # 部分表が実際に参照している名前だけを統合後の辞書に登録する
+            mapping = np.full(len(names) + 1, -1, dtype=np.int16)
+            for i in np.unique(index[index >= 0]).tolist():
+                name = names[i]
+                if name not in lookup:
+                    lookup[name] = len(out)
+                    out.append(name)
+                mapping[i] = lookup[name]
+            return mapping[index]  # index=-1 は末尾の -1 を参照
+
+        for t in tables:
+            for wid in t.wall_ids:
+                if wid in t.wall_pitch:
+                    wall_pitch.setdefault(wid, t.wall_pitch[wid])
+            for name in cls._array_fields:
+                arr = getattr(t, name)
+                if name == "wall_index":
+                    arr = remap(arr, t.wall_ids, wall_ids, wall_lookup)
+                elif name == "opening_index":
+                    arr = remap(arr, t.opening_ids, opening_ids, opening_lookup)
+                parts[name].append(arr)
+        wall_pitch = {wid: wall_pitch[wid] for wid in wall_ids if wid in wall_pitch}
+        return cls(
+            wall_ids=wall_ids, opening_ids=opening_ids, wall_pitch=wall_pitch,
+            **{name: np.concatenate(arrs) for name, arrs in parts.items()}
+        )
+
+    def stud_id(self, i: int) -> str:
+        wid = self.wall_ids[self.wall_index[i]]
+        prefix = "K" if self.stud_type[i] == 1 else ""
+        return f"ST_{wid}_{prefix}{int(self.number[i]):03d}"
+
+    def row(self, i: int) -> Stud:
+        """i 番目の間柱を Stud として取り出す（互換用）"""
+        wid = self.wall_ids[self.wall_index[i]]
+        is_king = self.stud_type[i] == 1
+        op_idx = int(self.opening_index[i])
+        if is_king:
+            note = f"King stud ({_SIDE_NOTES.get(int(self.side[i]), '')})"
+        else:
+            note = f"@{self.wall_pitch.get(wid, 0)}mm"
+        return Stud(
+            id=self.stud_id(i),
+            wall_id=wid,
+            x=int(self.x[i]),
+            y=int(self.y[i]),
+            wall_position=int(self.wall_position[i]),
+            base_level=int(self.base_level[i]),
+            top_level=int(self.top_level[i]),
+            section_type="C",
+            width=int(self.width[i]),
+            depth=int(self.depth[i]),
+            stud_type=STUD_TYPES[self.stud_type[i]],
+            opening_id=self.opening_ids[op_idx] if op_idx >= 0 else None,
+            note=note
+        )
+
+    def to_studs(self) -> List[Stud]:
+        return self.to_list()
+
+
+def _stud_ranges(table: StudTable) -> Dict[Tuple[str, str], Tuple[int, int]]:
+    """(壁ID, 間柱タイプ) → 連続区間 (start, stop)。表は壁・タイプ順に並んでいる前提"""
+    ranges = {}
+    n = len(table)
+    if n == 0:
+        return ranges
+    key = table.wall_index.astype(np.int32) * len(STUD_TYPES) + table.stud_type
+    bounds = np.flatnonzero(np.diff(key)) + 1
+    starts = np.concatenate([[0], bounds])
+    stops = np.concatenate([bounds, [n]])
+    for start, stop in zip(starts, stops):
+        ranges[(table.wall_ids[table.wall_index[start]], STUD_TYPES[table.stud_type[start]])] = (int(start), int(stop))
+    return ranges
+
+
+_FRAME_LAYERS = ("grid_lines", "column_table", "beam_table", "violations")
+
+
 class StructuralSystem:
-    """構造システム全体"""
-    columns: List[Column]
-    beams: List[Beam]
-    studs: List[Stud]
-    grid_lines: List[GridLine]
-    warnings: List[Dict]
-    violations: List[Dict]
+    """
+    構造システム全体（遅延評価）
+    通り芯・柱・梁・間柱・違反の各レイヤは初回アクセス時に生成してキャッシュする。
+    柱・梁・間柱は配列表現で、間柱は壁→タイプ順に並べ stud_ranges で区間を引ける。
+    columns / beams / studs は従来のデータクラスのリストを都度生成する（互換用）。
+    previous を渡すと、生成済みのレイヤのうち入力が変わっていないものを再利用する。
+    """
+
+    def __init__(self, project, material: str = "RC", stud_pitch: int = 455,
+                 extra_walls: Optional[List] = None, previous: Optional["StructuralSystem"] = None):
+        # 入力は生成時点の値を保持（後からレイヤを生成しても結果が変わらないように）
+        self.material = material
+        self.stud_pitch = stud_pitch
+        self.polygon = [tuple(p) for p in project.room.polygon]
+        self.wall_thickness = project.room.wall_thickness
+        self.floor_height = project.room.height
+        self.openings = list(project.openings)
+        self.extra_walls = list(extra_walls or [])
+        self.frame_key = (tuple(self.polygon), self.floor_height, material)
+        self.warnings: List[Dict] = []  # まぐさ生成を廃止したため警告は空
+
+        # 前回の生成済みレイヤと間柱表・壁キーだけを引き継ぐ（previous 自体は保持しない）。
+        # 変更のない壁の判定と間柱の取り出しは stud_table を初めて参照したときに行う
+        self._previous_studs: Optional[Tuple[StudTable, Dict[str, Tuple], Optional[Dict]]] = None
+        if previous is not None:
+            if previous.frame_key == self.frame_key:
+                for name in _FRAME_LAYERS:
+                    if name in previous.__dict__:
+                        self.__dict__[name] = previous.__dict__[name]
+            if "stud_table" in previous.__dict__:  # stud_table を作った時点で wall_keys もある
+                self._previous_studs = (previous.stud_table, previous.wall_keys, previous.__dict__.get("stud_ranges"))
+
+    @property
+    def computed_layers(self) -> List[str]:
+        """生成済みのレイヤ名"""
+        return [name for name in ("grid_lines", "column_table", "beam_table", "stud_table", "violations")
+                if name in self.__dict__]
+
+    @cached_property
+    def wall_info(self) -> Dict[str, Dict]:
+        from src.allocating import calculate_corner_winning_rules, extra_walls_to_wall_info
+        wall_info = calculate_corner_winning_rules(self.polygon, self.wall_thickness)
+        if self.extra_walls:
+            wall_info = {**wall_info, **extra_walls_to_wall_info(self.extra_walls)}
+        return wall_info
+
+    @cached_property
+    def openings_by_wall(self) -> Dict[str, List]:
+        result: Dict[str, List] = {wid: [] for wid in self.wall_info}
+        for op in self.openings:
+            if op.wall in result:
+                result[op.wall].append(op)
+        return result
+
+    @cached_property
+    def wall_keys(self) -> Dict[str, Tuple]:
+        return {wid: _wall_key(wall, self.openings_by_wall[wid], self.floor_height, self.stud_pitch)
+                for wid, wall in self.wall_info.items()}
+
+    @cached_property
+    def grid_lines(self) -> List[GridLine]:
+        return generate_virtual_grid(self.polygon, self.material)
+
+    @cached_property
+    def column_table(self) -> ColumnTable:
+        return ColumnTable.from_columns(generate_columns_from_grid(self.grid_lines, self.floor_height, self.material))
+
+    @cached_property
+    def beam_table(self) -> BeamTable:
+        return BeamTable.from_beams(generate_beams_between_columns(self.column_table.to_list(), self.material))
+
+    @cached_property
+    def stud_table(self) -> StudTable:
+        # 変更のない壁は前回の区間をそのまま使う（まぐさは生成しない）
+        previous_table, previous_keys, previous_ranges = self._previous_studs or (None, {}, None)
+        if previous_table is not None and previous_ranges is None:
+            previous_ranges = _stud_ranges(previous_table)
+        stud_tables = []
+        for wall_id, key in self.wall_keys.items():
+            spans = [r for (wid, _), r in (previous_ranges or {}).items() if wid == wall_id]
+            if previous_keys.get(wall_id) == key and spans:
+                # スライス（ビュー）だと前回の配列全体が残るので、インデックス配列で複製する
+                start, stop = min(s for s, _ in spans), max(e for _, e in spans)
+                stud_tables.append(previous_table.take(np.arange(start, stop)))
+            else:
+                stud_tables.append(generate_studs_for_wall(wall_id, self.wall_info, self.openings_by_wall[wall_id],
+                                                           self.floor_height, self.stud_pitch, as_array=True))
+        self._previous_studs = None
+        table = StudTable.concat(stud_tables)
+        if len(table):
+            key = table.wall_index.astype(np.int32) * len(STUD_TYPES) + table.stud_type
+            order = np.argsort(key, kind="stable")
+            if np.any(order != np.arange(len(order))):
+                table = table.take(order)
+        return table
+
+    @cached_property
+    def stud_ranges(self) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        return _stud_ranges(self.stud_table)
+
+    @cached_property
+    def violations(self) -> List[Dict]:
+        from src.rule_check import check_beam_spans, span_violation_records
+        return span_violation_records(check_beam_spans(self.beam_table, self.material))
+
+    @property
+    def columns(self) -> List[Column]:
+        return self.column_table.to_list()
+
+    @property
+    def beams(self) -> List[Beam]:
+        return self.beam_table.to_list()
+
+    @property
+    def studs(self) -> List[Stud]:
+        return self.stud_table.to_studs()
+
+    def wall_range(self, wall_id: str) -> Tuple[int, int]:
+        """壁の間柱区間 (start, stop)。間柱がなければ (0, 0)"""
+        spans = [r for (wid, _), r in self.stud_ranges.items() if wid == wall_id]
+        if not spans:
+            return (0, 0)
+        return (min(s for s, _ in spans), max(e for _, e in spans))
+
+    def studs_for(self, wall_id: str, stud_type: Optional[str] = None) -> StudTable:
+        """壁（とタイプ）で絞り込んだ間柱表（全件走査せずスライスで返す）"""
+        if stud_type is None:
+            start, stop = self.wall_range(wall_id)
+        else:
+            start, stop = self.stud_ranges.get((wall_id, stud_type), (0, 0))
+        return self.stud_table.take(slice(start, stop))
 
 # 構造設計パラメータ
 STRUCTURAL_PARAMS = {
@@ -259,6 +662,18 @@ def generate_lintels_for_openings(openings, wall_info: Dict, floor_height: int,
     
     lintel_id = 1
     
+    # 頭上クリアランスチェック（全開口を一括判定）
+    from src.rule_check import check_lintel_clearance
+    placed = [op for op in openings if op.wall in wall_info]
+    for row in check_lintel_clearance(placed, floor_height, material).itertuples(index=False):
+        warnings.append({
+            "code": "W-CLEARANCE",
+            "opening_id": row.member_id,
+            "clearance": int(row.value),
+            "required": int(row.limit),
+            "message": row.message
+        })
+    
     for opening in openings:
         wall = wall_info.get(opening.wall)
         if not wall:
@@ -270,17 +685,6 @@ def generate_lintels_for_openings(openings, wall_info: Dict, floor_height: int,
         else:
             top_height = opening.sill_height + opening.height
         
-        # 頭上クリアランスチェック
-        clearance = floor_height - top_height - lintel_depth
-        if clearance < STUD_PARAMS["lintel_clearance"]:
-            warnings.append({
-                "code": "W-CLEARANCE",
-                "opening_id": opening.opening_id,
-                "clearance": clearance,
-                "required": STUD_PARAMS["lintel_clearance"],
-                "message": f"開口 {opening.opening_id} の頭上クリアランス不足: {clearance}mm < {STUD_PARAMS['lintel_clearance']}mm"
-            })
-        
         if wall["direction"] == "horizontal":
             off = int(opening.offset_from_wall_start) if isinstance(opening.offset_from_wall_start, (int, float)) else (wall["length"] - opening.width) // 2
             start_x = wall["start"][0] + off
@@ -318,141 +722,103 @@ def generate_lintels_for_openings(openings, wall_info: Dict, floor_height: int,
     
     return lintels, warnings
 
-def generate_studs_for_wall(wall_id: str, wall_info: Dict, openings, floor_height: int, pitch: int = 455) -> List[Stud]:
+def _wall_points(wall: Dict, wall_length: int, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """壁始点からの距離を平面座標（x, y）に変換"""
+    n = len(positions)
+    if wall["direction"] == "horizontal":
+        x = (wall["start"][0] + (positions / wall_length) * (wall["end"][0] - wall["start"][0])).astype(np.int32)
+        y = np.full(n, wall["start"][1], dtype=np.int32)
+    else:
+        x = np.full(n, wall["start"][0], dtype=np.int32)
+        y = (wall["start"][1] + (positions / wall_length) * (wall["end"][1] - wall["start"][1])).astype(np.int32)
+    return x, y
+
+
+def generate_studs_for_wall(wall_id: str, wall_info: Dict, openings, floor_height: int,
+                            pitch: int = 455, as_array: bool = False) -> Union[List[Stud], StudTable]:
     """
     壁に間柱を生成（非耐力壁のみ）
+    開口区間を始点順にソート・結合し、ピッチ位置を1回の走査で間引く（O(間柱数 + 開口数 log 開口数)）。
+    as_array=True で StudTable（配列表現）を返す。
     """
-    studs = []
     wall = wall_info[wall_id]
     wall_length = wall["length"]
-    
-    # 開口部の位置を取得
     wall_openings = [op for op in openings if op.wall == wall_id]
-    
-    stud_id = 1
-    current_x = 0
-    
-    while current_x <= wall_length:
-        # 開口部との干渉チェック
-        is_in_opening = False
-        for opening in wall_openings:
-            if isinstance(opening.offset_from_wall_start, (int, float)):
-                op_start = int(opening.offset_from_wall_start)
-            else:
-                op_start = (wall_length - opening.width) // 2
-            op_end = op_start + opening.width
-            if op_start <= current_x <= op_end:
-                is_in_opening = True
-                break
-        
-        if not is_in_opening:
-            if wall["direction"] == "horizontal":
-                x = int(wall["start"][0] + (current_x / wall_length) * (wall["end"][0] - wall["start"][0]))
-                y = wall["start"][1]
-            else:
-                x = wall["start"][0]
-                y = int(wall["start"][1] + (current_x / wall_length) * (wall["end"][1] - wall["start"][1]))
-            studs.append(Stud(
-                id=f"ST_{wall_id}_{stud_id:03d}",
-                wall_id=wall_id,
-                x=x,
-                y=y,
-                wall_position=current_x,
-                base_level=0,
-                top_level=floor_height,
-                section_type="C",
-                width=STUD_PARAMS["section_width"],
-                depth=STUD_PARAMS["section_depth"],
-                stud_type="regular",
-                note=f"@{pitch}mm"
-            ))
-            stud_id += 1
-        
-        current_x += pitch
-    
+    if wall_length <= 0 or pitch <= 0:
+        table = StudTable.empty()
+        return table if as_array else []
+
+    # 開口区間は1回だけ解決する（割付と同じ place_opening_position を使用）
+    spans = []
     for opening in wall_openings:
-        if isinstance(opening.offset_from_wall_start, (int, float)):
-            op_start = int(opening.offset_from_wall_start)
-        else:
-            op_start = (wall_length - opening.width) // 2
-        op_end = op_start + opening.width
-        for pos, side in [(op_start, "left"), (op_end, "right")]:
-            if wall["direction"] == "horizontal":
-                x = int(wall["start"][0] + (pos / wall_length) * (wall["end"][0] - wall["start"][0]))
-                y = wall["start"][1]
-            else:
-                x = wall["start"][0]
-                y = int(wall["start"][1] + (pos / wall_length) * (wall["end"][1] - wall["start"][1]))
-            studs.append(Stud(
-                id=f"ST_{wall_id}_K{stud_id:03d}",
-                wall_id=wall_id,
-                x=x,
-                y=y,
-                wall_position=pos,
-                base_level=0,
-                top_level=floor_height,
-                section_type="C",
-                width=int(STUD_PARAMS["section_width"] * 1.5),
-                depth=STUD_PARAMS["section_depth"],
-                stud_type="king",
-                opening_id=opening.opening_id,
-                note=f"King stud ({side})"
-            ))
-            stud_id += 1
-    
-    return studs
+        op_start = place_opening_position(wall_length, opening)
+        spans.append((op_start, op_start + opening.width))
+
+    # 通常間柱：開口区間（両端含む）に入るピッチ位置を除外
+    num_positions = wall_length // pitch + 1
+    keep = np.ones(num_positions, dtype=bool)
+    merged_end = None
+    for op_start, op_end in sorted(spans):
+        if merged_end is not None and op_start <= merged_end:
+            op_start = merged_end + 1
+        merged_end = op_end if merged_end is None else max(merged_end, op_end)
+        if op_start > op_end:
+            continue
+        lo = max(0, -(-op_start // pitch))
+        hi = min(num_positions - 1, op_end // pitch)
+        if lo <= hi:
+            keep[lo:hi + 1] = False
+    regular_pos = np.flatnonzero(keep).astype(np.int32) * pitch
+
+    # キングスタッド：開口ごとに左右2本（入力順）
+    king_pos = np.array([pos for span in spans for pos in span], dtype=np.int32)
+    king_side = np.tile(np.array([1, 2], dtype=np.int8), len(spans))
+    king_opening = np.repeat(np.arange(len(spans), dtype=np.int16), 2)
+
+    n_regular = len(regular_pos)
+    positions = np.concatenate([regular_pos, king_pos])
+    n = len(positions)
+    x, y = _wall_points(wall, wall_length, positions)
+    table = StudTable(
+        wall_ids=[wall_id],
+        opening_ids=[op.opening_id for op in wall_openings],
+        wall_pitch={wall_id: pitch},
+        wall_index=np.zeros(n, dtype=np.int16),
+        number=np.arange(1, n + 1, dtype=np.int32),
+        x=x,
+        y=y,
+        wall_position=positions,
+        base_level=np.zeros(n, dtype=np.int32),
+        top_level=np.full(n, floor_height, dtype=np.int32),
+        width=np.concatenate([
+            np.full(n_regular, STUD_PARAMS["section_width"], dtype=np.int16),
+            np.full(len(king_pos), int(STUD_PARAMS["section_width"] * 1.5), dtype=np.int16),
+        ]),
+        depth=np.full(n, STUD_PARAMS["section_depth"], dtype=np.int16),
+        stud_type=np.concatenate([np.zeros(n_regular, dtype=np.int8), np.ones(len(king_pos), dtype=np.int8)]),
+        side=np.concatenate([np.zeros(n_regular, dtype=np.int8), king_side]),
+        opening_index=np.concatenate([np.full(n_regular, -1, dtype=np.int16), king_opening]),
+    )
+    return table if as_array else table.to_studs()
+
+def _opening_key(opening) -> Tuple:
+    return (opening.opening_id, opening.type, opening.width, opening.height,
+            opening.sill_height, str(opening.offset_from_wall_start))
 
-def generate_structural_system(project, material: str = "RC", stud_pitch: int = 455) -> StructuralSystem:
+
+def _wall_key(wall: Dict, openings, floor_height: int, pitch: int) -> Tuple:
+    """壁の間柱生成に影響する入力（これが変わらなければ間柱を再利用できる）"""
+    return (tuple(wall["start"]), tuple(wall["end"]), wall["length"], wall["direction"],
+            floor_height, pitch, tuple(_opening_key(op) for op in openings))
+
+
+def generate_structural_system(project, material: str = "RC", stud_pitch: int = 455,
+                               extra_walls: Optional[List] = None,
+                               previous: Optional[StructuralSystem] = None) -> StructuralSystem:
     """
-    構造システム全体を生成
+    構造システム全体を生成（外周W1～W4 + 新規壁W5,W6,...）
+    返り値は遅延評価で、通り芯・柱・梁・間柱・違反は最初に参照されたときに生成される。
+    previous を渡すと差分更新：部屋形状・階高・材質が同じなら通り芯・柱・梁を再利用し、
+    間柱は壁形状・開口・ピッチが変わった壁のみ再生成する。
     """
-    from src.allocating import calculate_corner_winning_rules
-    
-    # 壁情報を取得
-    wall_info = calculate_corner_winning_rules(project.room.polygon, project.room.wall_thickness)
-    floor_height = project.room.height
-    
-    # 1. 仮想グリッドを生成
-    grid_lines = generate_virtual_grid(project.room.polygon, material)
-    
-    # 2. グリッド交点に柱を生成
-    columns = generate_columns_from_grid(grid_lines, floor_height, material)
-    
-    # 3. 柱間に梁を生成
-    beams = generate_beams_between_columns(columns, material)
-    
-    # 4. 壁に間柱を生成（まぐさは生成しない）
-    studs = []
-    for wall_id in ["W1", "W2", "W3", "W4"]:
-        wall_studs = generate_studs_for_wall(wall_id, wall_info, project.openings, floor_height, stud_pitch)
-        studs.extend(wall_studs)
-    
-    # 5. 違反チェック
-    violations = []
-    warnings = []  # まぐさ生成を廃止したため警告は空
-    
-    # スパンチェック
-    max_span = STRUCTURAL_PARAMS[material]["max_span"]
-    for beam in beams:
-        if not beam.is_lintel:
-            span = math.sqrt(
-                (beam.end_point[0] - beam.start_point[0])**2 +
-                (beam.end_point[1] - beam.start_point[1])**2
-            )
-            if span > max_span:
-                violations.append({
-                    "code": "E-SPAN",
-                    "beam_id": beam.id,
-                    "span": span,
-                    "max_span": max_span,
-                    "message": f"梁 {beam.id} のスパン超過: {int(span)}mm > {max_span}mm"
-                })
-    
-    return StructuralSystem(
-        columns=columns,
-        beams=beams,
-        studs=studs,
-        grid_lines=grid_lines,
-        warnings=warnings,
-        violations=violations
-    )
+    return StructuralSystem(project, material, stud_pitch, extra_walls=extra_walls, previous=previous)
@@ -1,11 +1,13 @@
 """
 構造要素の可視化（2D平面・3D立体）
 """
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from typing import List
 import math
-from src.structural import StructuralSystem, Column, Beam, Stud, GridLine
+from src.structural import StructuralSystem, Column, Beam, Stud, GridLine, STUD_TYPES
+from src.plan_lod import points_in_viewport
 
 # レイヤ別カラーパレット
 LAYER_COLORS = {
@@ -20,9 +22,184 @@ LAYER_COLORS = {
     "LOCKED": "cyan",          # ロック要素
 }
 
+# 2D平面の部材は種類・色ごとに1トレース（Scattergl）にまとめ、ホバーは customdata で引く
+_RECT_OUTLINE = np.array([(-1, -1), (1, -1), (1, 1), (-1, 1), (-1, -1)], dtype=np.float64) / 2
+_CIRCLE_OUTLINE = np.stack([np.cos(np.linspace(0, 2 * np.pi, 25)), np.sin(np.linspace(0, 2 * np.pi, 25))], axis=1) / 2
+STUD_TICK_LENGTH = 50  # 構造平面図での間柱ティックの長さ（mm）
+
+
+def _segments2d(x0, y0, x1, y1):
+    """線分群を NaN 区切りの座標列に（始点・終点・区切りの3点ずつ）"""
+    n = len(x0)
+    x = np.full(3 * n, np.nan, dtype=np.float32)
+    y = np.full(3 * n, np.nan, dtype=np.float32)
+    x[0::3], x[1::3] = x0, x1
+    y[0::3], y[1::3] = y0, y1
+    return x, y
+
+
+def _segment_customdata(rows):
+    """線分ごとの customdata 行を頂点（3点ずつ）に展開"""
+    return np.repeat(np.array(rows, dtype=object).reshape(len(rows), -1), 3, axis=0)
+
+
+def _outlines2d(cx, cy, w, d, unit):
+    """中心・幅・奥行きと単位形状から、NaN 区切りの外形座標列を作る"""
+    pad = np.full((len(cx), 1), np.nan)
+    x = np.asarray(cx, dtype=np.float64)[:, None] + np.asarray(w, dtype=np.float64)[:, None] * unit[None, :, 0]
+    y = np.asarray(cy, dtype=np.float64)[:, None] + np.asarray(d, dtype=np.float64)[:, None] * unit[None, :, 1]
+    return np.hstack([x, pad]).ravel().astype(np.float32), np.hstack([y, pad]).ravel().astype(np.float32)
+
+
+def _text_layer(x, y, text, font: dict, name: str, customdata=None, hovertemplate: str = None):
+    """ラベルの文字レイヤ（注記の代わりに1トレースで描く）"""
+    return go.Scattergl(
+        x=np.asarray(x, dtype=np.float32), y=np.asarray(y, dtype=np.float32),
+        mode='text', text=list(text), textfont=font, name=name, showlegend=False,
+        customdata=customdata, hovertemplate=hovertemplate,
+        hoverinfo='skip' if hovertemplate is None else None
+    )
+
+
+def grid_line_traces(structural_system: StructuralSystem, font_size: int = 10, show_labels: bool = True) -> List:
+    """通り芯（実・仮想の2トレース）とラベルレイヤ"""
+    grids = structural_system.grid_lines
+    traces = []
+    for is_virtual in (False, True):
+        group = [g for g in grids if g.is_virtual == is_virtual]
+        if not group:
+            continue
+        x, y = _segments2d([g.start_point[0] for g in group], [g.start_point[1] for g in group],
+                           [g.end_point[0] for g in group], [g.end_point[1] for g in group])
+        traces.append(go.Scattergl(
+            x=x, y=y, mode='lines',
+            line=dict(color=LAYER_COLORS["AXIS"], width=1, dash="dash" if is_virtual else "solid"),
+            name='通り芯', customdata=_segment_customdata([g.id for g in group]),
+            hovertemplate=f'通り芯: %{{customdata[0]}}<br>{"仮想" if is_virtual else "実"}<extra></extra>',
+            showlegend=False
+        ))
+    if grids and show_labels:
+        traces.append(_text_layer(
+            [(g.start_point[0] + g.end_point[0]) / 2 for g in grids],
+            [(g.start_point[1] + g.end_point[1]) / 2 for g in grids],
+            [g.id for g in grids], dict(size=font_size, color=LAYER_COLORS["AXIS"]), '通り芯ラベル'
+        ))
+    return traces
+
+
+def column_traces(structural_system: StructuralSystem, opacity: float = 0.6, show_section: bool = True,
+                  show_labels: bool = True, viewport=None) -> List:
+    """柱（色ごとに塗りつぶし外形1トレース）と、ホバーを兼ねるラベルレイヤ（ラベルは viewport 内の柱のみ）"""
+    table = structural_system.column_table
+    if not len(table):
+        return []
+    traces = []
+    is_rect = np.array([t == "rect" for t in table.section_types], dtype=bool)
+    for locked in (False, True):
+        color = LAYER_COLORS["LOCKED"] if locked else LAYER_COLORS["S_COL"]
+        parts = []
+        for mask, unit, depth in ((is_rect, _RECT_OUTLINE, table.depth), (~is_rect, _CIRCLE_OUTLINE, table.width)):
+            mask = mask & (table.locked == locked)
+            if mask.any():
+                parts.append(_outlines2d(table.x[mask], table.y[mask], table.width[mask], depth[mask], unit))
+        if not parts:
+            continue
+        # 塗りつぶしは区切りごとの多角形に分けて描ける SVG の Scatter を使う（柱の本数は少ない）
+        traces.append(go.Scatter(
+            x=np.concatenate([p[0] for p in parts]), y=np.concatenate([p[1] for p in parts]),
+            mode='lines', fill='toself', fillcolor=color, opacity=opacity,
+            line=dict(color=color, width=2), name='柱', hoverinfo='skip', showlegend=False
+        ))
+    if not show_labels:
+        return traces
+    table = table.take(np.flatnonzero(points_in_viewport(table.x, table.y, viewport)))
+    labels = [f"{cid} {w}×{d}" if show_section else cid
+              for cid, w, d in zip(table.ids, table.width.tolist(), table.depth.tolist())]
+    traces.append(_text_layer(
+        table.x, table.y, labels, dict(size=8, color='black'), '柱ラベル',
+        customdata=np.array(list(zip(table.ids, table.width.tolist(), table.depth.tolist(), table.materials)), dtype=object),
+        hovertemplate='柱: %{customdata[0]}<br>断面: %{customdata[1]}×%{customdata[2]}<br>材質: %{customdata[3]}<extra></extra>'
+    ))
+    return traces
+
+
+def beam_traces(structural_system: StructuralSystem, include_lintels: bool = True, show_labels: bool = True) -> List:
+    """梁・まぐさ（色・線幅ごとに1トレース）とラベルレイヤ"""
+    table = structural_system.beam_table
+    if not include_lintels:
+        table = table.take(np.flatnonzero(~table.is_lintel))
+    if not len(table):
+        return []
+    traces = []
+    for is_lintel in (False, True):
+        for locked in (False, True):
+            index = np.flatnonzero((table.is_lintel == is_lintel) & (table.locked == locked))
+            if not len(index):
+                continue
+            color = LAYER_COLORS["LOCKED"] if locked else LAYER_COLORS["LINTEL" if is_lintel else "S_BEAM"]
+            kind = "まぐさ" if is_lintel else "梁"
+            x, y = _segments2d(table.start[index, 0], table.start[index, 1], table.end[index, 0], table.end[index, 1])
+            rows = [(table.ids[i], int(table.width[i]), int(table.depth[i]), table.notes[i]) for i in index.tolist()]
+            traces.append(go.Scattergl(
+                x=x, y=y, mode='lines', line=dict(color=color, width=3 if is_lintel else 2),
+                name=kind, customdata=_segment_customdata(rows),
+                hovertemplate=f'{kind}: %{{customdata[0]}}<br>幅: %{{customdata[1]}}mm<br>梁成: %{{customdata[2]}}mm<br>%{{customdata[3]}}<extra></extra>',
+                showlegend=False
+            ))
+    if show_labels:
+        mid = (table.start[:, :2] + table.end[:, :2]) / 2
+        traces.append(_text_layer(
+            mid[:, 0], mid[:, 1], [f"{bid} D={d}" for bid, d in zip(table.ids, table.depth.tolist())],
+            dict(size=7, color=LAYER_COLORS["S_BEAM"]), '梁ラベル'
+        ))
+    return traces
+
+
+def stud_traces(structural_system: StructuralSystem, style: str = "tick", viewport=None) -> List:
+    """
+    間柱（壁×タイプごとに1トレース、customdata は通し番号）
+    style="tick" は構造平面図用の短い線、"marker" は平面プレビュー用の四角マーカー。
+    viewport (x0, y0, x1, y1) を渡すと範囲内の間柱だけを描く。
+    """
+    table = structural_system.stud_table
+    traces = []
+    for (wid, stud_type), (start, stop) in structural_system.stud_ranges.items():
+        if stop <= start:
+            continue
+        part = table.take(slice(start, stop))
+        if viewport is not None:
+            part = part.take(np.flatnonzero(points_in_viewport(part.x, part.y, viewport)))
+            if not len(part):
+                continue
+        is_king = stud_type == STUD_TYPES[1]
+        prefix = "K" if is_king else ""
+        hovertemplate = f'間柱: ST_{wid}_{prefix}%{{customdata:03d}}<br>タイプ: {stud_type}<br>壁: {wid}<extra></extra>'
+        if style == "marker":
+            traces.append(go.Scattergl(
+                x=part.x.astype(np.float32), y=part.y.astype(np.float32), mode='markers',
+                marker=dict(
+                    size=20 if is_king else 12,
+                    color='rgba(255, 100, 0, 0.9)' if is_king else 'rgba(150, 150, 150, 0.6)',
+                    symbol='square', line=dict(width=2, color='black')
+                ),
+                name="キングスタッド" if is_king else "間柱", customdata=part.number.astype(np.int32),
+                hovertemplate=hovertemplate, showlegend=False
+            ))
+        else:
+            x, y = _segments2d(part.x, part.y - STUD_TICK_LENGTH / 2, part.x, part.y + STUD_TICK_LENGTH / 2)
+            traces.append(go.Scattergl(
+                x=x, y=y, mode='lines',
+                line=dict(color=LAYER_COLORS["S_COL"] if is_king else LAYER_COLORS["N_STUD"], width=3 if is_king else 1),
+                name='間柱', customdata=np.repeat(part.number.astype(np.int32), 3),
+                hovertemplate=hovertemplate, showlegend=False
+            ))
+    return traces
+
+
 def create_structural_plan_view(structural_system: StructuralSystem, project, show_layers: dict = None):
     """
     2D平面プレビュー（構造要素表示）
+    部材は種類・色ごとに Scattergl の少数のトレースにまとめて描く。
     """
     if show_layers is None:
         show_layers = {
@@ -35,117 +212,21 @@ def create_structural_plan_view(structural_system: StructuralSystem, project, sh
     
     fig = go.Figure()
     
-    # 1. 通り芯の表示
+    # 1. 通り芯
     if show_layers.get("grid_lines", True):
-        for grid in structural_system.grid_lines:
-            line_style = "dash" if grid.is_virtual else "solid"
-            fig.add_trace(go.Scatter(
-                x=[grid.start_point[0], grid.end_point[0]],
-                y=[grid.start_point[1], grid.end_point[1]],
-                mode='lines',
-                line=dict(color=LAYER_COLORS["AXIS"], width=1, dash=line_style),
-                name=f'通り芯 {grid.id}',
-                hovertemplate=f'通り芯: {grid.id}<br>{"仮想" if grid.is_virtual else "実"}<extra></extra>',
-                showlegend=False
-            ))
-            
-            # 通り芯ラベル
-            mid_x = (grid.start_point[0] + grid.end_point[0]) / 2
-            mid_y = (grid.start_point[1] + grid.end_point[1]) / 2
-            fig.add_annotation(
-                x=mid_x, y=mid_y,
-                text=grid.id,
-                showarrow=False,
-                font=dict(size=10, color=LAYER_COLORS["AXIS"]),
-                bgcolor='rgba(255,255,255,0.8)'
-            )
+        fig.add_traces(grid_line_traces(structural_system, font_size=10))
     
-    # 2. 柱の表示
+    # 2. 柱
     if show_layers.get("columns", True):
-        for col in structural_system.columns:
-            color = LAYER_COLORS["LOCKED"] if col.locked else LAYER_COLORS["S_COL"]
-            
-            if col.section_type == "rect":
-                # 矩形柱
-                x0 = col.x - col.width / 2
-                y0 = col.y - col.depth / 2
-                x1 = col.x + col.width / 2
-                y1 = col.y + col.depth / 2
-                
-                fig.add_shape(
-                    type="rect",
-                    x0=x0, y0=y0, x1=x1, y1=y1,
-                    fillcolor=color,
-                    opacity=0.6,
-                    line=dict(color=color, width=2)
-                )
-            else:
-                # 円形柱
-                fig.add_shape(
-                    type="circle",
-                    x0=col.x - col.width/2, y0=col.y - col.width/2,
-                    x1=col.x + col.width/2, y1=col.y + col.width/2,
-                    fillcolor=color,
-                    opacity=0.6,
-                    line=dict(color=color, width=2)
-                )
-            
-            # 柱ラベル
-            fig.add_annotation(
-                x=col.x, y=col.y,
-                text=f"{col.id}<br>{col.width:.0f}×{col.depth:.0f}",
-                showarrow=False,
-                font=dict(size=8, color='white'),
-                bgcolor=color
-            )
+        fig.add_traces(column_traces(structural_system, opacity=0.6, show_section=True))
     
-    # 3. 梁の表示
+    # 3. 梁・まぐさ
     if show_layers.get("beams", True):
-        for beam in structural_system.beams:
-            color = LAYER_COLORS["LINTEL"] if beam.is_lintel else LAYER_COLORS["S_BEAM"]
-            if beam.locked:
-                color = LAYER_COLORS["LOCKED"]
-            
-            width = 3 if beam.is_lintel else 2
-            
-            fig.add_trace(go.Scatter(
-                x=[beam.start_point[0], beam.end_point[0]],
-                y=[beam.start_point[1], beam.end_point[1]],
-                mode='lines',
-                line=dict(color=color, width=width),
-                name=f'{"まぐさ" if beam.is_lintel else "梁"} {beam.id}',
-                hovertemplate=f'{"まぐさ" if beam.is_lintel else "梁"}: {beam.id}<br>幅: {beam.width:.0f}mm<br>梁成: {beam.depth:.0f}mm<br>{beam.note}<extra></extra>',
-                showlegend=False
-            ))
-            
-            # 梁ラベル
-            mid_x = (beam.start_point[0] + beam.end_point[0]) / 2
-            mid_y = (beam.start_point[1] + beam.end_point[1]) / 2
-            fig.add_annotation(
-                x=mid_x, y=mid_y,
-                text=f"{beam.id}<br>D={beam.depth:.0f}",
-                showarrow=False,
-                font=dict(size=7, color=color),
-                bgcolor='rgba(255,255,255,0.7)'
-            )
+        fig.add_traces(beam_traces(structural_system, include_lintels=True, show_labels=True))
     
-    # 4. 間柱の表示
+    # 4. 間柱（ティック）
     if show_layers.get("studs", True):
-        for stud in structural_system.studs:
-            color = LAYER_COLORS["S_COL"] if stud.stud_type == "king" else LAYER_COLORS["N_STUD"]
-            width = 3 if stud.stud_type == "king" else 1
-            
-            # 間柱を短い線（ティック）で表示
-            tick_length = 50  # mm
-            fig.add_trace(go.Scatter(
-                x=[stud.x, stud.x],
-                y=[stud.y - tick_length/2, stud.y + tick_length/2],
-                mode='lines',
-                line=dict(color=color, width=width),
-                name=f'間柱 {stud.id}',
-                hovertemplate=f'間柱: {stud.id}<br>タイプ: {stud.stud_type}<br>{stud.note}<extra></extra>',
-                showlegend=False
-            ))
+        fig.add_traces(stud_traces(structural_system, style="tick"))
     
     # 5. 警告・違反の表示
     for warning in structural_system.warnings:
@@ -0,0 +1,101 @@
+"""
+割付・板取のバックグラウンド実行（ジョブの投入・進捗表示・結果の取り込み）
+実行中は進捗表示だけを定期的に再描画し、終わったらアプリ全体を再実行して結果をタブに反映する。
+"""
+import streamlit as st
+from src.i18n import get_text
+from src.jobs import get_runner, submit_pipeline
+from src.pipeline import Pipeline, PipelineRun, default_pipeline, pipeline_inputs, results_from_run
+from src.ui.results_state import set_results, seed_results_cache
+
+POLL_INTERVAL = 0.5  # 進捗の再描画間隔（秒）
+
+
+def session_pipeline() -> Pipeline:
+    """セッションごとのパイプライン（段階ごとのメモを持つ）"""
+    if "pipeline" not in st.session_state:
+        st.session_state.pipeline = default_pipeline()
+    return st.session_state.pipeline
+
+
+def apply_pipeline_run(run: PipelineRun) -> None:
+    """
+    パイプラインの結果をセッションに反映する。割付・板取がメモの再利用で、以前に反映したものと同じなら
+    そのときの version を使い、図のキャッシュ（version がキー）を活かす。
+    """
+    results = results_from_run(run)
+    key = results["pipeline_key"]
+    versions = st.session_state.setdefault("pipeline_versions", {})
+    if not run.recomputed["nesting"] and key in versions:
+        results["version"] = versions.pop(key)
+    set_results(results)
+    versions[key] = results["version"]
+    while len(versions) > session_pipeline().memo_size:
+        versions.pop(next(iter(versions)))
+    st.session_state.structural_system = run.outputs["structural"]
+    if "tables" in run.outputs:
+        seed_results_cache(run.outputs["tables"])
+
+
+def cancel_pipeline_job() -> None:
+    """投入済みのジョブを中止し、その結果を取り込まないようにする"""
+    job_id = st.session_state.pop("pipeline_job", None)
+    st.session_state.pop("pipeline_params", None)
+    if job_id is not None:
+        get_runner().cancel(job_id)
+
+
+def run_pipeline_now(project, board, rules, output_mode: str, stud_pitch: int, prefer_y_long: bool, extra_walls) -> PipelineRun:
+    """
+    パイプラインをこのスクリプト実行内で計算して反映する（小さな再計算用）。
+    投入済みのジョブは中止する（古い条件の結果が後から上書きしないように）。
+    """
+    cancel_pipeline_job()
+    run = session_pipeline().run(pipeline_inputs(project, board, rules, output_mode, stud_pitch, prefer_y_long, extra_walls))
+    apply_pipeline_run(run)
+    return run
+
+
+def start_pipeline(project, board, rules, output_mode: str, stud_pitch: int, prefer_y_long: bool, extra_walls) -> None:
+    """実行中のジョブがあれば中止し、新しいジョブを投入する"""
+    cancel_pipeline_job()
+    job = submit_pipeline(session_pipeline(), project, board, rules, output_mode, stud_pitch, prefer_y_long, extra_walls)
+    st.session_state.pipeline_job = job.job_id
+    st.session_state.pipeline_params = {"pitch": stud_pitch, "board": board.name}
+
+
+@st.fragment(run_every=POLL_INTERVAL)
+def _render_progress(job_id: int) -> None:
+    current_lang = st.session_state.language
+    job = get_runner().get(job_id)
+    if job is None or not job.running:
+        st.rerun()  # 終了したらアプリ全体を再実行して結果を取り込む
+    stage = get_text(f"stage_{job.stage}", current_lang) if job.stage else "…"
+    st.progress(job.progress, text=get_text("job_running", current_lang).format(stage=stage, elapsed=job.elapsed))
+    if st.button(get_text("job_cancel", current_lang), key="pipeline_cancel"):
+        get_runner().cancel(job_id)
+
+
+def render_pipeline_status() -> None:
+    """ジョブの状態を表示し、完了していれば結果をセッションに取り込む（タブの描画より前に呼ぶ）"""
+    job_id = st.session_state.get("pipeline_job")
+    if job_id is None:
+        return
+    current_lang = st.session_state.language
+    runner = get_runner()
+    job = runner.get(job_id)
+    if job is not None and job.running:
+        _render_progress(job_id)
+        return
+
+    del st.session_state.pipeline_job
+    runner.pop(job_id)
+    if job is None or job.status == "cancelled":
+        st.info(get_text("job_cancelled", current_lang))
+    elif job.status == "failed":
+        st.error(get_text("job_failed", current_lang).format(error=job.error))
+        st.code(job.detail)
+    else:
+        apply_pipeline_run(job.result)
+        params = st.session_state.pop("pipeline_params", {"pitch": 0, "board": ""})
+        st.success(get_text("execution_success", current_lang).format(**params))
@@ -0,0 +1,53 @@
+"""
+割付・板取結果のセッション管理（結果の version）
+結果を差し替えたとき・パネルを直接書き換えたときに version を進め、図・帳票のキャッシュキーに使う。
+"""
+from itertools import count
+from typing import Any, Callable
+import streamlit as st
+
+_versions = count(1)
+
+
+def set_results(results: dict) -> dict:
+    """結果を保存する。version を持たない（新しく計算した）結果には新しい version を付ける"""
+    results.setdefault("version", next(_versions))
+    st.session_state.results = results
+    return results
+
+
+def touch_results() -> int:
+    """結果を直接書き換えた後に呼び、version を進める（パイプラインの結果とは別物になる）"""
+    key = st.session_state.results.pop("pipeline_key", None)
+    st.session_state.get("pipeline_versions", {}).pop(key, None)
+    st.session_state.results["version"] = next(_versions)
+    return st.session_state.results["version"]
+
+
+def results_version() -> int:
+    """現在の結果の version（結果がなければ 0）"""
+    return st.session_state.get("results", {}).get("version", 0)
+
+
+def _results_cache() -> dict:
+    """現在の version のキャッシュ（version が変わっていれば空にする）"""
+    version = results_version()
+    cache = st.session_state.get("results_cache")
+    if cache is None or cache["version"] != version:
+        cache = st.session_state.results_cache = {"version": version, "items": {}}
+    return cache["items"]
+
+
+def cached_for_results(name: str, build: Callable[[], Any]) -> Any:
+    """現在の結果の version ごとに値をキャッシュする（version が変わったら全て作り直す）"""
+    items = _results_cache()
+    if name not in items:
+        items[name] = build()
+    return items[name]
+
+
+def seed_results_cache(values: dict) -> None:
+    """計算済みの値を現在の version のキャッシュに入れておく（既にある値は置き換えない）"""
+    items = _results_cache()
+    for name, value in values.items():
+        items.setdefault(name, value)
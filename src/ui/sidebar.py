@@ -6,6 +6,8 @@ from src.i18n import LANGUAGES, get_text
 from src.input import load_demo_project
 from src.cedxm import load_cedxm, create_board_from_height
 from src.masterdata import default_master
+from src.ui.results_state import set_results
+from src.ui.pipeline_job import cancel_pipeline_job
 
 
 def render_sidebar():
@@ -48,13 +50,16 @@ def render_sidebar():
                     st.session_state.rules = _r
                 if "output_mode" not in st.session_state:
                     st.session_state.output_mode = _mode
-            st.session_state.results = {
+            cancel_pipeline_job()  # 前の案件のジョブの結果は取り込まない
+            set_results({
                 "panels": [], "errors": [], "placements": [],
                 "utilization": 0.0, "num_sheets": 0, "alloc_time": 0.0
-            }
+            })
             st.session_state.extra_walls = []
-            if "structural_system" in st.session_state:
-                del st.session_state["structural_system"]
+            for key in ("structural_system", "plan_editor_history", "plan_editor_rooms", "pipeline", "pipeline_versions", "extra_walls_version",
+                        "plan_lod", "room_plan_viewport"):
+                if key in st.session_state:
+                    del st.session_state[key]
             st.session_state.cedxm_upload_key = cedxm_upload_key + 1
             st.success(get_text("load_cedxm_success", current_lang))
             st.rerun()
@@ -1,66 +1,98 @@
 """
 2. 割付ビュー（壁立面・間柱設定・自動修正）
 """
+from dataclasses import replace
 import streamlit as st
 from src.i18n import get_text
-from src.allocating import calculate_corner_winning_rules, allocate_walls_with_architectural_constraints, extra_walls_to_wall_info
+from src.allocating import calculate_corner_winning_rules, extra_walls_to_wall_info
 from src.visualization import create_wall_elevation_plotly
-from src.nesting import simple_nesting
+from src.ui.results_state import touch_results, results_version
+from src.ui.pipeline_job import run_pipeline_now
 
 
 def render_tab_allocation(project, board, rules, output_mode, extra_walls, stud_pitch_base: int):
     current_lang = st.session_state.language
-    panels = st.session_state.results.get("panels", [])
-    structural_system = st.session_state.get("structural_system", None)
     wall_info_base = calculate_corner_winning_rules(project.room.polygon, project.room.wall_thickness)
     wall_info_extra = extra_walls_to_wall_info(extra_walls)
     wall_info = {**wall_info_base, **wall_info_extra}
-    H = project.room.height
 
     st.subheader(get_text("wall_elevation", current_lang))
-    tab_labels = list(wall_info.keys())
-    wall_tabs = st.tabs(tab_labels)
-    for wt, wid in zip(wall_tabs, tab_labels):
-        with wt:
-            ops = [op for op in project.openings if op.wall == wid]
-            wall_length = wall_info[wid]["length"]
-            if structural_system and hasattr(structural_system, "studs"):
-                wall_studs = [s for s in structural_system.studs if s.wall_id == wid]
-                king_studs = [s for s in wall_studs if s.stud_type == "king"]
-                regular_studs = [s for s in wall_studs if s.stud_type == "regular"]
-                st.caption(f"{wid}: 間柱={len(regular_studs)}本, キングスタッド={len(king_studs)}本")
-            elif wid in wall_info_extra:
-                st.caption(f"{wid}: 新規壁（内壁・間仕切り）・片側面割付")
-            fig_wall = create_wall_elevation_plotly(wid, wall_length, H, panels, ops, structural_system)
-            st.plotly_chart(fig_wall, use_container_width=True, height=600)
+    _render_wall_elevation(project, wall_info, wall_info_extra)
 
     st.divider()
     st.info(get_text("color_info", current_lang))
     st.info(get_text("constraint_info", current_lang))
     st.caption("※ 新規壁（W5以降）は片側面の割付です。内壁で両面施工の場合は、同一壁を2回割付する運用で対応できます。")
 
+    _render_stud_settings(project, board, rules, output_mode, extra_walls)
+
+
+ELEVATION_CACHE_SIZE = 32  # 壁立面図キャッシュの件数
+
+
+def _elevation_figure(wid, wall_length, H, panels, ops, structural_system):
+    """
+    壁立面図をキャッシュから取得（なければ作成）。
+    キー: (壁ID, 結果の version, 開口, 壁長さ・高さ, 構造の架構キー・その壁の間柱キー)
+    """
+    structural_key = None
+    if structural_system is not None and hasattr(structural_system, "wall_keys"):
+        structural_key = (structural_system.frame_key, structural_system.wall_keys.get(wid))
+    key = (wid, results_version(), repr(ops), wall_length, H, structural_key)
+    cache = st.session_state.setdefault("elevation_figures", {})
+    if key in cache:
+        cache[key] = cache.pop(key)  # 最近使ったものを末尾へ
+        return cache[key]
+    fig = create_wall_elevation_plotly(wid, wall_length, H, panels, ops, structural_system)
+    cache[key] = fig
+    while len(cache) > ELEVATION_CACHE_SIZE:
+        cache.pop(next(iter(cache)))
+    return fig
+
+
+@st.fragment
+def _render_wall_elevation(project, wall_info, wall_info_extra):
+    """選択中の壁だけ立面図を表示（フラグメント：壁の切り替えではこの部分だけ再実行）"""
+    panels = st.session_state.results.get("panels", [])
+    structural_system = st.session_state.get("structural_system", None)
+    wall_ids = list(wall_info.keys())
+    if st.session_state.get("elevation_wall") not in wall_ids:
+        st.session_state.elevation_wall = wall_ids[0]
+    wid = st.radio("壁", wall_ids, horizontal=True, key="elevation_wall", label_visibility="collapsed")
+
+    ops = [op for op in project.openings if op.wall == wid]
+    if structural_system and hasattr(structural_system, "studs_for"):
+        king_studs = structural_system.studs_for(wid, "king")
+        regular_studs = structural_system.studs_for(wid, "regular")
+        st.caption(f"{wid}: 間柱={len(regular_studs)}本, キングスタッド={len(king_studs)}本")
+    elif wid in wall_info_extra:
+        st.caption(f"{wid}: 新規壁（内壁・間仕切り）・片側面割付")
+    fig_wall = _elevation_figure(wid, wall_info[wid]["length"], project.room.height, panels, ops, structural_system)
+    st.plotly_chart(fig_wall, use_container_width=True, height=600)
+
+
+@st.fragment
+def _render_stud_settings(project, board, rules, output_mode, extra_walls):
+    """間柱設定・再計算・自動修正（フラグメント：選択の変更ではこの部分だけ再実行し、結果を変えたときはアプリ全体を再実行）"""
+    current_lang = st.session_state.language
+    panels = st.session_state.results.get("panels", [])
+    if "allocation_notice" in st.session_state:
+        st.success(st.session_state.pop("allocation_notice"))
+
     st.subheader(get_text("stud_setting", current_lang))
     stud_pitch_new = st.selectbox(
         get_text("stud_pitch", current_lang), [455, 303], index=0,
         format_func=lambda x: f"{x}mm", key="stud_pitch_allocation"
     )
     if st.button(get_text("recalculate", current_lang)):
-        panels, errors = allocate_walls_with_architectural_constraints(
-            project, board, rules, output_mode, stud_pitch_new, extra_walls=extra_walls
-        )
-        placements, util, num_sheets = simple_nesting(panels, board, rules, False)
-        st.session_state.results = {
-            "panels": panels, "errors": errors, "placements": placements,
-            "utilization": util, "num_sheets": num_sheets, "alloc_time": 0
-        }
-        st.success(f"{get_text('stud_pitch', current_lang)} {stud_pitch_new}mm {get_text('recalculated', current_lang)}")
+        run_pipeline_now(project, board, rules, output_mode, stud_pitch_new, False, extra_walls)
+        st.session_state.allocation_notice = f"{get_text('stud_pitch', current_lang)} {stud_pitch_new}mm {get_text('recalculated', current_lang)}"
         st.rerun()
 
     if st.button(get_text("auto_fix", current_lang)):
-        fixed = []
-        for p in panels:
-            if p.w < rules.min_piece:
-                p.note = (p.note or "") + " / 最小片違反"
-            fixed.append(p)
+        # パイプラインのメモにあるパネルは書き換えず、備考を付けた複製に差し替える
+        fixed = [replace(p, note=(p.note or "") + " / 最小片違反") if p.w < rules.min_piece else p for p in panels]
         st.session_state.results["panels"] = fixed
-        st.success(get_text("auto_fixed", current_lang))
+        touch_results()
+        st.session_state.allocation_notice = get_text("auto_fixed", current_lang)
+        st.rerun()
@@ -1,29 +1,119 @@
 """
 4. 図面・帳票ビュー（部材表・板取結果・エラー一覧のダウンロード）
+表・ダウンロード用データは結果の version ごとにキャッシュし、ダウンロード用データは「作成」ボタンを押したときだけ作る。
+PDF 図面セットは重いので、さらに専用の作成ボタンを押したときだけ描画する。
 """
+import io
+import tempfile
 import streamlit as st
 from src.i18n import get_text
+from src.allocating import calculate_corner_winning_rules, extra_walls_to_wall_info
+from src.dxf_export import write_nesting_dxf, write_elevations_dxf
+from src.pdf_export import drawing_set_pages, export_drawing_set
 from src.output import df_panels, df_errors, df_boards
+from src.arrow_export import panels_table, placements_table, errors_table, to_arrow_ipc_bytes, to_parquet_bytes
+from src.ui.results_state import cached_for_results, results_version
 
+# 型付き出力の形式 → (拡張子, MIME, 書き出し関数)
+TYPED_FORMATS = {
+    "Arrow IPC": ("arrow", "application/vnd.apache.arrow.file", to_arrow_ipc_bytes),
+    "Parquet": ("parquet", "application/vnd.apache.parquet", to_parquet_bytes),
+}
 
+
+def _csv(df) -> bytes:
+    return df.to_csv(index=False).encode("utf-8-sig")
+
+
+def _dxf(write, *args) -> bytes:
+    """DXF を一時ファイルに cp932 で逐次書き出し、最後に1度だけ読み込む（文字列全体＋エンコード後の二重保持を避ける）"""
+    with tempfile.TemporaryFile() as f:
+        text = io.TextIOWrapper(f, encoding="cp932", errors="replace", newline="\n")
+        write(text, *args)
+        text.flush()
+        text.detach()
+        f.seek(0)
+        return f.read()
+
+
+def _all_walls(project) -> dict:
+    """外周壁＋新規壁の wall_info"""
+    return {
+        **calculate_corner_winning_rules(project.room.polygon, project.room.wall_thickness),
+        **extra_walls_to_wall_info(st.session_state.get("extra_walls", []))
+    }
+
+
+def _elevations_dxf(panels) -> bytes:
+    """全壁（外周壁＋新規壁）の立面図 DXF"""
+    project = st.session_state.project
+    walls = [(wid, wall["length"], project.room.height) for wid, wall in _all_walls(project).items()]
+    return _dxf(write_elevations_dxf, walls, panels, project.openings, st.session_state.get("structural_system"))
+
+
+def _drawing_set_pdf(panels, placements, board):
+    """図面セット PDF（平面図・全壁の立面図・板取図）と、ページごとの描画時間"""
+    project = st.session_state.project
+    pages = drawing_set_pages(project, panels, placements, board, st.session_state.get("structural_system"), _all_walls(project))
+    buf = io.BytesIO()
+    timings = export_drawing_set(buf, pages)
+    return buf.getvalue(), timings
+
+
+@st.fragment
 def render_tab_drawings(board):
     current_lang = st.session_state.language
     panels = st.session_state.results.get("panels", [])
     errors = st.session_state.results.get("errors", [])
     placements = st.session_state.results.get("placements", [])
-    df_p = df_panels(panels)
-    df_e = df_errors(errors)
-    df_s = df_boards(placements, board)
+    df_p = cached_for_results("df_panels", lambda: df_panels(panels))
+    df_e = cached_for_results("df_errors", lambda: df_errors(errors))
+    df_s = cached_for_results("df_boards", lambda: df_boards(placements, board))
 
     st.subheader(get_text("table_output", current_lang))
+    # ダウンロード用データは作成ボタンを押した version についてだけ用意する
+    prepared = st.session_state.get("downloads_prepared") == results_version()
+    if not prepared and st.button(get_text("prepare_downloads", current_lang), key="prepare_downloads"):
+        st.session_state.downloads_prepared = results_version()
+        prepared = True
+
     st.write(f"**{get_text('parts_table', current_lang)}**")
     st.dataframe(df_p, use_container_width=True)
-    st.download_button(get_text("download_parts", current_lang), data=df_p.to_csv(index=False).encode("utf-8-sig"), file_name="panels.csv", mime="text/csv")
+    if prepared:
+        st.download_button(get_text("download_parts", current_lang), data=cached_for_results("csv:panels", lambda: _csv(df_p)), file_name="panels.csv", mime="text/csv")
 
     st.write(f"**{get_text('sheet_layout', current_lang)}**")
     st.dataframe(df_s, use_container_width=True, height=200)
-    st.download_button(get_text("download_nesting", current_lang), data=df_s.to_csv(index=False).encode("utf-8-sig"), file_name="nesting.csv", mime="text/csv")
+    if prepared:
+        st.download_button(get_text("download_nesting", current_lang), data=cached_for_results("csv:nesting", lambda: _csv(df_s)), file_name="nesting.csv", mime="text/csv")
 
     st.write(f"**{get_text('error_list', current_lang)}**")
     st.dataframe(df_e, use_container_width=True, height=160)
-    st.download_button(get_text("download_errors", current_lang), data=df_e.to_csv(index=False).encode("utf-8-sig"), file_name="errors.csv", mime="text/csv")
+    if prepared:
+        st.download_button(get_text("download_errors", current_lang), data=cached_for_results("csv:errors", lambda: _csv(df_e)), file_name="errors.csv", mime="text/csv")
+
+    if not prepared:
+        return
+    st.write(f"**{get_text('typed_export', current_lang)}**")
+    fmt = st.radio(get_text("export_format", current_lang), list(TYPED_FORMATS), horizontal=True, key="typed_export_format")
+    ext, mime, write = TYPED_FORMATS[fmt]
+    c1, c2, c3 = st.columns(3)
+    c1.download_button(f"{get_text('parts_table', current_lang)} (.{ext})", data=cached_for_results(f"{ext}:panels", lambda: write(panels_table(panels))), file_name=f"panels.{ext}", mime=mime)
+    c2.download_button(f"{get_text('sheet_layout', current_lang)} (.{ext})", data=cached_for_results(f"{ext}:nesting", lambda: write(placements_table(placements, board))), file_name=f"nesting.{ext}", mime=mime)
+    c3.download_button(f"{get_text('error_list', current_lang)} (.{ext})", data=cached_for_results(f"{ext}:errors", lambda: write(errors_table(errors))), file_name=f"errors.{ext}", mime=mime)
+
+    st.write(f"**{get_text('dxf_export', current_lang)}**")
+    c1, c2 = st.columns(2)
+    c1.download_button(f"{get_text('sheet_layout', current_lang)} (.dxf)", data=cached_for_results("dxf:nesting", lambda: _dxf(write_nesting_dxf, placements, board)), file_name="nesting.dxf", mime="application/dxf")
+    c2.download_button(f"{get_text('wall_elevation', current_lang)} (.dxf)", data=cached_for_results("dxf:elevations", lambda: _elevations_dxf(panels)), file_name="elevations.dxf", mime="application/dxf")
+
+    st.write(f"**{get_text('pdf_export', current_lang)}**")
+    # 図面セットは描画に時間がかかるので、CSV 等とは別に作成ボタンを押した version についてだけ作る
+    if st.session_state.get("pdf_prepared") != results_version():
+        if not st.button(get_text("prepare_pdf", current_lang), key="prepare_pdf"):
+            return
+        st.session_state.pdf_prepared = results_version()
+    pdf, timings = cached_for_results("pdf:set", lambda: _drawing_set_pdf(panels, placements, board))
+    st.download_button(f"{get_text('drawing_set', current_lang)} (.pdf)", data=pdf, file_name="drawings.pdf", mime="application/pdf")
+    slowest = max(timings, key=lambda t: t["sec"])
+    st.caption(f"{len(timings)} pages / {sum(t['sec'] for t in timings):.1f}s (max {slowest['sec']:.2f}s: {slowest['title']})")
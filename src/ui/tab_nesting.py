@@ -1,21 +1,63 @@
 """
-3. 板取ビュー
+3. 板取ビュー（全ボード一覧＋ページ送りのボード別板取図）
 """
+import math
 import streamlit as st
 from src.i18n import get_text
-from src.visualization import create_nesting_plotly
+from src.visualization import (
+    create_nesting_thumbnails_plotly, create_nesting_sheet_plotly, group_placements_by_sheet, NESTING_SHEETS_PER_PAGE
+)
 
 
+def _selected_sheet(event):
+    """一覧図のクリック（選択）からボード番号を取り出す"""
+    points = getattr(getattr(event, "selection", None), "points", None) or []
+    for p in points:
+        sid = p.get("customdata") if isinstance(p, dict) else getattr(p, "customdata", None)
+        if isinstance(sid, list):
+            sid = sid[0] if sid else None
+        if sid is not None:
+            return int(sid)
+    return None
+
+
+@st.fragment
 def render_tab_nesting(board):
+    """ページ送り・ボード選択ではこのタブだけ再実行し、表示中のページのボード図だけを作る"""
     current_lang = st.session_state.language
     placements = st.session_state.results.get("placements", [])
     util = st.session_state.results.get("utilization", 0.0)
 
     st.subheader(get_text("nesting_preview", current_lang))
-    if placements:
-        fig_nesting = create_nesting_plotly(placements, board)
-        if fig_nesting:
-            st.plotly_chart(fig_nesting, use_container_width=True)
-        st.success(f"{get_text('utilization_rate', current_lang)}: {util * 100:.1f}%")
-    else:
+    if not placements:
         st.info(get_text("nesting_info", current_lang))
+        return
+
+    sheets = group_placements_by_sheet(placements)
+    sheet_ids = list(sheets)
+    pages = math.ceil(len(sheet_ids) / NESTING_SHEETS_PER_PAGE)
+
+    st.caption(get_text("nesting_thumbnails", current_lang))
+    event = st.plotly_chart(
+        create_nesting_thumbnails_plotly(placements, board), use_container_width=True,
+        key="nesting_thumbnails", on_select="rerun", selection_mode=("points",)
+    )
+    # 一覧でボードを選んだら、そのボードのページへ移動（選択が変わったときだけ）
+    selected = _selected_sheet(event)
+    if selected is not None and selected != st.session_state.get("nesting_selected_sheet") and selected in sheets:
+        st.session_state.nesting_page = sheet_ids.index(selected) // NESTING_SHEETS_PER_PAGE + 1
+    st.session_state.nesting_selected_sheet = selected
+    if st.session_state.get("nesting_page", 1) > pages:
+        st.session_state.nesting_page = pages
+
+    page = 1
+    if pages > 1:
+        page = int(st.number_input(
+            f"{get_text('nesting_page', current_lang)} (1-{pages})", min_value=1, max_value=pages, step=1, key="nesting_page"
+        ))
+    page_ids = sheet_ids[(page - 1) * NESTING_SHEETS_PER_PAGE: page * NESTING_SHEETS_PER_PAGE]
+    cols = st.columns(3)
+    for n, sid in enumerate(page_ids):
+        with cols[n % 3]:
+            st.plotly_chart(create_nesting_sheet_plotly(sid, sheets[sid], board), use_container_width=True, key=f"nesting_sheet_{sid}")
+    st.success(f"{get_text('utilization_rate', current_lang)}: {util * 100:.1f}%")
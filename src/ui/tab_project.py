@@ -4,10 +4,14 @@
 import pandas as pd
 import streamlit as st
 from src.i18n import get_text
-from src.allocating import calculate_corner_winning_rules, allocate_walls_with_architectural_constraints, extra_walls_to_wall_info
+from src.allocating import calculate_corner_winning_rules, extra_walls_to_wall_info
 from src.visualization import create_room_plan_plotly, create_3d_elevation_view
 from src.interactive_plan import create_interactive_plan_editor
-from src.nesting import simple_nesting
+from src.wall_conflicts import check_new_walls
+from src.plan_lod import LOD_DETAIL_LIMIT, build_plan_lod
+from src.pipeline import pipeline_inputs
+from src.ui.results_state import results_version
+from src.ui.pipeline_job import session_pipeline, run_pipeline_now
 
 
 def render_tab_project(project, stud_pitch: int, prefer_y_long: bool):
@@ -67,34 +71,17 @@ def render_tab_project(project, stud_pitch: int, prefer_y_long: bool):
         c3.metric(get_text("error_count", current_lang), f"{err_count}")
 
     if "structural_system" not in st.session_state:
-        from src.structural import generate_structural_system
-        st.session_state.structural_system = generate_structural_system(project, "S", stud_pitch)
+        inputs = pipeline_inputs(project, board, rules, output_mode, stud_pitch, prefer_y_long, extra_walls)
+        st.session_state.structural_system = session_pipeline().run(inputs, targets=("structural",)).outputs["structural"]
     structural_system = st.session_state.structural_system
 
     with subtab2:
         st.subheader(get_text("plan_preview", current_lang))
         edit_mode = st.toggle("🖊️ 壁編集モード", value=False, key="wall_edit_mode")
         if edit_mode:
-            st.info("💡 壁編集モード：マウス操作で壁を作成できます")
-            new_walls = create_interactive_plan_editor(project, key_prefix="plan_editor")
-            if new_walls:
-                if st.button(get_text("apply_new_walls", current_lang), type="primary", use_container_width=True):
-                    st.session_state.extra_walls = list(new_walls)
-                    panels, errors = allocate_walls_with_architectural_constraints(
-                        project, board, rules, output_mode, stud_pitch,
-                        extra_walls=st.session_state.extra_walls
-                    )
-                    placements, util, num_sheets = simple_nesting(panels, board, rules, prefer_y_long)
-                    alloc_time = next((e.get("sec", 0) for e in errors if e.get("code") == "INFO-TIME" and e.get("phase") == "allocation"), 0)
-                    st.session_state.results = {
-                        "panels": panels, "errors": errors, "placements": placements,
-                        "utilization": util, "num_sheets": num_sheets, "alloc_time": alloc_time
-                    }
-                    st.success("✅ 新規壁を割付・板取に反映しました。「2. 割付ビュー」「3. 板取ビュー」で確認できます。")
-                    st.rerun()
+            _render_wall_editor(project, stud_pitch, prefer_y_long)
         else:
-            fig_plan = create_room_plan_plotly(project, structural_system)
-            st.plotly_chart(fig_plan, use_container_width=True, height=800)
+            _render_room_plan(project, structural_system)
 
     with subtab3:
         st.subheader(get_text("3d_elevation", current_lang))
@@ -108,3 +95,80 @@ def render_tab_project(project, stud_pitch: int, prefer_y_long: bool):
             st.plotly_chart(fig_3d, use_container_width=True, height=800)
         else:
             st.info(get_text("3d_info", current_lang))
+
+
+def _plan_lod(project, structural_system):
+    """平面プレビューの LOD レイヤ（構造・結果の version・ボード厚が同じ間は使い回す）"""
+    board_thickness = getattr(st.session_state.get("board", None), "thickness", 12.5)
+    lod = st.session_state.get("plan_lod")
+    if lod is None or not lod.matches(structural_system, results_version(), board_thickness):
+        lod = build_plan_lod(
+            project, structural_system, st.session_state.results.get("panels", []), board_thickness, results_version()
+        )
+        st.session_state.plan_lod = lod
+    return lod
+
+
+def _selected_box(event):
+    """平面図の範囲選択 (x0, y0, x1, y1)。選択がなければ None"""
+    selection = event.get("selection") if isinstance(event, dict) else getattr(event, "selection", None)
+    boxes = (selection.get("box") if isinstance(selection, dict) else getattr(selection, "box", None)) or []
+    for box in boxes:
+        xs, ys = box.get("x") or [], box.get("y") or []
+        if len(xs) == 2 and len(ys) == 2:
+            return (min(xs), min(ys), max(xs), max(ys))
+    return None
+
+
+@st.fragment
+def _render_room_plan(project, structural_system):
+    """平面プレビュー（フラグメント）。部材が多い場合は全体表示＋範囲選択での詳細表示"""
+    lod = _plan_lod(project, structural_system)
+    if lod.member_count <= LOD_DETAIL_LIMIT:
+        st.plotly_chart(create_room_plan_plotly(project, structural_system, lod=lod), use_container_width=True, height=800)
+        return
+
+    # 前回の範囲選択（ウィジェットの状態）を描画前に読み、新しい選択のときだけ表示範囲を更新
+    box = _selected_box(st.session_state.get("room_plan"))
+    if box is not None and box != st.session_state.get("room_plan_box"):
+        st.session_state.room_plan_viewport = box
+    st.session_state.room_plan_box = box
+    viewport = st.session_state.get("room_plan_viewport")
+
+    c1, c2 = st.columns([4, 1])
+    if viewport is None:
+        c1.caption(f"部材数 {lod.member_count} のため全体表示（パネル帯・柱ブロック）。範囲を選択すると間柱・パネルを個別に表示します。")
+    else:
+        c1.caption(f"詳細表示: X {viewport[0]:.0f}～{viewport[2]:.0f} / Y {viewport[1]:.0f}～{viewport[3]:.0f} mm")
+        if c2.button("全体表示", key="room_plan_reset"):
+            st.session_state.room_plan_viewport = viewport = None
+    fig_plan = create_room_plan_plotly(project, structural_system, viewport=viewport, lod=lod)
+    st.plotly_chart(fig_plan, use_container_width=True, height=800, key="room_plan", on_select="rerun", selection_mode=("box",))
+
+
+@st.fragment
+def _render_wall_editor(project, stud_pitch: int, prefer_y_long: bool):
+    """壁編集モード（フラグメント：エディタ操作ではこの部分だけ再実行し、反映時のみアプリ全体を再実行）"""
+    current_lang = st.session_state.language
+    board = st.session_state.board
+    rules = st.session_state.rules
+    output_mode = st.session_state.output_mode
+
+    st.info("💡 壁編集モード：マウス操作で壁を作成できます")
+    new_walls = create_interactive_plan_editor(project, key_prefix="plan_editor")
+    if new_walls:
+        apply_clicked = st.button(get_text("apply_new_walls", current_lang), type="primary", use_container_width=True)
+        conflicts = check_new_walls(project, new_walls) if apply_clicked else []
+        if conflicts:
+            st.error(f"❌ 壁の重なり・交差が {len(conflicts)} 件あります。修正してから反映してください。")
+            for c in conflicts:
+                st.write(f"- [{c['code']}] {c['msg']}")
+        elif apply_clicked:
+            # 壁集合と計算条件が同じ段階はパイプラインのメモを再利用（元に戻して以前の状態に戻った場合など）
+            wall_version = st.session_state.plan_editor_history.version
+            extra = list(new_walls)
+            run_pipeline_now(project, board, rules, output_mode, stud_pitch, prefer_y_long, extra)
+            st.session_state.extra_walls = extra
+            st.session_state.extra_walls_version = wall_version
+            st.success("✅ 新規壁を割付・板取に反映しました。「2. 割付ビュー」「3. 板取ビュー」で確認できます。")
+            st.rerun()
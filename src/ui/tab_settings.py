@@ -5,6 +5,7 @@ import streamlit as st
 from src.i18n import get_text
 
 
+@st.fragment
 def render_tab_settings():
     current_lang = st.session_state.language
     st.subheader(get_text("master_management", current_lang))
@@ -2,13 +2,19 @@
 Plotlyを使用した可視化機能
 """
 import math
+import numpy as np
 import streamlit as st
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from typing import List
+from typing import List, Dict, Optional
 from src.masterdata import Project, Panel, BoardMaster, NestPlacement, Opening
 from src.logic import place_opening_position
 from src.allocating import calculate_corner_winning_rules
+from src.structural import STUD_TYPES
+from src.plan_lod import PlanLOD, Viewport, LOD_DETAIL_LIMIT, build_plan_lod
+from src.structural_viz import (
+    grid_line_traces, column_traces, beam_traces, stud_traces, _segments2d, _segment_customdata
+)
 
 # 統一カラーパレット
 PANEL_COLORS = {
@@ -27,122 +33,34 @@ def get_panel_color(panel: Panel) -> str:
     # 現在は真物として薄緑を使用
     return PANEL_COLORS["good"]
 
-def create_room_plan_plotly(project: Project, structural_system=None):
-    """Plotlyを使用した平面プレビュー（CAD図面描画エンジン）- パネル割付結果と構造要素も表示"""
+def create_room_plan_plotly(project: Project, structural_system=None, viewport: Optional[Viewport] = None,
+                            lod: Optional[PlanLOD] = None):
+    """
+    Plotlyを使用した平面プレビュー（CAD図面描画エンジン）- パネル割付結果と構造要素も表示
+    通り芯・柱・梁・間柱・パネル・開口は種類・色ごとに Scattergl の1トレースにまとめ、ホバーは customdata で表示する。
+    部材数が LOD_DETAIL_LIMIT を超える場合、全体表示は集約レイヤ（パネル帯・柱ブロック・壁ごとの集計）だけを描き、
+    viewport (x0, y0, x1, y1) を指定したときにその範囲の間柱・パネル・ラベルを個別に描く。
+    lod は build_plan_lod() の事前計算済みレイヤ（省略時はその場で作る）。
+    """
     fig = go.Figure()
     
+    if lod is None:
+        lod = build_plan_lod(
+            project, structural_system, st.session_state.results.get("panels", []),
+            getattr(st.session_state.get("board", None), "thickness", 12.5)
+        )
     # 出隅ルールを適用した壁情報を取得
-    wall_info = calculate_corner_winning_rules(project.room.polygon, project.room.wall_thickness)
+    wall_info = lod.wall_info
+    large = lod.member_count > LOD_DETAIL_LIMIT
+    detail = viewport is not None or not large
     
-    # 構造要素の表示（最初に描画して背景に）
+    # 構造要素の表示（最初に描画して背景に）：種類・色ごとに少数の Scattergl トレースにまとめる
     if structural_system:
-        # 1. 通り芯の表示
-        for grid in structural_system.grid_lines:
-            line_style = "dash" if grid.is_virtual else "solid"
-            fig.add_trace(go.Scatter(
-                x=[grid.start_point[0], grid.end_point[0]],
-                y=[grid.start_point[1], grid.end_point[1]],
-                mode='lines',
-                line=dict(color='blue', width=1, dash=line_style),
-                name=f'通り芯 {grid.id}',
-                hovertemplate=f'通り芯: {grid.id}<br>{"仮想" if grid.is_virtual else "実"}<extra></extra>',
-                showlegend=False
-            ))
-            
-            # 通り芯ラベル
-            mid_x = (grid.start_point[0] + grid.end_point[0]) / 2
-            mid_y = (grid.start_point[1] + grid.end_point[1]) / 2
-            fig.add_annotation(
-                x=mid_x, y=mid_y,
-                text=grid.id,
-                showarrow=False,
-                font=dict(size=9, color='blue'),
-                bgcolor='rgba(255,255,255,0.7)'
-            )
-        
-        # 2. 柱の表示
-        for col in structural_system.columns:
-            color = 'cyan' if col.locked else 'darkgray'
-            
-            if col.section_type == "rect":
-                # 矩形柱
-                x0 = col.x - col.width / 2
-                y0 = col.y - col.depth / 2
-                x1 = col.x + col.width / 2
-                y1 = col.y + col.depth / 2
-                
-                # 矩形を描画
-                fig.add_shape(
-                    type="rect",
-                    x0=x0, y0=y0, x1=x1, y1=y1,
-                    fillcolor=color,
-                    opacity=0.5,
-                    line=dict(color=color, width=2),
-                    layer='below'
-                )
-            else:
-                # 円形柱
-                fig.add_shape(
-                    type="circle",
-                    x0=col.x - col.width/2, y0=col.y - col.width/2,
-                    x1=col.x + col.width/2, y1=col.y + col.width/2,
-                    fillcolor=color,
-                    opacity=0.5,
-                    line=dict(color=color, width=2),
-                    layer='below'
-                )
-            
-            # 柱ラベル
-            fig.add_annotation(
-                x=col.x, y=col.y,
-                text=f"{col.id}",
-                showarrow=False,
-                font=dict(size=7, color='white'),
-                bgcolor=color
-            )
-        
-        # 3. 梁の表示（まぐさは表示しない）
-        for beam in structural_system.beams:
-            if beam.is_lintel:
-                continue
-            color = 'cyan' if beam.locked else 'black'
-            width = 2
-            fig.add_trace(go.Scatter(
-                x=[beam.start_point[0], beam.end_point[0]],
-                y=[beam.start_point[1], beam.end_point[1]],
-                mode='lines',
-                line=dict(color=color, width=width),
-                name=f'梁 {beam.id}',
-                hovertemplate=f'梁: {beam.id}<br>幅: {beam.width:.0f}mm<br>梁成: {beam.depth:.0f}mm<extra></extra>',
-                showlegend=False
-            ))
-        
-        # 4. 間柱の2D表示（四角マーカー）
-        for stud in structural_system.studs:
-            is_king = stud.stud_type == "king"
-            
-            # 色とサイズの設定
-            if is_king:
-                color = 'rgba(255, 100, 0, 0.9)'  # 濃いオレンジ
-                size = 20
-            else:
-                color = 'rgba(150, 150, 150, 0.6)'  # 灰色
-                size = 12
-            
-            # 四角マーカーで表示
-            fig.add_trace(go.Scatter(
-                x=[stud.x], y=[stud.y],
-                mode='markers',
-                marker=dict(
-                    size=size, 
-                    color=color, 
-                    symbol='square',
-                    line=dict(width=2, color='black')
-                ),
-                name=f'{"キングスタッド" if is_king else "間柱"}',
-                hovertemplate=f'間柱: {stud.id}<br>タイプ: {stud.stud_type}<br>壁: {stud.wall_id}<extra></extra>',
-                showlegend=False
-            ))
+        fig.add_traces(grid_line_traces(structural_system, font_size=9, show_labels=detail))
+        fig.add_traces(column_traces(structural_system, opacity=0.5, show_section=False, show_labels=detail, viewport=viewport))
+        fig.add_traces(beam_traces(structural_system, include_lintels=False, show_labels=False))
+        if detail:
+            fig.add_traces(stud_traces(structural_system, style="marker", viewport=viewport))
     
     # 部屋外形の描画（外側の線）
     poly = project.room.polygon + [project.room.polygon[0]]  # 閉じた多角形
@@ -237,7 +155,10 @@ def create_room_plan_plotly(project: Project, structural_system=None):
             hovertemplate=f'壁 {wid}<br>長さ: {wall["length"]:.0f}mm<br>厚さ: {project.room.wall_thickness:.0f}mm<extra></extra>'
         ))
     
-    # 壁ラベルの追加
+    # 壁ラベルの追加（ホバーで壁ごとの間柱・パネルの集計）
+    wall_summary = {
+        row[0]: f"{row[0]}: 間柱 {row[4]}本 / キングスタッド {row[5]}本 / パネル {row[6]}枚" for row in lod.wall_rows
+    }
     for wid in ["W1", "W2", "W3", "W4"]:
         wall = wall_info[wid]
         center_x = (wall["start"][0] + wall["end"][0]) / 2
@@ -246,6 +167,7 @@ def create_room_plan_plotly(project: Project, structural_system=None):
         fig.add_annotation(
             x=center_x, y=center_y,
             text=f'{wid}<br>{wall["length"]:.0f}mm',
+            hovertext=wall_summary.get(wid),
             showarrow=False,
             font=dict(size=12, color='blue'),
             bgcolor='rgba(255,255,255,0.8)',
@@ -253,60 +175,41 @@ def create_room_plan_plotly(project: Project, structural_system=None):
             borderwidth=1
         )
     
-    # パネル割付結果の表示（平面図上）- 壁の内側面に配置
-    panels = st.session_state.results.get("panels", [])
-    if panels:
-        # ボード厚さを取得（デフォルト12.5mm）
-        board_thickness = getattr(st.session_state.get("board", None), "thickness", 12.5)
-        
-        for panel in panels:
-            wall = wall_info[panel.wall_id]
-            
-            # パネルの位置を壁の内側面に計算
-            if wall["direction"] == "horizontal":
-                # 横壁の場合
-                panel_start_x = wall["start"][0] + (panel.x0 / wall["length"]) * (wall["end"][0] - wall["start"][0])
-                panel_end_x = wall["start"][0] + ((panel.x0 + panel.w) / wall["length"]) * (wall["end"][0] - wall["start"][0])
-                
-                # 壁の内側面に配置
-                if panel.wall_id == "W1":  # 下壁 - 内側は上側
-                    panel_y = wall["start"][1] + project.room.wall_thickness - board_thickness/2
-                else:  # W3 上壁 - 内側は下側
-                    panel_y = wall["start"][1] - project.room.wall_thickness + board_thickness/2
-                
-                fig.add_trace(go.Scatter(
-                    x=[panel_start_x, panel_end_x],
-                    y=[panel_y, panel_y],
-                    mode='lines',
-                    line=dict(color=get_panel_color(panel), width=8),
-                    name=f'パネル {panel.wall_id}',
-                    hovertemplate=f'パネル {panel.wall_id}<br>幅: {panel.w:.0f}mm<br>厚さ: {board_thickness:.1f}mm<br>ボード: B{panel.board_number}-P{panel.part_number}<br>端材: {"Yes" if panel.is_cut_piece else "No"}<br>備考: {panel.note}<extra></extra>',
-                    showlegend=False
-                ))
-            else:
-                # 縦壁の場合
-                panel_start_y = wall["start"][1] + (panel.x0 / wall["length"]) * (wall["end"][1] - wall["start"][1])
-                panel_end_y = wall["start"][1] + ((panel.x0 + panel.w) / wall["length"]) * (wall["end"][1] - wall["start"][1])
-                
-                # 壁の内側面に配置
-                if panel.wall_id == "W2":  # 右壁 - 内側は左側
-                    panel_x = wall["start"][0] - project.room.wall_thickness + board_thickness/2
-                else:  # W4 左壁 - 内側は右側
-                    panel_x = wall["start"][0] + project.room.wall_thickness - board_thickness/2
-                
-                fig.add_trace(go.Scatter(
-                    x=[panel_x, panel_x],
-                    y=[panel_start_y, panel_end_y],
-                    mode='lines',
-                    line=dict(color=get_panel_color(panel), width=8),
-                    name=f'パネル {panel.wall_id}',
-                    hovertemplate=f'パネル {panel.wall_id}<br>幅: {panel.w:.0f}mm<br>厚さ: {board_thickness:.1f}mm<br>ボード: B{panel.board_number}-P{panel.part_number}<br>端材: {"Yes" if panel.is_cut_piece else "No"}<br>備考: {panel.note}<extra></extra>',
-                    showlegend=False
+    # パネル割付結果の表示（平面図上）- 壁の内側面に配置。色ごとに1トレース
+    if detail:
+        for color, index in lod.panels_by_color(viewport).items():
+            seg = lod.panel_segments[index]
+            x, y = _segments2d(seg[:, 0], seg[:, 1], seg[:, 2], seg[:, 3])
+            fig.add_trace(go.Scattergl(
+                x=x, y=y, mode='lines',
+                line=dict(color=color, width=8),
+                name='パネル',
+                customdata=_segment_customdata([lod.panel_rows[i] for i in index.tolist()]),
+                hovertemplate=f'パネル %{{customdata[0]}}<br>幅: %{{customdata[1]:.0f}}mm<br>厚さ: {lod.board_thickness:.1f}mm<br>ボード: %{{customdata[2]}}<br>端材: %{{customdata[3]}}<br>備考: %{{customdata[4]}}<extra></extra>',
+                showlegend=False
+            ))
+            if viewport is not None:
+                # 拡大表示ではパネルごとのラベル（ボード-パーツ番号）も描く
+                fig.add_trace(go.Scattergl(
+                    x=((seg[:, 0] + seg[:, 2]) / 2).astype(np.float32), y=((seg[:, 1] + seg[:, 3]) / 2).astype(np.float32),
+                    mode='text', text=[lod.panel_rows[i][2] for i in index.tolist()],
+                    textfont=dict(size=8, color='dimgray'), name='パネルラベル', hoverinfo='skip', showlegend=False
                 ))
+    else:
+        # 全体表示：同じ壁・同じ色で連続するパネルを1本の帯にまとめる
+        for color, seg in lod.panel_bands.items():
+            x, y = _segments2d(seg[:, 0], seg[:, 1], seg[:, 2], seg[:, 3])
+            fig.add_trace(go.Scattergl(
+                x=x, y=y, mode='lines', line=dict(color=color, width=8),
+                name='パネル（集約）', hoverinfo='skip', showlegend=False
+            ))
     
-    # 開口の可視化
+    # 開口の可視化（1トレース）
+    opening_segments, opening_rows = [], []
     for op in project.openings:
-        wall = wall_info[op.wall]
+        wall = wall_info.get(op.wall)
+        if wall is None:
+            continue
         L = wall["length"]
         off = place_opening_position(L, op)
         
@@ -318,13 +221,17 @@ def create_room_plan_plotly(project: Project, structural_system=None):
             oy = wall["start"][1] + (off / L) * (wall["end"][1] - wall["start"][1])
             ey = wall["start"][1] + ((off + op.width) / L) * (wall["end"][1] - wall["start"][1])
             ox = ex = wall["start"][0]
-        
-        fig.add_trace(go.Scatter(
-            x=[ox, ex], y=[oy, ey],
-            mode='lines',
+        opening_segments.append((ox, oy, ex, ey))
+        opening_rows.append((op.opening_id, op.type, op.width, op.height))
+    
+    if opening_segments:
+        x, y = _segments2d(*zip(*opening_segments))
+        fig.add_trace(go.Scattergl(
+            x=x, y=y, mode='lines',
             line=dict(color=PANEL_COLORS["opening"], width=8),
-            name=f"開口部: {op.opening_id}",
-            hovertemplate=f'開口部: {op.opening_id}<br>種類: {op.type}<br>幅: {op.width}mm<br>高さ: {op.height}mm<extra></extra>'
+            name="開口部",
+            customdata=_segment_customdata(opening_rows),
+            hovertemplate='開口部: %{customdata[0]}<br>種類: %{customdata[1]}<br>幅: %{customdata[2]}mm<br>高さ: %{customdata[3]}mm<extra></extra>'
         ))
     
     # 部屋情報の表示
@@ -359,114 +266,173 @@ def create_room_plan_plotly(project: Project, structural_system=None):
             fixedrange=False  # マウスホイールでの拡大縮小を有効化
         ),
         hovermode='closest',
-        dragmode='pan'  # デフォルトでパンモードに設定
+        # 部材が多い平面は範囲選択で拡大（詳細表示）、それ以外はパンモード
+        dragmode='select' if large else 'pan'
     )
+    if large and viewport is None:
+        fig.update_layout(title="平面プレビュー（全体表示：パネル帯・柱ブロック）- 範囲を選択すると間柱・パネルを個別に表示")
+    if viewport is not None:
+        x0, y0, x1, y1 = viewport
+        fig.update_xaxes(range=[x0, x1])
+        fig.update_yaxes(range=[y0, y1])
     
     return fig
 
+def _polylines3d(polylines):
+    """折れ線のリスト [(xs, ys, zs), ...] を NaN 区切りの1本の座標列にまとめる（1トレースで描画するため）"""
+    xs, ys, zs = [], [], []
+    for px, py, pz in polylines:
+        xs.extend(px); ys.extend(py); zs.extend(pz)
+        xs.append(np.nan); ys.append(np.nan); zs.append(np.nan)
+    return np.array(xs, dtype=np.float32), np.array(ys, dtype=np.float32), np.array(zs, dtype=np.float32)
+
+def _vertical_segments3d(x, y, z0, z1):
+    """鉛直線分群（配列）を NaN 区切りの座標列にまとめる"""
+    coords = []
+    for a, b in ((x, x), (y, y), (z0, z1)):
+        seg = np.full((len(a), 3), np.nan, dtype=np.float32)
+        seg[:, 0], seg[:, 1] = a, b
+        coords.append(seg.ravel())
+    return coords
+
+def _vertex_customdata(rows, points_per_item: int):
+    """要素ごとのホバー情報を頂点（区切りを含む）ごとに繰り返す。整数だけなら整数配列（バイナリで送られる）にする"""
+    if rows and all(isinstance(v, (int, np.integer)) for row in rows for v in row):
+        data = np.array(rows, dtype=np.int64)
+        data = data.astype(np.int16 if np.abs(data).max() < 2 ** 15 else np.int32)
+    else:
+        data = np.empty((len(rows), len(rows[0]) if rows else 0), dtype=object)
+        for n, row in enumerate(rows):
+            data[n] = row
+    return np.repeat(data, points_per_item, axis=0)
+
+def _lines3d_trace(polylines, rows, hovertemplate: str, line: dict, name: str, showlegend: bool = False, text=None):
+    """折れ線群を1つの Scatter3d にまとめる（rows は要素ごとのホバー情報、text は要素ごとの文字列）"""
+    x, y, z = _polylines3d(polylines)
+    points = len(polylines[0][0]) + 1 if polylines else 1
+    return go.Scatter3d(
+        x=x, y=y, z=z, mode='lines', line=line, name=name,
+        customdata=_vertex_customdata(rows, points), hovertemplate=hovertemplate, showlegend=showlegend,
+        text=np.repeat(np.array(text, dtype=object), points) if text is not None else None
+    )
+
+def _box_mesh(boxes):
+    """直方体 (x0, x1, y0, y1, z0, z1) のリストを1つのメッシュ（頂点・三角形）にまとめる"""
+    i = np.array([0, 0, 4, 4, 0, 1, 1, 2, 2, 3, 3, 0])
+    j = np.array([1, 3, 5, 7, 4, 5, 2, 6, 3, 7, 0, 1])
+    k = np.array([2, 4, 6, 6, 5, 6, 6, 7, 7, 4, 4, 2])
+    vx, vy, vz = [], [], []
+    for x0, x1, y0, y1, z0, z1 in boxes:
+        vx += [x0, x1, x1, x0, x0, x1, x1, x0]
+        vy += [y0, y0, y1, y1, y0, y0, y1, y1]
+        vz += [z0, z0, z0, z0, z1, z1, z1, z1]
+    base = 8 * np.arange(len(boxes))[:, None]
+    return (np.array(vx, dtype=np.float32), np.array(vy, dtype=np.float32), np.array(vz, dtype=np.float32),
+            (i + base).ravel(), (j + base).ravel(), (k + base).ravel())
+
+def _quad_mesh(quads):
+    """四角形 (xs, ys, zs)（各4頂点）のリストを1つのメッシュにまとめる"""
+    vx, vy, vz = [], [], []
+    for qx, qy, qz in quads:
+        vx += qx; vy += qy; vz += qz
+    base = 4 * np.arange(len(quads))[:, None]
+    return vx, vy, vz, (np.array([0, 0]) + base).ravel(), (np.array([1, 2]) + base).ravel(), (np.array([2, 3]) + base).ravel()
+
+def _inner_face_rect(wall_id: str, wall: dict, start: float, end: float, z0: float, z1: float,
+                     wall_thickness: float, board_thickness: float):
+    """壁の内側面（ボード厚さ分手前）に置く矩形の折れ線。start/end は壁起点からの位置（mm）"""
+    r0, r1 = start / wall["length"], end / wall["length"]
+    sx, sy = wall["start"]
+    ex, ey = wall["end"]
+    z = [z0, z0, z1, z1, z0]
+    if wall["direction"] == "horizontal":
+        # W1（下壁）は上側、W3・新規壁は下側の面
+        y = sy + (wall_thickness - board_thickness if wall_id == "W1" else -wall_thickness + board_thickness)
+        x_a, x_b = sx + r0 * (ex - sx), sx + r1 * (ex - sx)
+        return [x_a, x_b, x_b, x_a, x_a], [y] * 5, z
+    # W2（右壁）は左側、W4・新規壁は右側の面
+    x = sx + (-wall_thickness + board_thickness if wall_id == "W2" else wall_thickness - board_thickness)
+    y_a, y_b = sy + r0 * (ey - sy), sy + r1 * (ey - sy)
+    return [x] * 5, [y_a, y_b, y_b, y_a, y_a], z
+
 def create_3d_elevation_view(project: Project, panels: List[Panel], structural_system=None, wall_info=None):
     """3D表示見付図（立体的な壁面表示）- 建築的制約に基づく正確な表示 + 構造要素。
-    wall_info を渡すと W5,W6,... を含む拡張壁情報でパネルを表示（新規壁対応）。"""
+    wall_info を渡すと W5,W6,... を含む拡張壁情報でパネルを表示（新規壁対応）。
+    同じ種類・見た目の要素は Mesh3d / Scatter3d にまとめ（NaN 区切り、間柱・パネルは壁ごと）、ホバー情報は customdata に持たせる。"""
     fig = go.Figure()
     if wall_info is None:
         wall_info = calculate_corner_winning_rules(project.room.polygon, project.room.wall_thickness)
     height = project.room.height
-    
+    wall_thickness = project.room.wall_thickness
+
     # 構造要素の3D表示（最初に描画）
     if structural_system:
-        # 1. 柱の3D表示
-        for col in structural_system.columns:
-            color = 'cyan' if col.locked else 'rgba(128,128,128,0.6)'
-            
-            if col.section_type == "rect":
-                # 矩形柱をメッシュで表示
-                x0 = col.x - col.width / 2
-                x1 = col.x + col.width / 2
-                y0 = col.y - col.depth / 2
-                y1 = col.y + col.depth / 2
-                z0 = col.base_level
-                z1 = col.top_level
-                
-                # 8頂点
-                vertices_x = [x0, x1, x1, x0, x0, x1, x1, x0]
-                vertices_y = [y0, y0, y1, y1, y0, y0, y1, y1]
-                vertices_z = [z0, z0, z0, z0, z1, z1, z1, z1]
-                
-                # 12三角形（6面×2三角形）
-                i = [0, 0, 4, 4, 0, 1, 1, 2, 2, 3, 3, 0]
-                j = [1, 3, 5, 7, 4, 5, 2, 6, 3, 7, 0, 1]
-                k = [2, 4, 6, 6, 5, 6, 6, 7, 7, 4, 4, 2]
-                
-                fig.add_trace(go.Mesh3d(
-                    x=vertices_x,
-                    y=vertices_y,
-                    z=vertices_z,
-                    i=i, j=j, k=k,
-                    color=color,
-                    opacity=0.7,
-                    name=f'柱 {col.id}',
-                    hovertemplate=f'柱: {col.id}<br>断面: {col.width:.0f}×{col.depth:.0f}<br>材質: {col.material}<extra></extra>',
-                    showlegend=False
-                ))
-            else:
-                # 円形柱（簡略化：線分で表示）
-                fig.add_trace(go.Scatter3d(
-                    x=[col.x, col.x],
-                    y=[col.y, col.y],
-                    z=[col.base_level, col.top_level],
-                    mode='lines',
-                    line=dict(color='darkgray', width=8),
-                    name=f'柱 {col.id}',
-                    hovertemplate=f'柱: {col.id}<br>直径: {col.width:.0f}<br>材質: {col.material}<extra></extra>',
-                    showlegend=False
-                ))
-        
-        # 2. 梁の3D表示（まぐさは表示しない）
-        for beam in structural_system.beams:
-            if beam.is_lintel:
+        columns = structural_system.columns
+        # 1. 柱の3D表示（矩形柱は色ごとに1メッシュ）
+        for locked, color in ((False, 'rgba(128,128,128,0.6)'), (True, 'cyan')):
+            rect_cols = [c for c in columns if c.section_type == "rect" and bool(c.locked) == locked]
+            if not rect_cols:
                 continue
-            color = 'cyan' if beam.locked else 'rgba(64,64,64,0.8)'
-            width = 4
-            fig.add_trace(go.Scatter3d(
-                x=[beam.start_point[0], beam.end_point[0]],
-                y=[beam.start_point[1], beam.end_point[1]],
-                z=[beam.start_point[2], beam.end_point[2]],
-                mode='lines',
-                line=dict(color=color, width=width),
-                name=f'梁 {beam.id}',
-                hovertemplate=f'梁: {beam.id}<br>幅: {beam.width:.0f}mm<br>梁成: {beam.depth:.0f}mm<extra></extra>',
+            vx, vy, vz, fi, fj, fk = _box_mesh([
+                (c.x - c.width / 2, c.x + c.width / 2, c.y - c.depth / 2, c.y + c.depth / 2, c.base_level, c.top_level)
+                for c in rect_cols
+            ])
+            fig.add_trace(go.Mesh3d(
+                x=vx, y=vy, z=vz, i=fi, j=fj, k=fk,
+                color=color,
+                opacity=0.7,
+                name='柱',
+                customdata=_vertex_customdata([(c.id, f"{c.width:.0f}×{c.depth:.0f}", c.material) for c in rect_cols], 8),
+                hovertemplate='柱: %{customdata[0]}<br>断面: %{customdata[1]}<br>材質: %{customdata[2]}<extra></extra>',
                 showlegend=False
             ))
-        
-        # 3. 間柱の3D表示（色分け）
-        for stud in structural_system.studs:
-            is_king = stud.stud_type == "king"
-            
-            # 色とサイズの設定
-            if is_king:
-                color = 'rgba(255, 100, 0, 0.9)'  # 濃いオレンジ
-                width = 14
-            else:
-                color = 'rgba(150, 150, 150, 0.6)'  # 灰色
-                width = 6
-            
-            # 間柱を線分で表示
-            fig.add_trace(go.Scatter3d(
-                x=[stud.x, stud.x],
-                y=[stud.y, stud.y],
-                z=[stud.base_level, stud.top_level],
-                mode='lines',
-                line=dict(color=color, width=width),
-                name=f'{"キングスタッド" if is_king else "間柱"} {stud.id}',
-                hovertemplate=f'間柱: {stud.id}<br>タイプ: {stud.stud_type}<br>壁: {stud.wall_id}<extra></extra>',
-                showlegend=False
+        # 円形柱（簡略化：線分で表示）
+        round_cols = [c for c in columns if c.section_type != "rect"]
+        if round_cols:
+            fig.add_trace(_lines3d_trace(
+                [([c.x, c.x], [c.y, c.y], [c.base_level, c.top_level]) for c in round_cols],
+                [(c.id, f"{c.width:.0f}", c.material) for c in round_cols],
+                '柱: %{customdata[0]}<br>直径: %{customdata[1]}<br>材質: %{customdata[2]}<extra></extra>',
+                dict(color='darkgray', width=8), '柱'
             ))
-    
+
+        # 2. 梁の3D表示（まぐさは表示しない）。色ごとに1トレース
+        beams = [b for b in structural_system.beams if not b.is_lintel]
+        for locked, color in ((False, 'rgba(64,64,64,0.8)'), (True, 'cyan')):
+            group = [b for b in beams if bool(b.locked) == locked]
+            if group:
+                fig.add_trace(_lines3d_trace(
+                    [tuple([b.start_point[a], b.end_point[a]] for a in range(3)) for b in group],
+                    [(b.id, f"{b.width:.0f}", f"{b.depth:.0f}") for b in group],
+                    '梁: %{customdata[0]}<br>幅: %{customdata[1]}mm<br>梁成: %{customdata[2]}mm<extra></extra>',
+                    dict(color=color, width=4), '梁'
+                ))
+
+        # 3. 間柱の3D表示（通常・キングスタッドで色分け）。壁・種類ごとに1トレースにまとめ、
+        #    壁名・種類はホバーテンプレートに埋め込み、番号だけを整数の customdata で持つ
+        stud_styles = {"regular": ('rgba(150, 150, 150, 0.6)', 6, '間柱', ''),
+                       "king": ('rgba(255, 100, 0, 0.9)', 14, 'キングスタッド', 'K')}
+        table = structural_system.stud_table
+        for type_index, stud_type in enumerate(STUD_TYPES):
+            color, width, label, prefix = stud_styles[stud_type]
+            of_type = table.stud_type == type_index
+            for w, wid in enumerate(table.wall_ids):
+                idx = np.flatnonzero(of_type & (table.wall_index == w))
+                if not len(idx):
+                    continue
+                x, y, z = _vertical_segments3d(table.x[idx], table.y[idx], table.base_level[idx], table.top_level[idx])
+                fig.add_trace(go.Scatter3d(
+                    x=x, y=y, z=z, mode='lines', line=dict(color=color, width=width), name=f'{label} {wid}',
+                    customdata=np.repeat(table.number[idx].astype(np.int16), 3),
+                    hovertemplate=f'間柱: ST_{wid}_{prefix}%{{customdata:03d}}<br>タイプ: {stud_type}<br>壁: {wid}<extra></extra>',
+                    showlegend=False
+                ))
+
     # 床面（外側）
     floor_x = [p[0] for p in project.room.polygon] + [project.room.polygon[0][0]]
     floor_y = [p[1] for p in project.room.polygon] + [project.room.polygon[0][1]]
     floor_z = [0] * len(floor_x)
-    
+
     fig.add_trace(go.Scatter3d(
         x=floor_x, y=floor_y, z=floor_z,
         mode='lines',
@@ -474,7 +440,7 @@ def create_3d_elevation_view(project: Project, panels: List[Panel], structural_s
         name='床面（外側）',
         hovertemplate='床面<br>X: %{x}mm<br>Y: %{y}mm<extra></extra>'
     ))
-    
+
     # 床面（内側）
     inner_floor_x = []
     inner_floor_y = []
@@ -483,22 +449,22 @@ def create_3d_elevation_view(project: Project, panels: List[Panel], structural_s
         if wall["direction"] == "horizontal":
             if wid == "W1":  # 下壁
                 inner_floor_x.append(wall["start"][0])
-                inner_floor_y.append(wall["start"][1] + project.room.wall_thickness)
+                inner_floor_y.append(wall["start"][1] + wall_thickness)
             else:  # W3 上壁
                 inner_floor_x.append(wall["start"][0])
-                inner_floor_y.append(wall["start"][1] - project.room.wall_thickness)
+                inner_floor_y.append(wall["start"][1] - wall_thickness)
         else:  # vertical
             if wid == "W2":  # 右壁
-                inner_floor_x.append(wall["start"][0] - project.room.wall_thickness)
+                inner_floor_x.append(wall["start"][0] - wall_thickness)
                 inner_floor_y.append(wall["start"][1])
             else:  # W4 左壁
-                inner_floor_x.append(wall["start"][0] + project.room.wall_thickness)
+                inner_floor_x.append(wall["start"][0] + wall_thickness)
                 inner_floor_y.append(wall["start"][1])
-    
+
     inner_floor_x.append(inner_floor_x[0])
     inner_floor_y.append(inner_floor_y[0])
     inner_floor_z = [0] * len(inner_floor_x)
-    
+
     fig.add_trace(go.Scatter3d(
         x=inner_floor_x, y=inner_floor_y, z=inner_floor_z,
         mode='lines',
@@ -506,11 +472,11 @@ def create_3d_elevation_view(project: Project, panels: List[Panel], structural_s
         name='床面（内側）',
         hovertemplate='床面（内側）<br>X: %{x}mm<br>Y: %{y}mm<extra></extra>'
     ))
-    
+
     # 天井面（外側と内側）
     ceiling_z = [height] * len(floor_x)
     inner_ceiling_z = [height] * len(inner_floor_x)
-    
+
     fig.add_trace(go.Scatter3d(
         x=floor_x, y=floor_y, z=ceiling_z,
         mode='lines',
@@ -518,7 +484,7 @@ def create_3d_elevation_view(project: Project, panels: List[Panel], structural_s
         name='天井面（外側）',
         hovertemplate='天井面<br>X: %{x}mm<br>Y: %{y}mm<br>Z: %{z}mm<extra></extra>'
     ))
-    
+
     fig.add_trace(go.Scatter3d(
         x=inner_floor_x, y=inner_floor_y, z=inner_ceiling_z,
         mode='lines',
@@ -526,200 +492,75 @@ def create_3d_elevation_view(project: Project, panels: List[Panel], structural_s
         name='天井面（内側）',
         hovertemplate='天井面（内側）<br>X: %{x}mm<br>Y: %{y}mm<br>Z: %{z}mm<extra></extra>'
     ))
-    
-    # 壁面の3D表示（厚さを持った壁）
+
+    # 壁面の3D表示（厚さを持った壁）：外側面・内側面をそれぞれ1メッシュ、枠線を1トレースにまとめる
     wall_colors = {'W1': 'lightblue', 'W2': 'lightgreen', 'W3': 'lightcoral', 'W4': 'lightyellow'}
-    
+    outer_quads, inner_quads, face_colors = [], [], []
+    wall_z = [0, 0, height, height]
     for wid in ["W1", "W2", "W3", "W4"]:
         wall = wall_info[wid]
-        
-        # 壁の外側面と内側面を定義
-        if wall["direction"] == "horizontal":
-            if wid == "W1":  # 下壁
-                outer_x = [wall["start"][0], wall["end"][0], wall["end"][0], wall["start"][0]]
-                outer_y = [wall["start"][1], wall["end"][1], wall["end"][1], wall["start"][1]]
-                inner_x = [wall["start"][0], wall["end"][0], wall["end"][0], wall["start"][0]]
-                inner_y = [wall["start"][1] + project.room.wall_thickness, 
-                          wall["end"][1] + project.room.wall_thickness,
-                          wall["end"][1] + project.room.wall_thickness, 
-                          wall["start"][1] + project.room.wall_thickness]
-            else:  # W3 上壁
-                outer_x = [wall["start"][0], wall["end"][0], wall["end"][0], wall["start"][0]]
-                outer_y = [wall["start"][1], wall["end"][1], wall["end"][1], wall["start"][1]]
-                inner_x = [wall["start"][0], wall["end"][0], wall["end"][0], wall["start"][0]]
-                inner_y = [wall["start"][1] - project.room.wall_thickness, 
-                          wall["end"][1] - project.room.wall_thickness,
-                          wall["end"][1] - project.room.wall_thickness, 
-                          wall["start"][1] - project.room.wall_thickness]
-        else:  # vertical
-            if wid == "W2":  # 右壁
-                outer_x = [wall["start"][0], wall["end"][0], wall["end"][0], wall["start"][0]]
-                outer_y = [wall["start"][1], wall["end"][1], wall["end"][1], wall["start"][1]]
-                inner_x = [wall["start"][0] - project.room.wall_thickness, 
-                          wall["end"][0] - project.room.wall_thickness,
-                          wall["end"][0] - project.room.wall_thickness, 
-                          wall["start"][0] - project.room.wall_thickness]
-                inner_y = [wall["start"][1], wall["end"][1], wall["end"][1], wall["start"][1]]
-            else:  # W4 左壁
-                outer_x = [wall["start"][0], wall["end"][0], wall["end"][0], wall["start"][0]]
-                outer_y = [wall["start"][1], wall["end"][1], wall["end"][1], wall["start"][1]]
-                inner_x = [wall["start"][0] + project.room.wall_thickness, 
-                          wall["end"][0] + project.room.wall_thickness,
-                          wall["end"][0] + project.room.wall_thickness, 
-                          wall["start"][0] + project.room.wall_thickness]
-                inner_y = [wall["start"][1], wall["end"][1], wall["end"][1], wall["start"][1]]
-        
-        outer_z = [0, 0, height, height]
-        inner_z = [0, 0, height, height]
-        
-        # 外側面のメッシュ
-        fig.add_trace(go.Mesh3d(
-            x=outer_x,
-            y=outer_y,
-            z=outer_z,
-            i=[0, 0],
-            j=[1, 2],
-            k=[2, 3],
-            color=wall_colors.get(wid, 'lightgray'),
-            opacity=0.4,
-            name=f'壁面 {wid} (外側)',
-            showlegend=False
-        ))
-        
-        # 内側面のメッシュ
+        (sx, sy), (ex, ey) = wall["start"], wall["end"]
+        outer_x, outer_y = [sx, ex, ex, sx], [sy, ey, ey, sy]
+        # 内側面は壁厚分だけ室内側へずらす
+        shift = {"W1": (0, wall_thickness), "W2": (-wall_thickness, 0),
+                 "W3": (0, -wall_thickness), "W4": (wall_thickness, 0)}[wid]
+        outer_quads.append((outer_x, outer_y, wall_z))
+        inner_quads.append(([x + shift[0] for x in outer_x], [y + shift[1] for y in outer_y], wall_z))
+        face_colors += [wall_colors.get(wid, 'lightgray')] * 2
+
+    for quads, opacity, side in ((outer_quads, 0.4, "外側"), (inner_quads, 0.2, "内側")):
+        vx, vy, vz, fi, fj, fk = _quad_mesh(quads)
         fig.add_trace(go.Mesh3d(
-            x=inner_x,
-            y=inner_y,
-            z=inner_z,
-            i=[0, 0],
-            j=[1, 2],
-            k=[2, 3],
-            color=wall_colors.get(wid, 'lightgray'),
-            opacity=0.2,
-            name=f'壁面 {wid} (内側)',
+            x=vx, y=vy, z=vz, i=fi, j=fj, k=fk,
+            facecolor=face_colors,
+            opacity=opacity,
+            name=f'壁面 ({side})',
+            hoverinfo='skip',
             showlegend=False
         ))
-        
-        # 壁の枠線
-        fig.add_trace(go.Scatter3d(
-            x=outer_x + [outer_x[0]],
-            y=outer_y + [outer_y[0]],
-            z=outer_z + [outer_z[0]],
-            mode='lines',
-            line=dict(color='black', width=2),
-            name=f'壁面 {wid}',
-            hovertemplate=f'壁面 {wid}<br>長さ: {wall["length"]:.0f}mm<br>厚さ: {project.room.wall_thickness:.0f}mm<extra></extra>'
-        ))
-    
-    # パネルの3D表示（内側面に配置、ボード厚さ考慮）
+
+    # 壁の枠線
+    fig.add_trace(_lines3d_trace(
+        [(qx + [qx[0]], qy + [qy[0]], qz + [qz[0]]) for qx, qy, qz in outer_quads],
+        [(wid, f"{wall_info[wid]['length']:.0f}", f"{wall_thickness:.0f}") for wid in ["W1", "W2", "W3", "W4"]],
+        '壁面 %{customdata[0]}<br>長さ: %{customdata[1]}mm<br>厚さ: %{customdata[2]}mm<extra></extra>',
+        dict(color='black', width=2), '壁面', showlegend=True
+    ))
+
+    # パネルの3D表示（内側面に配置、ボード厚さ考慮）。壁・色ごとに1トレース（寸法・ボード番号は整数の customdata）
     board_thickness = 12.5  # デフォルトボード厚さ
-    
+    panel_groups = {}
     for panel in panels:
-        wall = wall_info[panel.wall_id]
-        
-        # パネルの位置を内側壁面上に計算
-        panel_start_ratio = panel.x0 / wall["length"]
-        panel_end_ratio = (panel.x0 + panel.w) / wall["length"]
-        
-        if wall["direction"] == "horizontal":
-            if panel.wall_id == "W1":  # 下壁 - 内側面（上側）にボードを配置
-                panel_start_x = wall["start"][0] + panel_start_ratio * (wall["end"][0] - wall["start"][0])
-                panel_end_x = wall["start"][0] + panel_end_ratio * (wall["end"][0] - wall["start"][0])
-                panel_y = wall["start"][1] + project.room.wall_thickness - board_thickness
-                panel_x = [panel_start_x, panel_end_x, panel_end_x, panel_start_x, panel_start_x]
-                panel_y_coords = [panel_y, panel_y, panel_y, panel_y, panel_y]
-            else:  # W3 または新規壁（W5以降） - 内側面（下側）にボードを配置
-                panel_start_x = wall["start"][0] + panel_start_ratio * (wall["end"][0] - wall["start"][0])
-                panel_end_x = wall["start"][0] + panel_end_ratio * (wall["end"][0] - wall["start"][0])
-                panel_y = wall["start"][1] - project.room.wall_thickness + board_thickness
-                panel_x = [panel_start_x, panel_end_x, panel_end_x, panel_start_x, panel_start_x]
-                panel_y_coords = [panel_y, panel_y, panel_y, panel_y, panel_y]
-        else:  # vertical
-            if panel.wall_id == "W2":  # 右壁 - 内側面（左側）にボードを配置
-                panel_start_y = wall["start"][1] + panel_start_ratio * (wall["end"][1] - wall["start"][1])
-                panel_end_y = wall["start"][1] + panel_end_ratio * (wall["end"][1] - wall["start"][1])
-                panel_x_coord = wall["start"][0] - project.room.wall_thickness + board_thickness
-                panel_x = [panel_x_coord, panel_x_coord, panel_x_coord, panel_x_coord, panel_x_coord]
-                panel_y_coords = [panel_start_y, panel_end_y, panel_end_y, panel_start_y, panel_start_y]
-            else:  # W4 または新規壁（W5以降） - 内側面（右側）にボードを配置
-                panel_start_y = wall["start"][1] + panel_start_ratio * (wall["end"][1] - wall["start"][1])
-                panel_end_y = wall["start"][1] + panel_end_ratio * (wall["end"][1] - wall["start"][1])
-                panel_x_coord = wall["start"][0] + project.room.wall_thickness - board_thickness
-                panel_x = [panel_x_coord, panel_x_coord, panel_x_coord, panel_x_coord, panel_x_coord]
-                panel_y_coords = [panel_start_y, panel_end_y, panel_end_y, panel_start_y, panel_start_y]
-        
-        panel_z = [panel.y0, panel.y0, panel.y0 + panel.h, panel.y0 + panel.h, panel.y0]
-        
-        color = get_panel_color(panel)
-        
-        fig.add_trace(go.Scatter3d(
-            x=panel_x, y=panel_y_coords, z=panel_z,
-            mode='lines',
-            line=dict(color=color, width=4),
-            name=f'パネル {panel.wall_id}',
-            hovertemplate=f'パネル {panel.wall_id}<br>幅: {panel.w:.0f}mm<br>高さ: {panel.h:.0f}mm<br>厚さ: {board_thickness:.1f}mm<br>ボード: B{panel.board_number}-P{panel.part_number}<br>端材: {"Yes" if panel.is_cut_piece else "No"}<br>備考: {panel.note}<extra></extra>',
-            showlegend=False
+        panel_groups.setdefault((panel.wall_id, get_panel_color(panel), panel.is_cut_piece), []).append(panel)
+    for (wid, color, is_cut), group in panel_groups.items():
+        notes = [p.note or "" for p in group]
+        fig.add_trace(_lines3d_trace(
+            [_inner_face_rect(wid, wall_info[wid], p.x0, p.x0 + p.w, p.y0, p.y0 + p.h,
+                              wall_thickness, board_thickness) for p in group],
+            [(int(p.w), int(p.h), int(p.board_number), int(p.part_number)) for p in group],
+            f'パネル {wid}<br>幅: %{{customdata[0]}}mm<br>高さ: %{{customdata[1]}}mm<br>厚さ: {board_thickness:.1f}mm'
+            f'<br>ボード: B%{{customdata[2]}}-P%{{customdata[3]}}<br>端材: {"Yes" if is_cut else "No"}'
+            f'<br>備考: {"%{text}" if any(notes) else ""}<extra></extra>',
+            dict(color=color, width=4), f'パネル {wid}',
+            text=notes if any(notes) else None
         ))
-    
+
     # 開口の3D表示（W1～W4 のみ。新規壁は開口なし）
-    for op in project.openings:
-        if op.wall not in wall_info:
-            continue
-        wall = wall_info[op.wall]
-        L = wall["length"]
-        off = place_opening_position(L, op)
-        
-        # 開口の位置計算
-        opening_start_ratio = off / L
-        opening_end_ratio = (off + op.width) / L
-        
-        if wall["direction"] == "horizontal":
-            if op.wall == "W1":  # 下壁 - 内側面に配置
-                op_start_x = wall["start"][0] + opening_start_ratio * (wall["end"][0] - wall["start"][0])
-                op_end_x = wall["start"][0] + opening_end_ratio * (wall["end"][0] - wall["start"][0])
-                # 内側面に配置
-                op_y = wall["start"][1] + project.room.wall_thickness - board_thickness
-                opening_x = [op_start_x, op_end_x, op_end_x, op_start_x, op_start_x]
-                opening_y = [op_y, op_y, op_y, op_y, op_y]
-            else:  # W3 上壁 - 内側面に配置
-                op_start_x = wall["start"][0] + opening_start_ratio * (wall["end"][0] - wall["start"][0])
-                op_end_x = wall["start"][0] + opening_end_ratio * (wall["end"][0] - wall["start"][0])
-                # 内側面に配置
-                op_y = wall["start"][1] - project.room.wall_thickness + board_thickness
-                opening_x = [op_start_x, op_end_x, op_end_x, op_start_x, op_start_x]
-                opening_y = [op_y, op_y, op_y, op_y, op_y]
-        else:  # vertical
-            if op.wall == "W2":  # 右壁 - 内側面に配置
-                op_start_y = wall["start"][1] + opening_start_ratio * (wall["end"][1] - wall["start"][1])
-                op_end_y = wall["start"][1] + opening_end_ratio * (wall["end"][1] - wall["start"][1])
-                # 内側面に配置
-                op_x = wall["start"][0] - project.room.wall_thickness + board_thickness
-                opening_x = [op_x, op_x, op_x, op_x, op_x]
-                opening_y = [op_start_y, op_end_y, op_end_y, op_start_y, op_start_y]
-            else:  # W4 左壁 - 内側面に配置
-                op_start_y = wall["start"][1] + opening_start_ratio * (wall["end"][1] - wall["start"][1])
-                op_end_y = wall["start"][1] + opening_end_ratio * (wall["end"][1] - wall["start"][1])
-                # 内側面に配置
-                op_x = wall["start"][0] + project.room.wall_thickness - board_thickness
-                opening_x = [op_x, op_x, op_x, op_x, op_x]
-                opening_y = [op_start_y, op_end_y, op_end_y, op_start_y, op_start_y]
-        
-        # 開口の高さ
-        if op.type == "door":
-            op_z_start, op_z_end = 0, op.height
-        else:
-            op_z_start, op_z_end = op.sill_height, op.sill_height + op.height
-        
-        opening_z = [op_z_start, op_z_start, op_z_end, op_z_end, op_z_start]
-        
-        fig.add_trace(go.Scatter3d(
-            x=opening_x, y=opening_y, z=opening_z,
-            mode='lines',
-            line=dict(color=PANEL_COLORS["opening"], width=6),
-            name=f'開口部: {op.opening_id}',
-            hovertemplate=f'開口部: {op.opening_id}<br>種類: {op.type}<br>幅: {op.width}mm<br>高さ: {op.height}mm<extra></extra>'
+    openings = [op for op in project.openings if op.wall in wall_info]
+    if openings:
+        rects = []
+        for op in openings:
+            wall = wall_info[op.wall]
+            off = place_opening_position(wall["length"], op)
+            z0, z1 = (0, op.height) if op.type == "door" else (op.sill_height, op.sill_height + op.height)
+            rects.append(_inner_face_rect(op.wall, wall, off, off + op.width, z0, z1, wall_thickness, board_thickness))
+        fig.add_trace(_lines3d_trace(
+            rects,
+            [(op.opening_id, op.type, op.width, op.height) for op in openings],
+            '開口部: %{customdata[0]}<br>種類: %{customdata[1]}<br>幅: %{customdata[2]}mm<br>高さ: %{customdata[3]}mm<extra></extra>',
+            dict(color=PANEL_COLORS["opening"], width=6), '開口部', showlegend=True
         ))
-    
+
     fig.update_layout(
         title="3D表示見付図（建築的制約対応）",
         scene=dict(
@@ -738,7 +579,7 @@ def create_3d_elevation_view(project: Project, panels: List[Panel], structural_s
         height=800,
         showlegend=True
     )
-    
+
     return fig
 
 def create_wall_elevation_plotly(wall_id: str, wall_len: int, H: int, panels: List[Panel], openings: List[Opening], structural_system=None):
@@ -859,50 +700,42 @@ def create_wall_elevation_plotly(wall_id: str, wall_len: int, H: int, panels: Li
     
     # 間柱の表示（最後に描画して最前面に）
     if structural_system:
-        wall_studs = [s for s in structural_system.studs if s.wall_id == wall_id]
+        regular_positions = structural_system.studs_for(wall_id, "regular").wall_position
+        king_positions = structural_system.studs_for(wall_id, "king").wall_position
         
         # デバッグ: 間柱の数を確認
-        print(f"DEBUG: {wall_id} - 間柱数={len(wall_studs)}")
+        print(f"DEBUG: {wall_id} - 間柱数={len(regular_positions) + len(king_positions)}")
         
         # 通常の間柱を描画
         regular_count = 0
-        for stud in wall_studs:
-            if stud.stud_type == "regular":
-                stud_x = stud.wall_position
-                print(f"DEBUG: 通常間柱 {stud.id} at x={stud_x}, wall_len={wall_len}")
-                if 0 <= stud_x <= wall_len:
-                    regular_count += 1
-                    # 薄い縦線で表示
-                    fig.add_shape(
-                        type="line",
-                        x0=stud_x, y0=0,
-                        x1=stud_x, y1=H,
-                        line=dict(color="rgba(150, 150, 150, 0.6)", width=2, dash="dash"),
-                        layer="below"
-                    )
+        for stud_x in regular_positions[(regular_positions >= 0) & (regular_positions <= wall_len)].tolist():
+            regular_count += 1
+            # 薄い縦線で表示
+            fig.add_shape(
+                type="line",
+                x0=stud_x, y0=0,
+                x1=stud_x, y1=H,
+                line=dict(color="rgba(150, 150, 150, 0.6)", width=2, dash="dash"),
+                layer="below"
+            )
         print(f"DEBUG: {wall_id} - 表示された通常間柱={regular_count}本")
         
         # キングスタッドを描画（目立つように、最前面に）
         king_count = 0
-        for stud in wall_studs:
-            if stud.stud_type == "king":
-                stud_x = stud.wall_position
-                print(f"DEBUG: キングスタッド {stud.id} at x={stud_x}")
-                
-                if 0 <= stud_x <= wall_len:
-                    king_count += 1
-                    color = "rgba(255, 100, 0, 0.8)"  # 濃いオレンジ
-                    stud_width = 50  # mm
-                    
-                    # 矩形で表示（最前面）
-                    fig.add_shape(
-                        type="rect",
-                        x0=stud_x - stud_width/2, y0=0,
-                        x1=stud_x + stud_width/2, y1=H,
-                        fillcolor=color,
-                        line=dict(color="black", width=2),
-                        layer="above"
-                    )
+        for stud_x in king_positions[(king_positions >= 0) & (king_positions <= wall_len)].tolist():
+            king_count += 1
+            color = "rgba(255, 100, 0, 0.8)"  # 濃いオレンジ
+            stud_width = 50  # mm
+            
+            # 矩形で表示（最前面）
+            fig.add_shape(
+                type="rect",
+                x0=stud_x - stud_width/2, y0=0,
+                x1=stud_x + stud_width/2, y1=H,
+                fillcolor=color,
+                line=dict(color="black", width=2),
+                layer="above"
+            )
         print(f"DEBUG: {wall_id} - 表示されたキングスタッド={king_count}本")
     else:
         print(f"DEBUG: {wall_id} - 構造システムがNone")
@@ -970,61 +803,147 @@ def create_wall_elevation_plotly(wall_id: str, wall_len: int, H: int, panels: Li
     
     return fig
 
-def create_nesting_plotly(placements: List[NestPlacement], board: BoardMaster):
-    """Plotlyを使用した板取図"""
+NESTING_SHEETS_PER_PAGE = 6  # 板取ビューの1ページあたりのボード数
+
+def group_placements_by_sheet(placements: List[NestPlacement]) -> Dict[int, List[NestPlacement]]:
+    """ボード番号ごとの配置（配置順を保持）"""
+    sheets: Dict[int, List[NestPlacement]] = {}
+    for pl in placements:
+        sheets.setdefault(pl.sheet_id, []).append(pl)
+    return dict(sorted(sheets.items()))
+
+def _sheet_rects(sheet_placements: List[NestPlacement], dx: float = 0, dy: float = 0):
+    """ボード上のパネル矩形を None 区切りの閉じた折れ線（fill='toself' 用）にまとめる"""
+    xs, ys = [], []
+    for pl in sheet_placements:
+        x0, y0, x1, y1 = pl.x + dx, pl.y + dy, pl.x + pl.w + dx, pl.y + pl.h + dy
+        xs += [x0, x1, x1, x0, x0, None]
+        ys += [y0, y0, y1, y1, y0, None]
+    return xs, ys
+
+def _add_sheet_traces(fig, sid: int, sheet_placements: List[NestPlacement], board: BoardMaster, row=None, col=None):
+    """1枚分の板取図をトレースで追加（板外形1・パネル矩形1・ラベル1）"""
+    rc = dict(row=row, col=col) if row is not None else {}
+    fig.add_trace(go.Scatter(
+        x=[0, board.raw_width, board.raw_width, 0, 0], y=[0, 0, board.raw_height, board.raw_height, 0],
+        mode='lines', line=dict(color="black", width=2), fill='toself', fillcolor="rgba(240,240,240,0.2)",
+        hoverinfo='skip', showlegend=False
+    ), **rc)
+    xs, ys = _sheet_rects(sheet_placements)
+    fig.add_trace(go.Scatter(
+        x=xs, y=ys, mode='lines', line=dict(color="black", width=1), fill='toself',
+        fillcolor=PANEL_COLORS["good"], opacity=0.7, hoverinfo='skip', showlegend=False
+    ), **rc)
+    # ボード番号とパーツ番号の表示
+    fig.add_trace(go.Scatter(
+        x=[pl.x + pl.w / 2 for pl in sheet_placements],
+        y=[pl.y + pl.h / 2 for pl in sheet_placements],
+        mode='text',
+        text=[f"B{sid}-P{i + 1}<br>{pl.w:.0f}×{pl.h:.0f}" for i, pl in enumerate(sheet_placements)],
+        textfont=dict(size=8),
+        hovertemplate='%{text}<extra></extra>',
+        showlegend=False
+    ), **rc)
+
+def create_nesting_sheet_plotly(sid: int, sheet_placements: List[NestPlacement], board: BoardMaster, height: int = 480):
+    """ボード1枚分の板取図（ページ表示で必要な分だけ作る）"""
+    fig = go.Figure()
+    _add_sheet_traces(fig, sid, sheet_placements, board)
+    fig.update_layout(
+        title=f"ボード #{sid}",
+        height=height,
+        margin=dict(l=40, r=10, t=40, b=30),
+        showlegend=False,
+        dragmode='pan'
+    )
+    fig.update_xaxes(range=[0, board.raw_width * 1.1], dtick=910, fixedrange=False)
+    fig.update_yaxes(range=[0, board.raw_height * 1.1], dtick=1000, scaleanchor="x", scaleratio=1, fixedrange=False)
+    return fig
+
+def create_nesting_thumbnails_plotly(placements: List[NestPlacement], board: BoardMaster, per_row: int = 20):
+    """
+    全ボードの縮小一覧。全パネルを1トレース（ボード外形を1トレース）で描く。
+    線だけのトレースはクリックで選択できないので、ボード中心に選択用のマーカー（customdata がボード番号）を置く。
+    """
+    sheets = group_placements_by_sheet(placements)
+    if not sheets:
+        return None
+    gap_x, gap_y = board.raw_width * 0.2, board.raw_height * 0.2
+    pitch_x, pitch_y = board.raw_width + gap_x, board.raw_height + gap_y
+    panel_x, panel_y, panel_sheet = [], [], []
+    outline_x, outline_y, outline_sheet = [], [], []
+    center_x, center_y = [], []
+    for n, (sid, sheet_placements) in enumerate(sheets.items()):
+        dx, dy = (n % per_row) * pitch_x, -(n // per_row) * pitch_y
+        xs, ys = _sheet_rects(sheet_placements, dx, dy)
+        panel_x += xs
+        panel_y += ys
+        panel_sheet += [sid] * len(xs)
+        outline_x += [dx, dx + board.raw_width, dx + board.raw_width, dx, dx, None]
+        outline_y += [dy, dy, dy + board.raw_height, dy + board.raw_height, dy, None]
+        outline_sheet += [sid] * 6
+        center_x.append(dx + board.raw_width / 2)
+        center_y.append(dy + board.raw_height / 2)
+    # 座標・ボード番号は数値配列（None は NaN）にしてバイナリで送る
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=np.array(outline_x, dtype=np.float32), y=np.array(outline_y, dtype=np.float32),
+        mode='lines', line=dict(color="black", width=1),
+        customdata=np.array(outline_sheet, dtype=np.int16), hovertemplate='ボード #%{customdata}<extra></extra>', showlegend=False
+    ))
+    fig.add_trace(go.Scatter(
+        x=np.array(panel_x, dtype=np.float32), y=np.array(panel_y, dtype=np.float32),
+        mode='lines', line=dict(color="gray", width=0.5), fill='toself',
+        fillcolor=PANEL_COLORS["good"], customdata=np.array(panel_sheet, dtype=np.int16),
+        hovertemplate='ボード #%{customdata}<extra></extra>', showlegend=False
+    ))
+    fig.add_trace(go.Scatter(
+        x=np.array(center_x, dtype=np.float32), y=np.array(center_y, dtype=np.float32),
+        mode='markers+text', marker=dict(size=18, symbol='square', color="rgba(0, 0, 0, 0.08)"),
+        text=[f"#{sid}" for sid in sheets], textfont=dict(size=9),
+        customdata=np.array(list(sheets), dtype=np.int16), hovertemplate='ボード #%{customdata}<extra></extra>', showlegend=False
+    ))
+    rows = math.ceil(len(sheets) / per_row)
+    fig.update_layout(
+        height=min(80 + 110 * rows, 600),
+        margin=dict(l=10, r=10, t=10, b=10),
+        showlegend=False,
+        dragmode='pan'
+    )
+    fig.update_xaxes(visible=False)
+    fig.update_yaxes(visible=False, scaleanchor="x", scaleratio=1)
+    return fig
+
+def create_nesting_plotly(placements: List[NestPlacement], board: BoardMaster, sheet_ids: Optional[List[int]] = None):
+    """Plotlyを使用した板取図（sheet_ids を渡すとそのボードだけを描く：ページ表示用）"""
     if not placements:
         return None
     
-    num_sheets = max(pl.sheet_id for pl in placements)
+    sheets = group_placements_by_sheet(placements)
+    if sheet_ids is None:
+        sheet_ids = list(sheets)
+    sheet_ids = [sid for sid in sheet_ids if sid in sheets]
+    if not sheet_ids:
+        return None
     
     # サブプロットの作成
-    cols = min(3, num_sheets)
-    rows = math.ceil(num_sheets / cols)
+    cols = min(3, len(sheet_ids))
+    rows = math.ceil(len(sheet_ids) / cols)
     
     fig = make_subplots(
         rows=rows, cols=cols,
-        subplot_titles=[f"ボード #{i+1}" for i in range(num_sheets)],
+        subplot_titles=[f"ボード #{sid}" for sid in sheet_ids],
         specs=[[{"type": "xy"}] * cols for _ in range(rows)]
     )
     
-    for sid in range(1, num_sheets + 1):
-        row = ((sid - 1) // cols) + 1
-        col = ((sid - 1) % cols) + 1
-        
-        # 板の外形
-        fig.add_shape(
-            type="rect",
-            x0=0, y0=0, x1=board.raw_width, y1=board.raw_height,
-            line=dict(color="black", width=2),
-            fillcolor="rgba(240,240,240,0.2)",
-            row=row, col=col
-        )
-        
-        # 配置されたパネル
-        sheet_placements = [p for p in placements if p.sheet_id == sid]
-        for i, pl in enumerate(sheet_placements):
-            # 板取図では真物として薄緑を使用
-            fig.add_shape(
-                type="rect",
-                x0=pl.x, y0=pl.y, x1=pl.x + pl.w, y1=pl.y + pl.h,
-                fillcolor=PANEL_COLORS["good"],
-                opacity=0.7,
-                line=dict(color="black", width=1),
-                row=row, col=col
-            )
-            
-            # ボード番号とパーツ番号の表示
-            fig.add_annotation(
-                x=pl.x + pl.w/2,
-                y=pl.y + pl.h/2,
-                text=f"B{sid}-P{i+1}<br>{pl.w:.0f}×{pl.h:.0f}",
-                showarrow=False,
-                font=dict(size=8),
-                bgcolor='white',
-                bordercolor='black',
-                borderwidth=1,
-                row=row, col=col
-            )
+    for n, sid in enumerate(sheet_ids):
+        row, col = n // cols + 1, n % cols + 1
+        _add_sheet_traces(fig, sid, sheets[sid], board, row=row, col=col)
+        # 各サブプロットの軸設定（マウスホイールでの拡大縮小を有効化）
+        fig.update_xaxes(title_text="X (mm)", range=[0, board.raw_width * 1.1], dtick=910,
+                         fixedrange=False, row=row, col=col)
+        fig.update_yaxes(title_text="Y (mm)", range=[0, board.raw_height * 1.1], dtick=1000,
+                         scaleanchor=f"x{n + 1}" if n else "x", scaleratio=1, fixedrange=False, row=row, col=col)
     
     fig.update_layout(
         title="板取結果",
@@ -1034,30 +953,4 @@ def create_nesting_plotly(placements: List[NestPlacement], board: BoardMaster):
         dragmode='pan'  # デフォルトでパンモードに設定
     )
     
-    # 各サブプロットでマウスホイールでの拡大縮小を有効化
-    for i in range(1, num_sheets + 1):
-        row = (i - 1) // 2 + 1
-        col = (i - 1) % 2 + 1
-        fig.update_xaxes(fixedrange=False, row=row, col=col)
-        fig.update_yaxes(fixedrange=False, row=row, col=col)
-    
-    # 各サブプロットの軸設定
-    for i in range(1, num_sheets + 1):
-        fig.update_xaxes(
-            title_text="X (mm)",
-            range=[0, board.raw_width * 1.1],
-            dtick=910,
-            row=((i-1) // cols) + 1,
-            col=((i-1) % cols) + 1
-        )
-        fig.update_yaxes(
-            title_text="Y (mm)",
-            range=[0, board.raw_height * 1.1],
-            dtick=1000,
-            scaleanchor=f"x{i}",
-            scaleratio=1,
-            row=((i-1) // cols) + 1,
-            col=((i-1) % cols) + 1
-        )
-    
-    return fig
\ No newline at end of file
+    return fig
@@ -0,0 +1,125 @@
+"""
+壁の重なり・交差チェック（スイープライン）
+水平壁・垂直壁に特化したスイープで、同一線上の重なり（E-WALL-OVERLAP）と
+壁の中間同士の交差（E-WALL-CROSS）を O(n log n + k) で検出する。
+端部が他の壁に取り付く T 字・L 字は正常な接合として扱う。
+"""
+import heapq
+from bisect import bisect_left, bisect_right, insort
+from typing import List, Dict, Tuple, Any
+from src.wall_editor import WallSegment
+
+
+def outline_walls(project) -> List[WallSegment]:
+    """部屋外形の各辺を既存壁（W1～）として返す"""
+    polygon = list(project.room.polygon)
+    return [
+        WallSegment(
+            id=f"W{i + 1}", start=tuple(polygon[i]), end=tuple(polygon[(i + 1) % len(polygon)]),
+            thickness=project.room.wall_thickness, height=project.room.height, is_new=False
+        )
+        for i in range(len(polygon))
+    ]
+
+
+def _classify(walls: List[WallSegment]):
+    """水平壁 (y, x0, x1, i)・垂直壁 (x, y0, y1, i)・斜め壁に分類"""
+    horizontal, vertical, diagonal = [], [], []
+    for i, w in enumerate(walls):
+        (x0, y0), (x1, y1) = w.start, w.end
+        if y0 == y1 and x0 != x1:
+            horizontal.append((y0, min(x0, x1), max(x0, x1), i))
+        elif x0 == x1 and y0 != y1:
+            vertical.append((x0, min(y0, y1), max(y0, y1), i))
+        elif (x0, y0) != (x1, y1):
+            diagonal.append(i)
+    return horizontal, vertical, diagonal
+
+
+def _collinear_overlaps(segments: List[Tuple[int, int, int, int]], tol: int) -> List[Tuple[int, int, int, int]]:
+    """同一線上の区間の重なり (i, j, 重なり開始, 重なり終了)。線ごとに始点順にスイープ"""
+    result = []
+    active: List[Tuple[int, int]] = []  # (終点, 壁) のヒープ
+    line = None
+    for coord, lo, hi, i in sorted(segments):
+        if coord != line:
+            line, active = coord, []
+        while active and active[0][0] <= lo + tol:
+            heapq.heappop(active)
+        for end, j in active:
+            result.append((j, i, lo, min(end, hi)))
+        heapq.heappush(active, (hi, i))
+    return result
+
+
+def _crossings(horizontal, vertical, tol: int) -> List[Tuple[int, int, Tuple[int, int]]]:
+    """水平壁と垂直壁の中間同士の交差 (水平壁, 垂直壁, 交点)。x 方向にスイープし、有効な水平壁を y 順に保持"""
+    events = []
+    for y, x0, x1, i in horizontal:
+        if x1 - x0 > 2 * tol:
+            events.append((x0 + tol, 2, y, i))   # 挿入（同じ x の問い合わせより後）
+            events.append((x1 - tol, 0, y, i))   # 削除（同じ x の問い合わせより前）
+    for x, y0, y1, j in vertical:
+        events.append((x, 1, (y0, y1), j))
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    active: List[Tuple[int, int]] = []
+    result = []
+    for x, kind, payload, idx in events:
+        if kind == 2:
+            insort(active, (payload, idx))
+        elif kind == 0:
+            del active[bisect_left(active, (payload, idx))]
+        else:
+            y0, y1 = payload
+            lo = bisect_right(active, (y0 + tol, float("inf")))
+            hi = bisect_left(active, (y1 - tol, -1))
+            for y, i in active[lo:hi]:
+                result.append((i, idx, (x, y)))
+    return result
+
+
+def find_wall_conflicts(walls: List[WallSegment], tol: int = 0) -> List[Dict[str, Any]]:
+    """
+    壁の重なり・交差を検出し、割付のエラーと同じ形式（code / wall / msg）のリストで返す。
+    既存壁（is_new=False）同士の組み合わせは報告しない。斜め壁は総当たりで判定する。
+    """
+    horizontal, vertical, diagonal = _classify(walls)
+    conflicts = []
+
+    def report(code: str, i: int, j: int, detail: str, **extra) -> None:
+        # 新規壁を wall、相手（既存壁があればそちら）を other にする
+        if not walls[i].is_new and not walls[j].is_new:
+            return
+        if walls[i].is_new and not walls[j].is_new:
+            i, j = j, i
+        verb = "重なっています" if code == "E-WALL-OVERLAP" else "交差しています"
+        conflicts.append({
+            "code": code, "wall": walls[j].id, "other": walls[i].id,
+            "msg": f"壁 {walls[j].id} が {walls[i].id} と{verb}（{detail}）", **extra
+        })
+
+    for segments, axis in ((horizontal, "y"), (vertical, "x")):
+        for i, j, lo, hi in _collinear_overlaps(segments, tol):
+            report("E-WALL-OVERLAP", i, j, f"{hi - lo}mm", range=(lo, hi), axis=axis)
+
+    for i, j, point in _crossings(horizontal, vertical, tol):
+        report("E-WALL-CROSS", i, j, f"{point[0]}, {point[1]}", point=point)
+
+    if diagonal:
+        from src.wall_graph import _intersection
+        diagonal_set = set(diagonal)
+        for i in diagonal:
+            for j in range(len(walls)):
+                if j == i or (j in diagonal_set and j < i):
+                    continue
+                hit = _intersection(walls[i].start, walls[i].end, walls[j].start, walls[j].end)
+                if hit and 0.0 < hit[0] < 1.0 and 0.0 < hit[1] < 1.0:
+                    point = (int(round(hit[2][0])), int(round(hit[2][1])))
+                    report("E-WALL-CROSS", j, i, f"{point[0]}, {point[1]}", point=point)
+    return conflicts
+
+
+def check_new_walls(project, new_walls: List[WallSegment], tol: int = 0) -> List[Dict[str, Any]]:
+    """部屋外形＋新規壁の重なり・交差（割付・板取の前に実行する）"""
+    return find_wall_conflicts(outline_walls(project) + list(new_walls), tol)
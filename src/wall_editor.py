@@ -2,7 +2,7 @@
 壁編集機能：マウス操作で壁を作成・編集
 """
 from dataclasses import dataclass, replace
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Dict
 import math
 
 @dataclass
@@ -33,12 +33,86 @@ def snap_to_horizontal_or_vertical(start: Tuple[int, int], end: Tuple[int, int])
         # 垂直線にスナップ
         return (start[0], end[1])
 
-def find_nearest_wall_point(point: Tuple[int, int], existing_walls: List[WallSegment], threshold: int = 100) -> Optional[Tuple[int, int]]:
-    """既存の壁の端点または線上の最も近い点を見つける"""
+class WallSpatialIndex:
+    """
+    壁セグメントの一様グリッド空間インデックス
+    各壁を外接矩形が重なるセルに登録し、スナップ判定は点の周囲 radius 内のセルの壁だけを候補にする。
+    壁の追加・削除（元に戻す）はその壁のセルだけを更新する。
+    """
+
+    def __init__(self, cell_size: int = 1000):
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], Dict[int, WallSegment]] = {}
+        self._order: Dict[int, int] = {}  # id(wall) -> sync に渡した壁リストでの位置（候補の走査順を全件走査と揃える）
+        self._walls: Dict[int, WallSegment] = {}
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._walls)
+
+    def _cell_range(self, x0: float, y0: float, x1: float, y1: float):
+        c = self.cell_size
+        for cx in range(math.floor(min(x0, x1) / c), math.floor(max(x0, x1) / c) + 1):
+            for cy in range(math.floor(min(y0, y1) / c), math.floor(max(y0, y1) / c) + 1):
+                yield (cx, cy)
+
+    def add(self, wall: WallSegment) -> None:
+        key = id(wall)
+        if key in self._walls:
+            return
+        self._walls[key] = wall
+        self._order[key] = self._seq
+        self._seq += 1
+        for cell in self._cell_range(wall.start[0], wall.start[1], wall.end[0], wall.end[1]):
+            self._cells.setdefault(cell, {})[key] = wall
+
+    def remove(self, wall: WallSegment) -> None:
+        key = id(wall)
+        if key not in self._walls:
+            return
+        del self._walls[key]
+        del self._order[key]
+        for cell in self._cell_range(wall.start[0], wall.start[1], wall.end[0], wall.end[1]):
+            bucket = self._cells.get(cell)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._cells[cell]
+
+    def sync(self, walls: List[WallSegment]) -> None:
+        """現在の壁リストに合わせて差分だけ追加・削除し、走査順を壁リストの並びに合わせる"""
+        current = {id(w): w for w in walls}
+        for key in [k for k in self._walls if k not in current]:
+            self.remove(self._walls[key])
+        for w in walls:
+            if id(w) not in self._walls:
+                self.add(w)
+        # 追加順ではなくリスト上の位置で並べる（同じ距離の候補は全件走査と同じく先の壁が勝つ）
+        self._order = {id(w): i for i, w in enumerate(walls)}
+        self._seq = len(walls)
+
+    def query_box(self, x0: float, y0: float, x1: float, y1: float) -> List[WallSegment]:
+        """矩形にかかるセルの壁（壁リスト順）"""
+        found: Dict[int, WallSegment] = {}
+        for cell in self._cell_range(x0, y0, x1, y1):
+            bucket = self._cells.get(cell)
+            if bucket:
+                found.update(bucket)
+        return [found[k] for k in sorted(found, key=self._order.__getitem__)]
+
+    def query(self, point: Tuple[float, float], radius: float) -> List[WallSegment]:
+        """点から radius 以内に外接矩形がかかるセルの壁（壁リスト順）"""
+        return self.query_box(point[0] - radius, point[1] - radius, point[0] + radius, point[1] + radius)
+
+
+def find_nearest_wall_point(point: Tuple[int, int], existing_walls: List[WallSegment], threshold: int = 100,
+                            index: Optional[WallSpatialIndex] = None) -> Optional[Tuple[int, int]]:
+    """既存の壁の端点または線上の最も近い点を見つける（index があれば近傍セルの壁だけを調べる）"""
     min_dist = float('inf')
     nearest_point = None
+    candidates = index.query(point, threshold) if index is not None else existing_walls
     
-    for wall in existing_walls:
+    for wall in candidates:
         # 始点との距離
         dist_start = math.sqrt((point[0] - wall.start[0])**2 + (point[1] - wall.start[1])**2)
         if dist_start < min_dist and dist_start < threshold:
@@ -72,14 +146,15 @@ def find_nearest_wall_point(point: Tuple[int, int], existing_walls: List[WallSeg
 
 def create_wall_from_line(start: Tuple[int, int], end: Tuple[int, int], 
                           wall_thickness: int, wall_height: int, 
-                          existing_walls: List[WallSegment]) -> Optional[WallSegment]:
+                          existing_walls: List[WallSegment],
+                          index: Optional[WallSpatialIndex] = None) -> Optional[WallSegment]:
     """線から壁を作成（水平・垂直のみ）"""
     # 水平または垂直にスナップ
     snapped_end = snap_to_horizontal_or_vertical(start, end)
     
     # 既存の壁に接続
-    snapped_start = find_nearest_wall_point(start, existing_walls) or start
-    snapped_end = find_nearest_wall_point(snapped_end, existing_walls) or snapped_end
+    snapped_start = find_nearest_wall_point(start, existing_walls, index=index) or start
+    snapped_end = find_nearest_wall_point(snapped_end, existing_walls, index=index) or snapped_end
     
     # 最小長さチェック
     length = math.sqrt((snapped_end[0] - snapped_start[0])**2 + 
@@ -101,7 +176,8 @@ def create_wall_from_line(start: Tuple[int, int], end: Tuple[int, int],
 
 def create_walls_from_area(points: List[Tuple[int, int]], 
                            wall_thickness: int, wall_height: int,
-                           existing_walls: List[WallSegment]) -> List[WallSegment]:
+                           existing_walls: List[WallSegment],
+                           index: Optional[WallSpatialIndex] = None) -> List[WallSegment]:
     """エリアから矩形の壁を作成"""
     if len(points) < 2:
         return []
@@ -136,8 +212,8 @@ def create_walls_from_area(points: List[Tuple[int, int]],
         end = corners[(i + 1) % 4]
         
         # 既存の壁に接続
-        snapped_start = find_nearest_wall_point(start, existing_walls) or start
-        snapped_end = find_nearest_wall_point(end, existing_walls) or end
+        snapped_start = find_nearest_wall_point(start, existing_walls, index=index) or start
+        snapped_end = find_nearest_wall_point(end, existing_walls, index=index) or end
         
         wall_id = f"W_NEW_{base_id + i}"
         walls.append(WallSegment(
@@ -151,12 +227,13 @@ def create_walls_from_area(points: List[Tuple[int, int]],
     
     return walls
 
-def convert_walls_to_project_format(walls: List[WallSegment], project) -> List[Tuple[int, int]]:
-    """壁セグメントをプロジェクトの多角形形式に変換"""
-    # 既存の多角形を取得
+def convert_walls_to_project_format(walls: List[WallSegment], project) -> List[List[Tuple[int, int]]]:
+    """
+    壁セグメントをプロジェクトの多角形形式に変換
+    既存の部屋外形の辺と新規壁から壁グラフを作り、閉じた部屋ごとのポリゴン（反時計回り）を返す。
+    """
+    from src.wall_graph import extract_room_polygons
     polygon = list(project.room.polygon)
-    
-    # 新しい壁を追加（簡略化：矩形のみサポート）
-    # 実際の実装では、壁セグメントから閉じた多角形を構築する必要がある
-    
-    return polygon
+    outline = [{"start": polygon[i], "end": polygon[(i + 1) % len(polygon)]} for i in range(len(polygon))]
+    new_walls = [w for w in walls if getattr(w, "is_new", True)]
+    return extract_room_polygons(outline + new_walls)
@@ -0,0 +1,288 @@
+"""
+壁グラフ（トポロジー）と部屋ポリゴンの抽出
+壁セグメントの端点をスナップしてノードにまとめ、T字・十字の交点で壁を分割した平面グラフを作る。
+連結成分は Union-Find、閉じた部屋は半辺（ハーフエッジ）を角度順に辿る面抽出（O(n log n)）で求める。
+"""
+import math
+from typing import List, Tuple, Dict, Optional, Any
+from src.wall_editor import WallSegment, WallSpatialIndex
+
+
+def _endpoints(wall: Any) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """WallSegment・辞書どちらの壁からも始点・終点を取り出す"""
+    if isinstance(wall, dict):
+        return tuple(wall.get("start", (0, 0))), tuple(wall.get("end", (0, 0)))
+    return tuple(wall.start), tuple(wall.end)
+
+
+class UnionFind:
+    """経路圧縮・ランク付き Union-Find"""
+
+    def __init__(self, n: int = 0):
+        self.parent = list(range(n))
+        self.rank = [0] * n
+
+    def add(self) -> int:
+        self.parent.append(len(self.parent))
+        self.rank.append(0)
+        return len(self.parent) - 1
+
+    def find(self, a: int) -> int:
+        root = a
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[a] != root:
+            self.parent[a], a = root, self.parent[a]
+        return root
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.rank[ra] < self.rank[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        if self.rank[ra] == self.rank[rb]:
+            self.rank[ra] += 1
+
+
+class WallGraph:
+    """
+    壁の平面グラフ
+    nodes: ノード座標（tol 以内の端点は1つにまとめる）
+    edges: (u, v)（u < v）→ その辺を構成する元の壁のインデックス
+    """
+
+    def __init__(self, walls: List[Any], tol: int = 50):
+        self.tol = tol
+        self.walls = list(walls)
+        self.nodes: List[Tuple[int, int]] = []
+        self._node_cells: Dict[Tuple[int, int], List[int]] = {}
+        self.edges: Dict[Tuple[int, int], List[int]] = {}
+        self.uf = UnionFind()
+        self._build()
+
+    # ---- ノード ----
+
+    def _cell(self, p: Tuple[float, float]) -> Tuple[int, int]:
+        return (math.floor(p[0] / self.tol), math.floor(p[1] / self.tol)) if self.tol > 0 else (int(p[0]), int(p[1]))
+
+    def find_node(self, p: Tuple[float, float]) -> Optional[int]:
+        """tol 以内の既存ノード（なければ None）"""
+        cx, cy = self._cell(p)
+        best, best_d = None, float("inf")
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for n in self._node_cells.get((cx + dx, cy + dy), ()):
+                    d = math.hypot(self.nodes[n][0] - p[0], self.nodes[n][1] - p[1])
+                    if d <= self.tol and d < best_d:
+                        best, best_d = n, d
+        return best
+
+    def _node(self, p: Tuple[float, float]) -> int:
+        n = self.find_node(p)
+        if n is None:
+            n = len(self.nodes)
+            self.nodes.append((int(round(p[0])), int(round(p[1]))))
+            self._node_cells.setdefault(self._cell(self.nodes[n]), []).append(n)
+            self.uf.add()
+        return n
+
+    # ---- 構築 ----
+
+    def _build(self) -> None:
+        # 1. 端点をスナップしてノード化
+        segments = []
+        for i, w in enumerate(self.walls):
+            a, b = _endpoints(w)
+            na, nb = self._node(a), self._node(b)
+            if na != nb:
+                segments.append((i, na, nb))
+
+        # 2. 分割点の収集（他ノードが線上にある T 字、線分同士の交差）
+        index = WallSpatialIndex(cell_size=max(self.tol * 20, 500))
+        seg_objs = []
+        for i, na, nb in segments:
+            seg = WallSegment(id=str(i), start=self.nodes[na], end=self.nodes[nb], thickness=0, height=0)
+            seg_objs.append(seg)
+            index.add(seg)
+        splits: List[List[Tuple[float, int]]] = [[(0.0, na), (1.0, nb)] for _, na, nb in segments]
+        seg_no = {id(seg): k for k, seg in enumerate(seg_objs)}
+
+        for n, p in enumerate(list(self.nodes)):
+            for seg in index.query(p, self.tol):
+                k = seg_no[id(seg)]
+                _, na, nb = segments[k]
+                if n in (na, nb):
+                    continue
+                t, d = _project(p, seg.start, seg.end)
+                if 0.0 < t < 1.0 and d <= self.tol:
+                    splits[k].append((t, n))
+
+        for k, seg in enumerate(seg_objs):
+            x0, x1 = sorted((seg.start[0], seg.end[0]))
+            y0, y1 = sorted((seg.start[1], seg.end[1]))
+            for other in index.query_box(x0, y0, x1, y1):
+                j = seg_no[id(other)]
+                if j <= k:
+                    continue
+                hit = _intersection(seg.start, seg.end, other.start, other.end)
+                if hit is None:
+                    continue
+                t, u, p = hit
+                n = self._node(p)
+                if 0.0 < t < 1.0 and n not in (segments[k][1], segments[k][2]):
+                    splits[k].append((t, n))
+                if 0.0 < u < 1.0 and n not in (segments[j][1], segments[j][2]):
+                    splits[j].append((u, n))
+
+        # 3. 分割点の間を辺にする（重なる壁は同じ辺にまとまる）
+        for k, (wall_idx, _, _) in enumerate(segments):
+            pts = sorted(splits[k])
+            for (_, a), (_, b) in zip(pts, pts[1:]):
+                if a == b:
+                    continue
+                key = (a, b) if a < b else (b, a)
+                self.edges.setdefault(key, []).append(wall_idx)
+                self.uf.union(a, b)
+
+    # ---- 位相 ----
+
+    def components(self) -> List[List[int]]:
+        """連結成分ごとのノード"""
+        groups: Dict[int, List[int]] = {}
+        for n in range(len(self.nodes)):
+            groups.setdefault(self.uf.find(n), []).append(n)
+        return list(groups.values())
+
+    def _pruned_adjacency(self) -> Dict[int, List[int]]:
+        """行き止まりの壁（次数1）を取り除いた隣接リスト"""
+        adj: Dict[int, set] = {}
+        for a, b in self.edges:
+            adj.setdefault(a, set()).add(b)
+            adj.setdefault(b, set()).add(a)
+        stack = [n for n, nb in adj.items() if len(nb) <= 1]
+        while stack:
+            n = stack.pop()
+            for m in adj.pop(n, ()):
+                if m in adj:
+                    adj[m].discard(n)
+                    if len(adj[m]) <= 1:
+                        stack.append(m)
+        return {n: list(nb) for n, nb in adj.items() if nb}
+
+    def faces(self) -> List[List[int]]:
+        """閉じた面（反時計回り、面積正）のノード列"""
+        adj = self._pruned_adjacency()
+        order: Dict[int, List[int]] = {}
+        position: Dict[Tuple[int, int], int] = {}
+        for n, nbs in adj.items():
+            x, y = self.nodes[n]
+            nbs.sort(key=lambda m: math.atan2(self.nodes[m][1] - y, self.nodes[m][0] - x))
+            order[n] = nbs
+            for i, m in enumerate(nbs):
+                position[(n, m)] = i
+
+        visited = set()
+        result = []
+        for u in order:
+            for v in order[u]:
+                if (u, v) in visited:
+                    continue
+                face = []
+                a, b = u, v
+                while (a, b) not in visited:
+                    visited.add((a, b))
+                    face.append(a)
+                    nbs = order[b]
+                    a, b = b, nbs[(position[(b, a)] - 1) % len(nbs)]
+                if _signed_area([self.nodes[n] for n in face]) > 0:
+                    result.append(face)
+        return result
+
+    def room_polygons(self) -> List[List[Tuple[int, int]]]:
+        """閉じた部屋のポリゴン（反時計回り、最下点・最左点から開始、一直線上の頂点は除去）"""
+        polygons = []
+        for face in self.faces():
+            poly = _simplify([self.nodes[n] for n in face])
+            if len(poly) >= 3:
+                start = min(range(len(poly)), key=lambda i: (poly[i][1], poly[i][0]))
+                polygons.append(poly[start:] + poly[:start])
+        return polygons
+
+    def walls_on_edge(self, a: Tuple[int, int], b: Tuple[int, int]) -> List[int]:
+        """2点間の辺を構成する元の壁のインデックス"""
+        na, nb = self.find_node(a), self.find_node(b)
+        if na is None or nb is None:
+            return []
+        return self.edges.get((min(na, nb), max(na, nb)), [])
+
+
+def _project(p, a, b) -> Tuple[float, float]:
+    """点 p の線分 ab 上の位置 t と距離"""
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return 0.0, math.hypot(p[0] - a[0], p[1] - a[1])
+    t = ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length_sq
+    return t, math.hypot(p[0] - (a[0] + t * dx), p[1] - (a[1] + t * dy))
+
+
+def _intersection(p, p2, q, q2):
+    """2線分の交点 (t, u, 点)。平行・非交差は None"""
+    r = (p2[0] - p[0], p2[1] - p[1])
+    s = (q2[0] - q[0], q2[1] - q[1])
+    denom = r[0] * s[1] - r[1] * s[0]
+    if denom == 0:
+        return None
+    qp = (q[0] - p[0], q[1] - p[1])
+    t = (qp[0] * s[1] - qp[1] * s[0]) / denom
+    u = (qp[0] * r[1] - qp[1] * r[0]) / denom
+    if not (0.0 <= t <= 1.0 and 0.0 <= u <= 1.0):
+        return None
+    return t, u, (p[0] + t * r[0], p[1] + t * r[1])
+
+
+def _signed_area(poly: List[Tuple[int, int]]) -> float:
+    return sum(poly[i][0] * poly[(i + 1) % len(poly)][1] - poly[(i + 1) % len(poly)][0] * poly[i][1]
+               for i in range(len(poly))) / 2.0
+
+
+def _simplify(poly: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """一直線上の中間頂点を除去"""
+    result = []
+    n = len(poly)
+    for i in range(n):
+        prev, cur, nxt = poly[i - 1], poly[i], poly[(i + 1) % n]
+        cross = (cur[0] - prev[0]) * (nxt[1] - cur[1]) - (cur[1] - prev[1]) * (nxt[0] - cur[0])
+        if cross != 0:
+            result.append(cur)
+    return result
+
+
+def extract_room_polygons(walls: List[Any], tol: int = 50) -> List[List[Tuple[int, int]]]:
+    """壁セグメントから閉じた部屋のポリゴンを抽出"""
+    return WallGraph(walls, tol).room_polygons()
+
+
+def closed_rectangular_rooms(walls: List[Any], tol: int = 50) -> List[Tuple[List[Tuple[int, int]], List[int]]]:
+    """
+    4本の壁でちょうど閉じた矩形の部屋を抽出する。
+    戻り値: [(ポリゴン, ポリゴンの各辺に対応する壁のインデックス), ...]（辺の順は W1～W4 と同じ）
+    """
+    graph = WallGraph(walls, tol)
+    rooms = []
+    for poly in graph.room_polygons():
+        if len(poly) != 4:
+            continue
+        if not all(poly[i][0] == poly[(i + 1) % 4][0] or poly[i][1] == poly[(i + 1) % 4][1] for i in range(4)):
+            continue
+        wall_indices = []
+        for i in range(4):
+            on_edge = graph.walls_on_edge(poly[i], poly[(i + 1) % 4])
+            if len(on_edge) != 1:
+                break
+            wall_indices.append(on_edge[0])
+        if len(wall_indices) == 4 and len(set(wall_indices)) == 4:
+            rooms.append((poly, wall_indices))
+    return rooms
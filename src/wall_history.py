@@ -0,0 +1,104 @@
+"""
+平面図エディタの操作履歴（元に戻す・やり直し）
+新規壁の集合を永続（不変）スナップショットの連結で表し、操作ごとに差分だけを持つ新しいスナップショットを作る。
+前の状態はそのまま共有されるため、元に戻す・やり直しはスナップショットの付け替えだけ（O(1)）で済む。
+スナップショットの version は状態ごとに一意で、元に戻して同じ状態に戻れば同じ version になる（下流のキャッシュキーに使う）。
+"""
+from dataclasses import dataclass, field
+from functools import cached_property
+from itertools import count
+from typing import List, Optional, Tuple
+from src.wall_editor import WallSegment
+
+_versions = count(1)
+
+
+@dataclass(frozen=True, eq=False)
+class WallSnapshot:
+    """新規壁集合の不変スナップショット（親スナップショット＋追加分）"""
+    parent: Optional["WallSnapshot"] = None
+    added: Tuple[WallSegment, ...] = ()
+    version: int = field(default_factory=lambda: next(_versions))
+    size: int = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "size", (self.parent.size if self.parent is not None else 0) + len(self.added))
+
+    @cached_property
+    def walls(self) -> Tuple[WallSegment, ...]:
+        """壁の並び（初回参照時に親から組み立ててキャッシュ）"""
+        chain = []
+        node = self
+        while node is not None and "walls" not in node.__dict__:
+            chain.append(node.added)
+            node = node.parent
+        walls = list(node.walls) if node is not None else []
+        for added in reversed(chain):
+            walls.extend(added)
+        return tuple(walls)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def extend(self, walls: List[WallSegment]) -> "WallSnapshot":
+        return WallSnapshot(parent=self, added=tuple(walls))
+
+
+EMPTY = WallSnapshot(version=0)
+
+
+@dataclass(frozen=True)
+class WallCommand:
+    """操作ログの1項目（操作名と操作前後のスナップショット）"""
+    label: str
+    before: WallSnapshot
+    after: WallSnapshot
+
+
+class WallHistory:
+    """操作ログ（元に戻す・やり直しスタック）"""
+
+    def __init__(self, snapshot: WallSnapshot = EMPTY):
+        self.current = snapshot
+        self.undo_stack: List[WallCommand] = []
+        self.redo_stack: List[WallCommand] = []
+
+    @property
+    def walls(self) -> List[WallSegment]:
+        return list(self.current.walls)
+
+    @property
+    def version(self) -> int:
+        return self.current.version
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self.undo_stack)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self.redo_stack)
+
+    def add_walls(self, walls: List[WallSegment], label: str = "壁を追加") -> WallCommand:
+        """壁を追加する操作を記録（やり直しスタックは破棄）"""
+        command = WallCommand(label, self.current, self.current.extend(walls))
+        self.current = command.after
+        self.undo_stack.append(command)
+        self.redo_stack.clear()
+        return command
+
+    def undo(self) -> Optional[WallCommand]:
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        self.redo_stack.append(command)
+        self.current = command.before
+        return command
+
+    def redo(self) -> Optional[WallCommand]:
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        self.undo_stack.append(command)
+        self.current = command.after
+        return command
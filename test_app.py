@@ -49,6 +49,544 @@ def test_wall_editor_functions():
         print(f"✗ Function test error: {e}")
         return False
 
+def test_structural_studs():
+    """間柱生成（開口区間スイープ）の動作確認"""
+    from src.structural import generate_studs_for_wall, StudTable
+    from src.masterdata import Opening
+
+    wall_info = {"W1": {"start": (0, 0), "end": (3640, 0), "length": 3640, "direction": "horizontal"}}
+    openings = [Opening("O1", "W1", "door", 800, 2000, 0, "1000")]
+    studs = generate_studs_for_wall("W1", wall_info, openings, 2400, 455)
+    regular = [s.wall_position for s in studs if s.stud_type == "regular"]
+    king = [s.wall_position for s in studs if s.stud_type == "king"]
+    assert regular == [0, 455, 910, 1820, 2275, 2730, 3185, 3640], f"unexpected regular studs: {regular}"
+    assert king == [1000, 1800], f"unexpected king studs: {king}"
+    print("✓ generate_studs_for_wall skips studs inside openings")
+
+    table = generate_studs_for_wall("W1", wall_info, openings, 2400, 455, as_array=True)
+    assert isinstance(table, StudTable) and len(table) == len(studs)
+    assert [s.id for s in table] == [s.id for s in studs]
+    print("✓ generate_studs_for_wall array output matches")
+
+    # 前回の構造を渡しても、間柱表を参照するまでは壁キーも間柱も作らない。作った間柱表は新規生成と同じ
+    from dataclasses import replace
+    from src.input import load_demo_project
+    from src.structural import generate_structural_system
+    project = load_demo_project()
+    previous = generate_structural_system(project, "S", 455)
+    previous.stud_table
+    changed = replace(project, openings=list(project.openings)[1:])
+    system = generate_structural_system(changed, "S", 455, previous=previous)
+    assert "wall_keys" not in system.__dict__ and "stud_table" not in system.__dict__
+    fresh = generate_structural_system(changed, "S", 455).stud_table
+    assert [s.id for s in system.stud_table] == [s.id for s in fresh] and system._previous_studs is None
+    print("✓ Incremental stud table is built lazily and matches a fresh build")
+    return True
+
+def test_rule_checks():
+    """ルールごとに1件だけ違反する部材で違反表の内容を、違反のない構造で空の表（同じ列）を確認"""
+    import numpy as np
+    from dataclasses import replace
+    from src.input import load_demo_project
+    from src.masterdata import Opening
+    from src.structural import Beam, BeamTable, generate_studs_for_wall, generate_structural_system
+    from src.rule_check import (
+        VIOLATION_COLUMNS, check_beam_spans, check_lintel_clearance, check_stud_spacing, run_rule_checks
+    )
+
+    def rows(violations):
+        assert list(violations.columns) == VIOLATION_COLUMNS
+        return [(r.code, r.severity, r.member_id, r.value) for r in violations.itertuples(index=False)]
+
+    # RC の最大スパンは 8000mm（まぐさは対象外）
+    beams = BeamTable.from_beams([
+        Beam("B1", (0, 0, 0), (9000, 0, 0), 300, 600, "RC"),
+        Beam("B2", (0, 0, 0), (0, 8000, 0), 300, 600, "RC"),
+        Beam("L1", (0, 0, 0), (9000, 0, 0), 200, 300, "RC", is_lintel=True),
+    ])
+    assert rows(check_beam_spans(beams, "RC")) == [("E-SPAN", "error", "B1", 9000.0)]
+
+    # 階高 5000・まぐさ成 300 → ドア上 2700mm は可、窓上 5000-2700-300=2000mm < 2100mm は不足
+    openings = [Opening("D1", "W1", "door", 800, 2000, 0, "center"), Opening("WN1", "W2", "window", 1200, 1800, 900, "center")]
+    clearance = check_lintel_clearance(openings, 5000, "RC")
+    assert rows(clearance) == [("W-CLEARANCE", "warning", "WN1", 2000.0)] and clearance["wall"].tolist() == ["W2"]
+
+    # 4本目を抜くと間隔 910mm > 455mm、最後の間柱を 20mm に寄せると近接
+    wall_info = {"W1": {"start": (0, 0), "end": (3640, 0), "length": 3640, "direction": "horizontal"}}
+    studs = generate_studs_for_wall("W1", wall_info, [], 2400, 455, as_array=True)
+    studs = studs.take(np.array([i for i in range(len(studs)) if i != 3]))
+    position = studs.wall_position.copy()
+    position[-1] = position[-2] + 20
+    assert rows(check_stud_spacing(replace(studs, wall_position=position))) == [
+        ("E-STUD-SPACING", "error", "ST_W1_003-ST_W1_005", 910.0),
+        ("W-STUD-CLOSE", "warning", "ST_W1_008-ST_W1_009", 20.0),
+    ]
+
+    # 開口のない外周壁だけの構造は違反なし
+    compliant = run_rule_checks(generate_structural_system(replace(load_demo_project(), openings=[]), "RC", 455))
+    assert compliant.empty and list(compliant.columns) == VIOLATION_COLUMNS
+    print("✓ Rule checks report one row per broken rule and none for a compliant system")
+    return True
+
+def test_wall_spatial_index():
+    """スナップ用空間インデックスが全件走査と同じ結果を返すか確認"""
+    from dataclasses import replace
+    from src.wall_editor import WallSegment, WallSpatialIndex, find_nearest_wall_point
+
+    walls = [
+        WallSegment("W1", (0, 0), (7200, 0), 100, 2400, is_new=False),
+        WallSegment("W2", (7200, 0), (7200, 5400), 100, 2400, is_new=False),
+        WallSegment("W_NEW_5", (3000, 0), (3000, 5400), 100, 2400),
+    ]
+    index = WallSpatialIndex(cell_size=1000)
+    index.sync(walls)
+    for pt in [(3040, 2500), (7150, 30), (5000, 2700), (-50, 20)]:
+        expected = find_nearest_wall_point(pt, walls)
+        assert find_nearest_wall_point(pt, walls, index=index) == expected, f"mismatch at {pt}"
+    index.sync(walls[:2])
+    assert len(index) == 2 and find_nearest_wall_point((3040, 2500), walls[:2], index=index) is None
+
+    # 外周の壁を作り直して再同期しても、同じ距離の候補は全件走査と同じく壁リストの先の壁が勝つ
+    added = WallSegment("W_NEW_3", (3000, 100), (3000, 5400), 100, 2400)
+    index.sync(walls[:2] + [added])
+    rebuilt = [replace(w) for w in walls[:2]] + [added]
+    index.sync(rebuilt)
+    assert len(index) == 3
+    assert find_nearest_wall_point((3000, 50), rebuilt, index=index) == find_nearest_wall_point((3000, 50), rebuilt) == (3000, 0)
+    print("✓ WallSpatialIndex matches brute-force snapping")
+    return True
+
+def test_wall_history():
+    """元に戻す・やり直しで壁リストが往復し、version が状態ごとに一意で、スナップショットが壁を共有するか確認"""
+    from src.wall_editor import WallSegment
+    from src.wall_history import WallHistory, EMPTY
+
+    a, b, c = (WallSegment(f"W_NEW_{n}", (0, n * 1000), (3000, n * 1000), 100, 2400) for n in (1, 2, 3))
+    history = WallHistory()
+    assert history.version == EMPTY.version and not history.can_undo and not history.can_redo
+    history.add_walls([a])
+    first = history.current
+    history.add_walls([b, c], "部屋を作成")
+    second = history.current
+    assert history.walls == [a, b, c] and first.version != second.version != EMPTY.version
+
+    assert history.undo().label == "部屋を作成" and history.walls == [a] and history.version == first.version
+    assert history.redo() is not None and history.walls == [a, b, c] and history.version == second.version
+    assert history.redo() is None  # やり直す操作はもうない
+
+    # 元に戻した後の新しい操作で、やり直しの枝は破棄される
+    history.undo()
+    history.add_walls([c])
+    assert history.walls == [a, c] and not history.can_redo and history.version not in (first.version, second.version)
+    history.undo()
+    history.undo()
+    assert history.walls == [] and history.version == EMPTY.version and not history.can_undo
+
+    # 後のスナップショットは変更のない壁（同じオブジェクト）と親を共有する
+    assert second.parent is first and second.added == (b, c)
+    assert all(x is y for x, y in zip(first.walls, second.walls)) and len(second) == 3
+    print("✓ WallHistory undo/redo round-trips wall lists")
+    return True
+
+def test_wall_graph():
+    """壁グラフから閉じた部屋が抽出されるか確認（間仕切りで2室、行き止まりの壁は無視）"""
+    from src.wall_graph import extract_room_polygons
+
+    outline = [((0, 0), (7200, 0)), ((7200, 0), (7200, 5400)), ((7200, 5400), (0, 5400)), ((0, 5400), (0, 0))]
+    walls = [{"start": a, "end": b} for a, b in outline]
+    walls.append({"start": (3000, 0), "end": (3000, 5400)})
+    walls.append({"start": (5000, 0), "end": (5000, 2000)})
+    rooms = extract_room_polygons(walls)
+    assert rooms == [[(0, 0), (3000, 0), (3000, 5400), (0, 5400)],
+                     [(3000, 0), (7200, 0), (7200, 5400), (3000, 5400)]], rooms
+    print("✓ WallGraph extracts closed rooms")
+    return True
+
+def test_wall_conflicts():
+    """壁の重なり・交差（スイープ）の検出と、T 字・端部の接合・既存壁同士を報告しないことを確認"""
+    from src.wall_editor import WallSegment
+    from src.wall_conflicts import find_wall_conflicts
+
+    def wall(wid, start, end, is_new=True):
+        return WallSegment(wid, start, end, 100, 2400, is_new=is_new)
+
+    outline = [wall("W1", (0, 0), (7200, 0), False), wall("W2", (7200, 0), (7200, 5400), False),
+               wall("W3", (7200, 5400), (0, 5400), False), wall("W4", (0, 5400), (0, 0), False)]
+
+    def conflicts(*walls, tol=0):
+        return [(c["code"], c["wall"], c["other"], c.get("range") or c.get("point"))
+                for c in find_wall_conflicts(outline + list(walls), tol)]
+
+    # 同一線上の重なり
+    assert conflicts(wall("N1", (6000, 0), (7200, 0))) == [("E-WALL-OVERLAP", "N1", "W1", (6000, 7200))]
+    # 中間同士の交差（既存壁・新規壁どうし）
+    assert conflicts(wall("N1", (3000, -500), (3000, 2000))) == [("E-WALL-CROSS", "N1", "W1", (3000, 0))]
+    assert conflicts(wall("N1", (3000, 1000), (3000, 3000)), wall("N2", (2000, 2000), (4000, 2000))) == \
+        [("E-WALL-CROSS", "N1", "N2", (3000, 2000))]
+    # T 字・端部どうしの接合は正常
+    assert conflicts(wall("N1", (3000, 0), (3000, 2000)), wall("N2", (3000, 2000), (5000, 2000))) == []
+    assert conflicts(wall("N1", (7200, 0), (8000, 0))) == []
+    # 斜め壁の交差（斜め同士・既存壁と）
+    assert conflicts(wall("N1", (1000, 1000), (3000, 3000)), wall("N2", (1000, 3000), (3000, 1000))) == \
+        [("E-WALL-CROSS", "N1", "N2", (2000, 2000))]
+    assert conflicts(wall("N1", (1000, -1000), (3000, 1000))) == [("E-WALL-CROSS", "N1", "W1", (2000, 0))]
+    # tol 以内のはみ出し・重なりは報告しない（tol を超えたら報告する）
+    assert conflicts(wall("N1", (3000, -50), (3000, 2000)), tol=50) == []
+    assert conflicts(wall("N1", (3000, -51), (3000, 2000)), tol=50) == [("E-WALL-CROSS", "N1", "W1", (3000, 0))]
+    assert conflicts(wall("N1", (7150, 0), (8000, 0)), tol=50) == []
+    assert conflicts(wall("N1", (7149, 0), (8000, 0)), tol=50) == [("E-WALL-OVERLAP", "N1", "W1", (7149, 7200))]
+    # 既存壁どうしは報告しない
+    assert conflicts(wall("W5", (3000, -500), (3000, 6000), False), wall("W6", (0, 0), (1000, 0), False)) == []
+    print("✓ Wall conflict sweep reports overlaps and crossings only")
+    return True
+
+def test_arrow_export():
+    """Arrow IPC / Parquet 出力が固定スキーマ（辞書エンコードの壁ID）で往復できるか確認"""
+    import io
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from src.input import load_demo_project
+    from src.masterdata import default_master
+    from src.allocating import allocate_walls_with_architectural_constraints
+    from src.nesting import simple_nesting
+    from src.arrow_export import (
+        panels_table, placements_table, PANELS_SCHEMA, PLACEMENTS_SCHEMA, to_arrow_ipc_bytes, to_parquet_bytes
+    )
+
+    board, rules, mode = default_master()
+    panels, _ = allocate_walls_with_architectural_constraints(load_demo_project(), board, rules, mode)
+    placements, _, _ = simple_nesting(panels, board, rules, True)
+    for table, schema in ((panels_table(panels), PANELS_SCHEMA), (placements_table(placements, board), PLACEMENTS_SCHEMA)):
+        assert table.schema.equals(schema, check_metadata=True)
+        assert pa.ipc.open_file(pa.py_buffer(to_arrow_ipc_bytes(table))).read_all().equals(table)
+        assert pq.read_table(io.BytesIO(to_parquet_bytes(table))).column("wall").type == schema.field("wall").type
+    assert sorted(placements_table(placements, board).column("part_number").to_pylist())[0] >= 1
+    print("✓ Arrow IPC / Parquet export round-trips with a fixed schema")
+    return True
+
+def _dxf_entities(text):
+    """DXF のセクション名の並びと、ENTITIES の (図形, レイヤ) の並び"""
+    codes = text.split("\n")
+    pairs = list(zip(codes[0::2], codes[1::2]))
+    sections = [pairs[k + 1][1] for k, (code, value) in enumerate(pairs) if code == "0" and value == "SECTION"]
+    entities = [(value, pairs[k + 1][1]) for k, (code, value) in enumerate(pairs)
+                if code == "0" and value in ("POLYLINE", "LINE", "TEXT") and pairs[k + 1][0] == "8"]
+    return sections, entities
+
+def test_dxf_export():
+    """板取図・壁立面図の DXF の構造（SECTION/ENDSEC/EOF）と図形の数を確認"""
+    import io
+    from collections import Counter
+    from src.input import load_demo_project
+    from src.masterdata import default_master
+    from src.allocating import allocate_walls_with_architectural_constraints, calculate_corner_winning_rules
+    from src.nesting import simple_nesting
+    from src.structural import generate_structural_system
+    from src.dxf_export import write_nesting_dxf, write_elevations_dxf
+
+    project = load_demo_project()
+    board, rules, mode = default_master()
+    panels, _ = allocate_walls_with_architectural_constraints(project, board, rules, mode)
+    placements, _, num_sheets = simple_nesting(panels, board, rules, False)
+
+    buf = io.StringIO()
+    assert write_nesting_dxf(buf, placements, board) == num_sheets
+    text = buf.getvalue()
+    sections, entities = _dxf_entities(text)
+    assert sections == ["HEADER", "TABLES", "ENTITIES"] and text.count("0\nENDSEC\n") == 3 and text.endswith("0\nEOF\n")
+    rects = Counter(layer for kind, layer in entities if kind == "POLYLINE")
+    cut = sum(1 for pl in placements if (pl.panel_ref or {}).get("is_cut_piece"))
+    assert rects == Counter({"SHEET": num_sheets, "PART": len(placements) - cut, "CUT_PIECE": cut}), rects
+    assert sum(1 for kind, _ in entities if kind == "TEXT") == num_sheets + len(placements)
+
+    walls = [(wid, wall["length"], project.room.height)
+             for wid, wall in calculate_corner_winning_rules(project.room.polygon, project.room.wall_thickness).items()]
+    system = generate_structural_system(project, "S", 455)
+    buf = io.StringIO()
+    assert write_elevations_dxf(buf, walls, panels, project.openings, system) == len(walls)
+    text = buf.getvalue()
+    sections, entities = _dxf_entities(text)
+    assert sections == ["HEADER", "TABLES", "ENTITIES"] and text.endswith("0\nENDSEC\n0\nEOF\n")
+    rects = Counter(layer for kind, layer in entities if kind == "POLYLINE")
+    cut = sum(1 for p in panels if p.is_cut_piece)
+    assert rects == Counter({"WALL": len(walls), "OPENING": len(project.openings), "PANEL": len(panels) - cut, "CUT_PIECE": cut}), rects
+    assert sum(1 for kind, _ in entities if kind == "LINE") == sum(len(system.studs_for(wid)) for wid, _, _ in walls)
+    print("✓ DXF export writes one SHEET per board and one entity per part")
+    return True
+
+def test_pdf_export():
+    """図面セット PDF（同じプロセスで描画）のヘッダ・ページ数・xref・ページごとの描画時間を確認"""
+    import io
+    import re
+    from src.input import load_demo_project
+    from src.masterdata import default_master
+    from src.allocating import allocate_walls_with_architectural_constraints
+    from src.nesting import simple_nesting
+    from src.pdf_export import drawing_set_pages, export_drawing_set
+
+    project = load_demo_project()
+    board, rules, mode = default_master()
+    panels, _ = allocate_walls_with_architectural_constraints(project, board, rules, mode)
+    placements, _, num_sheets = simple_nesting(panels, board, rules, False)
+    pages = drawing_set_pages(project, panels, placements, board)
+    assert len(pages) == 1 + 4 + num_sheets  # 平面図・外周4壁の立面図・ボードごとの板取図
+
+    buf = io.BytesIO()
+    timings = export_drawing_set(buf, pages, workers=1, dpi=20)
+    pdf = buf.getvalue()
+    assert pdf.startswith(b"%PDF-") and pdf.endswith(b"%%EOF\n")
+    assert re.search(rb"/Type /Pages /Kids \[[^\]]*\] /Count (\d+)", pdf).group(1) == str(len(pages)).encode()
+    xref = int(re.search(rb"startxref\n(\d+)\n", pdf).group(1))
+    header, *entries = pdf[xref:].split(b"trailer")[0].decode().splitlines()[1:]
+    first, size = map(int, header.split())
+    assert first == 0 and len(entries) == size and size == 3 + 3 * len(pages)
+    for num, entry in enumerate(entries[1:], start=1):
+        offset = int(entry.split()[0])
+        assert pdf.startswith(f"{num} 0 obj".encode(), offset), num
+    assert [t["page"] for t in timings] == list(range(1, len(pages) + 1))
+    assert [t["title"] for t in timings] == [page["title"] for page in pages]
+    print("✓ PDF drawing set has one page, xref entry and timing per page spec")
+    return True
+
+def test_background_pipeline():
+    """割付・板取・構造生成をバックグラウンドで実行し、進捗・結果・キャンセルを確認"""
+    import threading
+    import time
+    from src.input import load_demo_project
+    from src.masterdata import default_master
+    from src.jobs import JobRunner, run_pipeline, submit_pipeline
+    from src.pipeline import default_pipeline, pipeline_inputs
+
+    board, rules, mode = default_master()
+    job = submit_pipeline(default_pipeline(), load_demo_project(), board, rules, mode)
+    deadline = time.time() + 60
+    while job.running and time.time() < deadline:
+        time.sleep(0.05)
+    assert job.status == "done", (job.status, job.error)
+    assert job.progress == 1.0 and set(job.stage_times) == {"allocation", "nesting", "structural", "tables"}
+    assert job.result.outputs["nesting"]["panels"] and len(job.result.outputs["structural"].stud_table) > 0
+
+    # 段階の切れ目でキャンセルされる
+    gate = threading.Event()
+    def blocked(job):
+        job.begin_stage("allocation")
+        gate.wait(5)
+        job.begin_stage("nesting")
+        return "unreachable"
+    runner = JobRunner(max_workers=1)
+    job = runner.submit(blocked)
+    queued = runner.submit(run_pipeline, default_pipeline(), pipeline_inputs(load_demo_project(), board, rules, mode))
+    runner.cancel(queued.job_id)
+    runner.cancel(job.job_id)
+    gate.set()
+    while job.running and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.status == "cancelled" and job.result is None and queued.status == "cancelled"
+    print("✓ Background pipeline reports progress, returns results and can be cancelled")
+    return True
+
+def test_pipeline_memo():
+    """パイプラインが変更の下流の段階だけを再計算するか確認"""
+    from dataclasses import replace
+    from src.input import load_demo_project
+    from src.masterdata import default_master
+    from src.pipeline import Pipeline, STAGES, pipeline_inputs
+
+    board, rules, mode = default_master()
+    project = load_demo_project()
+    pipeline = Pipeline(STAGES)
+    first = pipeline.run(pipeline_inputs(project, board, rules, mode))
+    assert all(first.recomputed.values())
+
+    # 刃厚だけ変える → 板取・帳票のみ再計算（割付のパネルは書き換えない）
+    run = pipeline.run(pipeline_inputs(project, board, replace(rules, kerf=rules.kerf + 3), mode))
+    assert run.recomputed == {"allocation": False, "nesting": True, "structural": False, "tables": True}, run.recomputed
+    assert run.outputs["allocation"] is first.outputs["allocation"]
+    assert all(p.board_number == 0 for p in first.outputs["allocation"][0])
+
+    # 間柱ピッチを変える → 板取の入力が同じでも上流が変わるので全段階
+    run = pipeline.run(pipeline_inputs(project, board, rules, mode, stud_pitch=303))
+    assert all(run.recomputed.values())
+
+    # 元の条件に戻す → すべてメモから
+    run = pipeline.run(pipeline_inputs(project, board, rules, mode))
+    assert not any(run.recomputed.values()) and run.outputs["nesting"] is first.outputs["nesting"]
+    print("✓ Pipeline recomputes only the stages downstream of a change")
+    return True
+
+def test_shared_cache():
+    """プロセス共有キャッシュ: 別セッションのパイプラインが計算せずに複製を受け取り、上限で古いものを捨てるか確認"""
+    from src.input import load_demo_project
+    from src.masterdata import default_master
+    from src.pipeline import Pipeline, STAGES, pipeline_inputs
+    from src.shared_cache import SharedCache
+
+    board, rules, mode = default_master()
+    cache = SharedCache()
+    first = Pipeline(STAGES, shared=cache).run(pipeline_inputs(load_demo_project(), board, rules, mode))
+    other = Pipeline(STAGES, shared=cache).run(pipeline_inputs(load_demo_project(), board, rules, mode))
+    assert all(first.recomputed.values()) and all(other.shared.values()) and not any(other.recomputed.values())
+    assert other.keys == first.keys and other.outputs["nesting"] is not first.outputs["nesting"]
+    assert other.outputs["tables"]["df_boards"].equals(first.outputs["tables"]["df_boards"])
+    assert len(other.outputs["structural"].stud_table) == len(first.outputs["structural"].stud_table)
+
+    small = SharedCache(max_bytes=300)
+    small.put("a", b"x" * 100)
+    small.put("b", b"y" * 100)
+    small.get("a")
+    small.put("c", b"z" * 100)
+    assert "a" in small and "b" not in small and small.nbytes <= 300 and not small.put("d", b"w" * 1000)
+    print("✓ Shared cache serves other sessions and evicts least recently used entries")
+    return True
+
+def test_service():
+    """HTTP サービス（ASGI）をプロセス内クライアントで呼び、結果・入力エラー・待ち行列の上限を確認"""
+    import asyncio
+    import threading
+    from src.service import create_app, local_request, _local_request, _handle_connection
+
+    app = create_app()
+    with open("sample1.cedxm", "rb") as f:
+        cedxm = f.read()
+    status, headers, data = local_request(app, "POST", "/allocate", cedxm, "stud_pitch=455")
+    assert status == 200 and headers["content-type"].startswith("application/json"), (status, data)
+    assert data["panels"] and len(data["placements"]) == len(data["panels"]) and data["num_sheets"] > 0
+    assert local_request(app, "POST", "/allocate", cedxm, "kerf=5")[2]["stages"] == {"allocation": "cached", "nesting": "computed"}
+    assert local_request(app, "POST", "/allocate", b"<CEDXM>")[0] == 400
+    assert local_request(app, "POST", "/allocate", cedxm, "stud_pitch=abc")[0] == 400
+    assert local_request(app, "POST", "/allocate", cedxm, "kerf=-500")[0] == 400
+    assert local_request(app, "POST", "/allocate", cedxm, "min_piece=-1")[0] == 400
+    assert local_request(app, "POST", "/allocate", cedxm, "output_mode=bad")[0] == 400
+    assert local_request(app, "POST", "/allocate", cedxm, "output_mode=Full")[0] == 200
+    assert local_request(app, "GET", "/allocate")[0] == 405
+
+    # 不正な Content-Length はソケットを閉じずに 400 を返す
+    async def bad_length():
+        server = await asyncio.start_server(lambda r, w: _handle_connection(app, r, w), "127.0.0.1", 0)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(b"POST /allocate HTTP/1.1\r\nContent-Length: abc\r\n\r\n")
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+    assert asyncio.run(bad_length()).startswith(b"HTTP/1.1 400")
+
+    # 実行1件・待ち1件が上限 → 3件目は 503
+    gate = threading.Event()
+    busy = create_app(max_workers=1, max_queue=1, compute=lambda content, params: gate.wait(5) and {"ok": True})
+    async def burst():
+        tasks = [asyncio.create_task(_local_request(busy, "POST", "/allocate", b"x")) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        gate.set()
+        return [status for status, _, _ in await asyncio.gather(*tasks)]
+    assert sorted(asyncio.run(burst())) == [200, 200, 503]
+    print("✓ HTTP service returns allocation JSON and bounds its queue")
+    return True
+
+def test_service_timeout_keeps_slot():
+    """504 で打ち切った計算が終わるまで枠を返さず、上限を超えて受け付けないか確認"""
+    import time
+    from src.service import create_app, local_request
+
+    slow = create_app(max_workers=1, max_queue=0, compute=lambda content, params: time.sleep(1) or {"ok": True}, timeout=0.2)
+    statuses = [local_request(slow, "POST", "/allocate", b"x")[0] for _ in range(5)]
+    assert statuses == [504, 503, 503, 503, 503], statuses
+    assert slow.pool._executor._work_queue.qsize() == 0
+    assert local_request(slow, "GET", "/health")[2]["running"] == 1
+    time.sleep(1.2)  # 打ち切った計算が終われば枠が戻る
+    assert local_request(slow, "GET", "/health")[2]["running"] == 0
+    assert local_request(slow, "POST", "/allocate", b"x")[0] == 504
+    print("✓ Timed-out computations keep their worker slot until they finish")
+    return True
+
+def _pending_job_then_recalculate():
+    """AppTest 用スクリプト: 455mm のジョブを投入した直後に 303mm で即時再計算する"""
+    import streamlit as st
+    from src.input import load_demo_project
+    from src.masterdata import default_master
+    from src.ui.pipeline_job import start_pipeline, run_pipeline_now, render_pipeline_status
+
+    st.session_state.setdefault("language", "ja")
+    board, rules, mode = default_master()
+    if "recalculated" not in st.session_state:
+        st.session_state.recalculated = True
+        start_pipeline(load_demo_project(), board, rules, mode, 455, False, [])
+        run_pipeline_now(load_demo_project(), board, rules, mode, 303, False, [])
+    render_pipeline_status()
+
+def test_recalculate_drops_pending_job():
+    """即時の再計算が、投入済みジョブの古い結果で上書きされないか確認"""
+    import time
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_function(_pending_job_then_recalculate, default_timeout=60).run()
+    time.sleep(0.5)
+    at.run()
+    assert not at.exception, [e.value for e in at.exception]
+    assert "pipeline_job" not in at.session_state and "pipeline_params" not in at.session_state
+    assert at.session_state["structural_system"].stud_pitch == 303
+    print("✓ Recalculating in the script run drops the pending background job")
+    return True
+
+def _nesting_tab_demo():
+    """AppTest 用スクリプト: デモ案件の板取結果で板取ビューを描く"""
+    import streamlit as st
+    from src.input import load_demo_project
+    from src.masterdata import default_master
+    from src.allocating import allocate_walls_with_architectural_constraints
+    from src.nesting import simple_nesting
+    from src.ui.tab_nesting import render_tab_nesting
+
+    st.session_state.setdefault("language", "ja")
+    board, rules, mode = default_master()
+    if "results" not in st.session_state:
+        panels, _ = allocate_walls_with_architectural_constraints(load_demo_project(), board, rules, mode)
+        placements, util, _ = simple_nesting(panels, board, rules, False)
+        st.session_state.results = {"placements": placements, "utilization": util}
+    render_tab_nesting(board)
+
+def test_thumbnail_selects_sheet():
+    """一覧図のボードをクリック（点の選択）すると、そのボードのページが表示されるか確認"""
+    import json
+    from streamlit.testing.v1 import AppTest
+    from src.masterdata import default_master
+    from src.visualization import NESTING_SHEETS_PER_PAGE, group_placements_by_sheet, create_nesting_thumbnails_plotly
+
+    at = AppTest.from_function(_nesting_tab_demo, default_timeout=60).run()
+    assert not at.exception, [e.value for e in at.exception]
+    charts = at.get("plotly_chart")
+    thumbnails = next(c for c in charts if c.proto.id.endswith("nesting_thumbnails"))
+    traces = json.loads(thumbnails.proto.spec)["data"]
+    # plotly.js が点を選択できるのはマーカー・文字のあるトレースだけ
+    curve = next(i for i, t in enumerate(traces) if "markers" in t["mode"])
+    placements = at.session_state["results"]["placements"]
+    sheets = group_placements_by_sheet(placements)
+    assert len(sheets) > NESTING_SHEETS_PER_PAGE * 3
+    markers = create_nesting_thumbnails_plotly(placements, default_master()[0]).data[curve]
+    assert list(markers.customdata) == list(sheets)  # ボードごとに1点
+    sid = NESTING_SHEETS_PER_PAGE * 3 + 2  # 4ページ目のボード
+    point = {"curve_number": curve, "point_number": sid - 1, "point_index": sid - 1, "customdata": sid}
+    states = at._tree.get_widget_states()
+    widget = states.widgets.add()
+    widget.id = thumbnails.proto.id
+    widget.string_value = json.dumps({"selection": {"points": [point], "point_indices": [sid - 1], "box": [], "lasso": []}})
+    at._run(states)
+    assert not at.exception, [e.value for e in at.exception]
+    assert at.session_state["nesting_page"] == 4
+    titles = [json.loads(c.proto.spec)["layout"]["title"]["text"] for c in at.get("plotly_chart")[1:]]
+    assert f"ボード #{sid}" in titles, titles
+    print("✓ Clicking a thumbnail jumps to its sheet")
+    return True
+
+def _run(test_func):
+    """assert で失敗するテストを bool に変換"""
+    try:
+        return test_func()
+    except Exception as e:
+        print(f"✗ {test_func.__name__}: {e}")
+        return False
+
 def main():
     print("=" * 50)
     print("アプリケーション動作確認テスト")
@@ -67,9 +605,69 @@ def main():
     function_ok = test_wall_editor_functions()
     print()
     
+    # 構造テスト
+    print("3. 構造要素・ルールチェックテスト")
+    print("-" * 50)
+    structural_ok = _run(test_structural_studs) and _run(test_rule_checks)
+    print()
+    
+    # 空間インデックステスト
+    print("4. 壁スナップ空間インデックス・操作履歴テスト")
+    print("-" * 50)
+    index_ok = _run(test_wall_spatial_index) and _run(test_wall_history)
+    print()
+    
+    # 壁グラフテスト
+    print("5. 壁グラフ（部屋抽出）・壁の重なり／交差テスト")
+    print("-" * 50)
+    graph_ok = _run(test_wall_graph) and _run(test_wall_conflicts)
+    print()
+    
+    # Arrow / Parquet 出力テスト
+    print("6. Arrow / Parquet・DXF・PDF 出力テスト")
+    print("-" * 50)
+    arrow_ok = _run(test_arrow_export) and _run(test_dxf_export) and _run(test_pdf_export)
+    print()
+    
+    # バックグラウンド実行テスト
+    print("7. バックグラウンド実行テスト")
+    print("-" * 50)
+    job_ok = _run(test_background_pipeline)
+    print()
+    
+    # パイプラインのメモ化テスト
+    print("8. パイプラインのメモ化テスト")
+    print("-" * 50)
+    pipeline_ok = _run(test_pipeline_memo)
+    print()
+    
+    # 共有キャッシュテスト
+    print("9. プロセス共有キャッシュテスト")
+    print("-" * 50)
+    shared_ok = _run(test_shared_cache)
+    print()
+    
+    # HTTP サービステスト
+    print("10. HTTP サービステスト")
+    print("-" * 50)
+    service_ok = _run(test_service) and _run(test_service_timeout_keeps_slot)
+    print()
+    
+    # 即時再計算とジョブの競合テスト
+    print("11. 即時再計算とバックグラウンドジョブの競合テスト")
+    print("-" * 50)
+    recalc_ok = _run(test_recalculate_drops_pending_job)
+    print()
+    
+    # 板取一覧のボード選択テスト
+    print("12. 板取一覧のボード選択テスト")
+    print("-" * 50)
+    thumbnail_ok = _run(test_thumbnail_selects_sheet)
+    print()
+    
     # 結果
     print("=" * 50)
-    if import_ok and function_ok:
+    if import_ok and function_ok and structural_ok and index_ok and graph_ok and arrow_ok and job_ok and pipeline_ok and shared_ok and service_ok and recalc_ok and thumbnail_ok:
         print("✓ すべてのテストが成功しました！")
         print("アプリケーションを起動できます: streamlit run app.py")
         return 0